@@ -0,0 +1,196 @@
+"""
+Set-based computation and incremental maintenance of TeamAnalytics rows.
+
+Records, points and averages come from conditional aggregates over the
+completed games, rather than from looping over games in Python. Score
+updates then keep every analytics window containing the game current by
+applying the result as a delta.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+from django.utils import timezone
+
+from games.models import Game
+from .models import TeamAnalytics
+
+SIDE_FIELDS = ('wins', 'losses', 'draws', 'scored', 'allowed')
+COUNTER_FIELDS = (
+    'games_played', 'wins', 'losses', 'draws', 'points_scored', 'points_allowed',
+    'home_wins', 'home_losses', 'home_draws', 'away_wins', 'away_losses', 'away_draws',
+)
+
+
+def _completed_games(league, start_date, end_date):
+    return Game.objects.filter(
+        league=league,
+        date__gte=start_date,
+        date__lte=end_date,
+        status='completed',
+        home_score__isnull=False,
+        away_score__isnull=False,
+    )
+
+
+def _side_aggregates(side, condition=None):
+    """Conditional aggregates for the games a team played as ``side`` ('home' or 'away')"""
+    other = 'away' if side == 'home' else 'home'
+    condition = condition or Q()
+    return {
+        f'{side}_wins': Count('id', filter=condition & Q(**{f'{side}_score__gt': F(f'{other}_score')})),
+        f'{side}_losses': Count('id', filter=condition & Q(**{f'{side}_score__lt': F(f'{other}_score')})),
+        f'{side}_draws': Count('id', filter=condition & Q(**{f'{side}_score': F(f'{other}_score')})),
+        f'{side}_scored': Sum(f'{side}_score', filter=condition),
+        f'{side}_allowed': Sum(f'{other}_score', filter=condition),
+    }
+
+
+def analytics_values(totals):
+    """Turn per-side totals into TeamAnalytics counter values"""
+    totals = {key: value or 0 for key, value in totals.items()}
+    wins = totals['home_wins'] + totals['away_wins']
+    losses = totals['home_losses'] + totals['away_losses']
+    draws = totals['home_draws'] + totals['away_draws']
+
+    values = {
+        'games_played': wins + losses + draws,
+        'wins': wins,
+        'losses': losses,
+        'draws': draws,
+        'points_scored': totals['home_scored'] + totals['away_scored'],
+        'points_allowed': totals['home_allowed'] + totals['away_allowed'],
+    }
+    for side in ('home', 'away'):
+        for field in ('wins', 'losses', 'draws'):
+            values[f'{side}_{field}'] = totals[f'{side}_{field}']
+    return values
+
+
+def refresh_performance_data(analytics):
+    """Recompute the derived metrics in performance_data from the counters"""
+    games_played = analytics.games_played
+    analytics.performance_data = {
+        **(analytics.performance_data or {}),
+        'avg_points_per_game': analytics.points_scored / games_played if games_played > 0 else 0,
+        'avg_points_allowed_per_game': analytics.points_allowed / games_played if games_played > 0 else 0,
+        'home_record': f"{analytics.home_wins}-{analytics.home_losses}-{analytics.home_draws}",
+        'away_record': f"{analytics.away_wins}-{analytics.away_losses}-{analytics.away_draws}",
+    }
+
+
+def set_analytics_values(analytics, totals):
+    for field, value in analytics_values(totals).items():
+        setattr(analytics, field, value)
+    refresh_performance_data(analytics)
+
+
+def calculate_team_analytics(analytics):
+    """Recompute one analytics row with a single aggregate query"""
+    team_id = analytics.team_id
+    totals = _completed_games(analytics.league_id, analytics.start_date, analytics.end_date).filter(
+        Q(home_team_id=team_id) | Q(away_team_id=team_id)
+    ).aggregate(
+        **_side_aggregates('home', Q(home_team_id=team_id)),
+        **_side_aggregates('away', Q(away_team_id=team_id)),
+    )
+
+    set_analytics_values(analytics, totals)
+    analytics.save()
+    return analytics
+
+
+def calculate_league_analytics(league, start_date, end_date):
+    """
+    Create or refresh the analytics row of every team in ``league``.
+
+    Totals come from one grouped query per side (home and away) over the
+    league's games, and rows are written with bulk_update/bulk_create.
+    """
+    empty = {f'{side}_{field}': 0 for side in ('home', 'away') for field in SIDE_FIELDS}
+    games = _completed_games(league, start_date, end_date)
+    totals = {}
+    for side in ('home', 'away'):
+        rows = games.values(f'{side}_team_id').annotate(**_side_aggregates(side)).order_by()
+        for row in rows:
+            totals.setdefault(row.pop(f'{side}_team_id'), dict(empty)).update(row)
+
+    now = timezone.now()
+    existing = {
+        analytics.team_id: analytics
+        for analytics in TeamAnalytics.objects.filter(league=league, start_date=start_date, end_date=end_date)
+    }
+
+    updated = []
+    created = []
+    for team_id in league.teams.values_list('id', flat=True):
+        analytics = existing.get(team_id)
+        if analytics is None:
+            analytics = TeamAnalytics(team_id=team_id, league=league, start_date=start_date, end_date=end_date)
+            created.append(analytics)
+        else:
+            analytics.league = league
+            analytics.updated_at = now
+            updated.append(analytics)
+        set_analytics_values(analytics, totals.get(team_id, empty))
+
+    with transaction.atomic():
+        TeamAnalytics.objects.bulk_update(
+            updated, COUNTER_FIELDS + ('performance_data', 'updated_at'), batch_size=500
+        )
+        TeamAnalytics.objects.bulk_create(created, batch_size=500)
+
+    return updated + created
+
+
+class AnalyticsDeltas:
+    """
+    Accumulates game results as changes to every analytics window containing them.
+
+    Mirrors ``leagues.standings.StandingDeltas``: ``sign=-1`` reverts a
+    previously applied result. ``apply`` runs one UPDATE per league and game
+    date with database-side increments, then re-renders performance_data
+    for the rows it touched.
+    """
+
+    def __init__(self):
+        self.deltas = defaultdict(lambda: defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0)))
+
+    def add_game(self, game, home_score=None, away_score=None, sign=1):
+        home_score = game.home_score if home_score is None else home_score
+        away_score = game.away_score if away_score is None else away_score
+
+        for team_id, side, scored, allowed in ((game.home_team_id, 'home', home_score, away_score),
+                                               (game.away_team_id, 'away', away_score, home_score)):
+            result = 'wins' if scored > allowed else 'losses' if scored < allowed else 'draws'
+            totals = self.deltas[(game.league_id, game.date)][team_id]
+            totals['games_played'] += sign
+            totals[result] += sign
+            totals[f'{side}_{result}'] += sign
+            totals['points_scored'] += sign * scored
+            totals['points_allowed'] += sign * allowed
+
+    def apply(self):
+        touched = Q(pk__in=[])
+        for (league_id, game_date), teams in self.deltas.items():
+            teams = {team_id: changes for team_id, changes in teams.items() if any(changes.values())}
+            if not teams:
+                continue
+
+            updates = {}
+            for field in COUNTER_FIELDS:
+                whens = [When(team_id=team_id, then=Value(changes[field]))
+                         for team_id, changes in teams.items() if changes[field]]
+                if whens:
+                    updates[field] = F(field) + Case(*whens, default=Value(0), output_field=IntegerField())
+
+            windows = Q(league_id=league_id, team_id__in=teams, start_date__lte=game_date, end_date__gte=game_date)
+            TeamAnalytics.objects.filter(windows).update(updated_at=timezone.now(), **updates)
+            touched |= windows
+
+        self.deltas.clear()
+
+        rows = list(TeamAnalytics.objects.filter(touched))
+        for analytics in rows:
+            refresh_performance_data(analytics)
+        TeamAnalytics.objects.bulk_update(rows, ['performance_data'], batch_size=500)
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:47
+
+from django.db import migrations, models
+
+
+def fill_records(apps, schema_editor):
+    """Copy the "W-L-D" home/away records out of performance_data"""
+    TeamAnalytics = apps.get_model('analytics', 'TeamAnalytics')
+    rows = []
+    for analytics in TeamAnalytics.objects.all().iterator():
+        for side in ('home', 'away'):
+            try:
+                wins, losses, draws = (int(part) for part in analytics.performance_data[f'{side}_record'].split('-'))
+            except (KeyError, TypeError, ValueError, AttributeError):
+                continue
+            setattr(analytics, f'{side}_wins', wins)
+            setattr(analytics, f'{side}_losses', losses)
+            setattr(analytics, f'{side}_draws', draws)
+        rows.append(analytics)
+    TeamAnalytics.objects.bulk_update(
+        rows, ['home_wins', 'home_losses', 'home_draws', 'away_wins', 'away_losses', 'away_draws'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='teamanalytics',
+            name='away_draws',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='teamanalytics',
+            name='away_losses',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='teamanalytics',
+            name='away_wins',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='teamanalytics',
+            name='home_draws',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='teamanalytics',
+            name='home_losses',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='teamanalytics',
+            name='home_wins',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_records, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_team_analytics_records'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='playerstatistic',
+            index=models.Index(fields=['created_at', 'id'], name='player_stat_created_idx'),
+        ),
+    ]
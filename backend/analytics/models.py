@@ -21,6 +21,9 @@ class PlayerStatistic(models.Model):
     
     class Meta:
         unique_together = ('user', 'game')
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='player_stat_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} stats for {self.game}"
@@ -42,6 +45,14 @@ class TeamAnalytics(models.Model):
     points_scored = models.IntegerField(default=0)
     points_allowed = models.IntegerField(default=0)
     
+    # Home and away records, kept as columns so score updates can apply deltas
+    home_wins = models.IntegerField(default=0)
+    home_losses = models.IntegerField(default=0)
+    home_draws = models.IntegerField(default=0)
+    away_wins = models.IntegerField(default=0)
+    away_losses = models.IntegerField(default=0)
+    away_draws = models.IntegerField(default=0)
+    
     # Advanced metrics stored as JSON
     performance_data = models.JSONField(default=dict)
     
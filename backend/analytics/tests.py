@@ -0,0 +1,208 @@
+from datetime import date, time, timedelta
+
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+
+from games.models import Game
+from leagues.models import League
+from teams.models import Team
+from .calculations import calculate_league_analytics, calculate_team_analytics
+from .models import TeamAnalytics
+
+User = get_user_model()
+
+START = date(2024, 3, 1)
+END = date(2024, 5, 31)
+
+COUNTERS = ('games_played', 'wins', 'losses', 'draws', 'points_scored', 'points_allowed',
+            'home_wins', 'home_losses', 'home_draws', 'away_wins', 'away_losses', 'away_draws')
+
+
+class AnalyticsTestCase(APITestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', email='org@test.com', password='password')
+        self.league = League.objects.create(
+            name='League', sport='Soccer', season='2024', start_date=START, end_date=END, organizer=self.organizer,
+        )
+        self.teams = {name: Team.objects.create(name=name, sport='Soccer') for name in ('A', 'B', 'C', 'D')}
+        self.league.teams.add(*self.teams.values())
+
+        self.games = [
+            self.game('A', 'B', 3, 1, START),
+            self.game('B', 'A', 2, 2, START + timedelta(days=7)),
+            self.game('C', 'A', 1, 0, START + timedelta(days=14)),
+            # Neither counts: not played yet, and outside the window
+            self.game('A', 'C', None, None, START + timedelta(days=21), status='scheduled'),
+            self.game('A', 'B', 5, 0, END + timedelta(days=1)),
+        ]
+        self.client.force_authenticate(self.organizer)
+
+    def game(self, home, away, home_score, away_score, day, status='completed'):
+        return Game.objects.create(league=self.league, home_team=self.teams[home], away_team=self.teams[away],
+                                   date=day, time=time(18, 0), status=status,
+                                   home_score=home_score, away_score=away_score)
+
+    def counters(self, analytics):
+        return {field: getattr(analytics, field) for field in COUNTERS}
+
+
+class AnalyticsCalculationTests(AnalyticsTestCase):
+    expected = {
+        'A': {'games_played': 3, 'wins': 1, 'losses': 1, 'draws': 1, 'points_scored': 5, 'points_allowed': 4,
+              'home_wins': 1, 'home_losses': 0, 'home_draws': 0, 'away_wins': 0, 'away_losses': 1, 'away_draws': 1},
+        'B': {'games_played': 2, 'wins': 0, 'losses': 1, 'draws': 1, 'points_scored': 3, 'points_allowed': 5,
+              'home_wins': 0, 'home_losses': 0, 'home_draws': 1, 'away_wins': 0, 'away_losses': 1, 'away_draws': 0},
+        'C': {'games_played': 1, 'wins': 1, 'losses': 0, 'draws': 0, 'points_scored': 1, 'points_allowed': 0,
+              'home_wins': 1, 'home_losses': 0, 'home_draws': 0, 'away_wins': 0, 'away_losses': 0, 'away_draws': 0},
+        'D': dict.fromkeys(COUNTERS, 0),
+    }
+
+    def test_team_analytics(self):
+        analytics = TeamAnalytics.objects.create(team=self.teams['A'], league=self.league,
+                                                 start_date=START, end_date=END)
+        # One aggregate query, one UPDATE
+        with self.assertNumQueries(2):
+            calculate_team_analytics(analytics)
+        analytics.refresh_from_db()
+        self.assertEqual(self.counters(analytics), self.expected['A'])
+        self.assertEqual(analytics.performance_data, {
+            'avg_points_per_game': 5 / 3, 'avg_points_allowed_per_game': 4 / 3,
+            'home_record': '1-0-0', 'away_record': '0-1-1',
+        })
+
+    def test_team_without_games(self):
+        analytics = TeamAnalytics.objects.create(team=self.teams['D'], league=self.league,
+                                                 start_date=START, end_date=END)
+        calculate_team_analytics(analytics)
+        self.assertEqual(self.counters(analytics), self.expected['D'])
+        self.assertEqual(analytics.performance_data['avg_points_per_game'], 0)
+
+    def test_league_analytics_match_team_analytics(self):
+        rows = calculate_league_analytics(self.league, START, END)
+        self.assertEqual(len(rows), 4)
+        for name, team in self.teams.items():
+            with self.subTest(team=name):
+                analytics = TeamAnalytics.objects.get(team=team, league=self.league, start_date=START, end_date=END)
+                self.assertEqual(self.counters(analytics), self.expected[name])
+                stored = analytics.performance_data
+                self.assertEqual(stored, calculate_team_analytics(analytics).performance_data)
+
+    def test_league_analytics_refresh_existing_rows(self):
+        first = {row.team_id: row.id for row in calculate_league_analytics(self.league, START, END)}
+        Game.objects.filter(pk=self.games[3].pk).update(status='completed', home_score=0, away_score=4)
+
+        rows = calculate_league_analytics(self.league, START, END)
+        self.assertEqual({row.team_id: row.id for row in rows}, first)
+        self.assertEqual(TeamAnalytics.objects.count(), 4)
+        analytics = TeamAnalytics.objects.get(team=self.teams['C'])
+        self.assertEqual((analytics.games_played, analytics.wins, analytics.away_wins), (2, 2, 1))
+
+    def test_generate_endpoint(self):
+        url = '/api/analytics/team-analytics/generate/'
+        response = self.client.post(url, {'team_id': self.teams['A'].id, 'league_id': self.league.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({field: response.data[field] for field in ('games_played', 'wins', 'losses', 'draws')},
+                         {'games_played': 3, 'wins': 1, 'losses': 1, 'draws': 1})
+
+        # A narrower window, and the same request again updates the same row
+        window = {'team_id': self.teams['A'].id, 'league_id': self.league.id,
+                  'start_date': '2024-03-05', 'end_date': '2024-12-31'}
+        for _ in range(2):
+            response = self.client.post(url, window, format='json')
+            self.assertEqual((response.data['games_played'], response.data['points_scored']), (3, 7))
+        self.assertEqual(TeamAnalytics.objects.filter(team=self.teams['A']).count(), 2)
+
+        self.assertEqual(self.client.post(url, {'team_id': self.teams['A'].id}, format='json').status_code, 400)
+        response = self.client.post(url, {'team_id': 999999, 'league_id': self.league.id}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_generate_query_count(self):
+        url = '/api/analytics/team-analytics/generate/'
+        data = {'team_id': self.teams['A'].id, 'league_id': self.league.id}
+        self.client.post(url, data, format='json')
+        # Team with member count, its coaches, league with counts and
+        # organizer, the analytics row, the aggregate and its UPDATE
+        with self.assertNumQueries(6):
+            response = self.client.post(url, data, format='json')
+        self.assertEqual(response.data['team']['members_count'], 0)
+        self.assertEqual(response.data['league']['games_count'], 5)
+
+    def test_malformed_input(self):
+        generate = '/api/analytics/team-analytics/generate/'
+        generate_league = '/api/analytics/team-analytics/generate_league/'
+        for url, data in (
+            (generate, {'team_id': 'abc', 'league_id': self.league.id}),
+            (generate, {'team_id': self.teams['A'].id, 'league_id': [1]}),
+            (generate, {'team_id': self.teams['A'].id, 'league_id': self.league.id, 'start_date': '2024-02-30'}),
+            (generate, {'team_id': self.teams['A'].id, 'league_id': self.league.id, 'end_date': 'soon'}),
+            (generate_league, {'league_id': 'abc'}),
+            (generate_league, {'league_id': self.league.id, 'start_date': 20240301}),
+        ):
+            with self.subTest(url=url, data=data):
+                self.assertEqual(self.client.post(url, data, format='json').status_code, 400)
+        self.assertFalse(TeamAnalytics.objects.exists())
+
+    def test_generate_league_endpoint(self):
+        response = self.client.post('/api/analytics/team-analytics/generate_league/',
+                                    {'league_id': self.league.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        by_team = {row['team']['name']: row for row in response.data}
+        self.assertEqual(sorted(by_team), ['A', 'B', 'C', 'D'])
+        self.assertEqual(by_team['B']['performance_data']['home_record'], '0-0-1')
+
+
+class AnalyticsDeltaTests(AnalyticsTestCase):
+    """Score updates keep existing analytics windows current"""
+
+    def setUp(self):
+        super().setUp()
+        self.season = self.window(START, END)
+        # A window that ends before the rescored game
+        self.early = self.window(START, START + timedelta(days=10))
+
+    def window(self, start_date, end_date):
+        calculate_league_analytics(self.league, start_date, end_date)
+        return {name: TeamAnalytics.objects.get(team=team, start_date=start_date, end_date=end_date)
+                for name, team in self.teams.items()}
+
+    def assertCurrent(self, windows):
+        """Each stored row equals a recomputation from the games"""
+        for name, analytics in windows.items():
+            analytics.refresh_from_db()
+            stored = (self.counters(analytics), analytics.performance_data)
+            recomputed = calculate_team_analytics(analytics)
+            self.assertEqual(stored, (self.counters(recomputed), recomputed.performance_data), name)
+
+    def update_score(self, game, home_score, away_score):
+        response = self.client.post(f'/api/games/{game.id}/update_score/',
+                                    {'home_score': home_score, 'away_score': away_score}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_result_is_added_to_windows_containing_the_game(self):
+        early = {name: self.counters(analytics) for name, analytics in self.early.items()}
+        self.update_score(self.games[3], 2, 0)
+        self.assertCurrent(self.season)
+        self.assertEqual(self.season['A'].games_played, 4)
+        self.assertEqual(self.season['A'].performance_data['home_record'], '2-0-0')
+        for name, analytics in self.early.items():
+            analytics.refresh_from_db()
+            self.assertEqual(self.counters(analytics), early[name])
+
+    def test_rescoring_reverts_the_previous_result(self):
+        # A 2-2 draw at B becomes an A win, then a B win
+        for home_score, away_score in ((0, 1), (3, 1)):
+            self.update_score(self.games[1], home_score, away_score)
+            self.assertCurrent(self.season)
+            self.assertCurrent(self.early)
+        self.assertEqual(self.counters(self.season['B'])['home_wins'], 1)
+        self.assertEqual(self.season['A'].games_played, 3)
+
+    def test_batch_scores(self):
+        response = self.client.post('/api/games/batch_update_scores/', {'results': [
+            {'game_id': self.games[0].id, 'home_score': 0, 'away_score': 0},
+            {'game_id': self.games[3].id, 'home_score': 1, 'away_score': 2},
+        ]}, format='json')
+        self.assertEqual(response.data['updated'], 2)
+        self.assertCurrent(self.season)
+        self.assertCurrent(self.early)
+        self.assertEqual(self.counters(self.season['C'])['away_wins'], 1)
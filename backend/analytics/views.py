@@ -1,21 +1,26 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Sum, Avg, Count, F, Q
 from .models import PlayerStatistic, TeamAnalytics
 from .serializers import PlayerStatisticSerializer, TeamAnalyticsSerializer
-from teams.models import Team
+from .calculations import calculate_team_analytics, calculate_league_analytics
+from teams.models import Team, team_prefetch
 from leagues.models import League
-from games.models import Game
+from sports_league_backend.pagination import OptionalCursorPagination
 import datetime
 
+INVALID_DATES = "start_date and end_date must be dates in YYYY-MM-DD format."
+
 class PlayerStatisticViewSet(viewsets.ModelViewSet):
     queryset = PlayerStatistic.objects.all()
     serializer_class = PlayerStatisticSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OptionalCursorPagination
+    cursor_ordering = ('-created_at', '-id')
     
     def get_queryset(self):
-        queryset = PlayerStatistic.objects.all()
+        queryset = (PlayerStatistic.objects.select_related('user__profile').prefetch_related(team_prefetch('team'))
+                    .order_by(*self.cursor_ordering))
         
         # Filter by user
         user_id = self.request.query_params.get('user_id')
@@ -40,7 +45,7 @@ class TeamAnalyticsViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        queryset = TeamAnalytics.objects.all()
+        queryset = TeamAnalytics.objects.prefetch_related(team_prefetch('team'))
         
         # Filter by team
         team_id = self.request.query_params.get('team_id')
@@ -54,6 +59,20 @@ class TeamAnalyticsViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    def _date_range(self, request, league):
+        """Requested date range, defaulting to the league dates; ValueError if malformed"""
+        start_date = request.data.get('start_date', league.start_date)
+        end_date = request.data.get('end_date', league.end_date)
+        
+        if isinstance(start_date, str):
+            start_date = datetime.datetime.strptime(start_date, '%Y-%m-%d').date()
+        if isinstance(end_date, str):
+            end_date = datetime.datetime.strptime(end_date, '%Y-%m-%d').date()
+        if not isinstance(start_date, datetime.date) or not isinstance(end_date, datetime.date):
+            raise ValueError
+        
+        return start_date, end_date
+    
     @action(detail=False, methods=['post'])
     def generate(self, request):
         """Generate or update team analytics"""
@@ -65,17 +84,21 @@ class TeamAnalyticsViewSet(viewsets.ModelViewSet):
                            status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            team = Team.objects.get(id=team_id)
-            league = League.objects.get(id=league_id)
+            team_id, league_id = int(team_id), int(league_id)
+        except (TypeError, ValueError):
+            return Response({"detail": "Team ID and League ID must be integers."}, 
+                           status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            # Fetched with everything the nested serializers read
+            team = Team.objects.with_summary().get(id=team_id)
+            league = League.objects.with_counts().select_related('organizer__profile').get(id=league_id)
             
             # Get date range (default to league dates)
-            start_date = request.data.get('start_date', league.start_date)
-            end_date = request.data.get('end_date', league.end_date)
-            
-            if isinstance(start_date, str):
-                start_date = datetime.datetime.strptime(start_date, '%Y-%m-%d').date()
-            if isinstance(end_date, str):
-                end_date = datetime.datetime.strptime(end_date, '%Y-%m-%d').date()
+            try:
+                start_date, end_date = self._date_range(request, league)
+            except (TypeError, ValueError):
+                return Response({"detail": INVALID_DATES}, status=status.HTTP_400_BAD_REQUEST)
             
             # Get or create analytics object
             analytics, created = TeamAnalytics.objects.get_or_create(
@@ -94,8 +117,10 @@ class TeamAnalyticsViewSet(viewsets.ModelViewSet):
                 }
             )
             
+            analytics.team, analytics.league = team, league
+            
             # Calculate analytics
-            self._calculate_team_analytics(analytics, team, league, start_date, end_date)
+            calculate_team_analytics(analytics)
             
             return Response(TeamAnalyticsSerializer(analytics).data)
         except Team.DoesNotExist:
@@ -103,72 +128,30 @@ class TeamAnalyticsViewSet(viewsets.ModelViewSet):
         except League.DoesNotExist:
             return Response({"detail": "League not found."}, status=status.HTTP_404_NOT_FOUND)
     
-    def _calculate_team_analytics(self, analytics, team, league, start_date, end_date):
-        """Calculate team analytics based on games"""
-        # Get completed games in the date range
-        home_games = Game.objects.filter(
-            league=league,
-            home_team=team,
-            date__gte=start_date,
-            date__lte=end_date,
-            status='completed'
-        )
-        
-        away_games = Game.objects.filter(
-            league=league,
-            away_team=team,
-            date__gte=start_date,
-            date__lte=end_date,
-            status='completed'
-        )
-        
-        # Calculate basic stats
-        games_played = home_games.count() + away_games.count()
-        
-        # Wins, losses, draws and points
-        wins = 0
-        losses = 0
-        draws = 0
-        points_scored = 0
-        points_allowed = 0
-        
-        for game in home_games:
-            if game.home_score > game.away_score:
-                wins += 1
-            elif game.home_score < game.away_score:
-                losses += 1
-            else:
-                draws += 1
-            
-            points_scored += game.home_score
-            points_allowed += game.away_score
-        
-        for game in away_games:
-            if game.away_score > game.home_score:
-                wins += 1
-            elif game.away_score < game.home_score:
-                losses += 1
-            else:
-                draws += 1
-            
-            points_scored += game.away_score
-            points_allowed += game.home_score
-        
-        # Update analytics object
-        analytics.games_played = games_played
-        analytics.wins = wins
-        analytics.losses = losses
-        analytics.draws = draws
-        analytics.points_scored = points_scored
-        analytics.points_allowed = points_allowed
-        
-        # Calculate advanced metrics
-        performance_data = {
-            'avg_points_per_game': points_scored / games_played if games_played > 0 else 0,
-            'avg_points_allowed_per_game': points_allowed / games_played if games_played > 0 else 0,
-            'home_record': f"{home_games.filter(home_score__gt=F('away_score')).count()}-{home_games.filter(home_score__lt=F('away_score')).count()}-{home_games.filter(home_score=F('away_score')).count()}",
-            'away_record': f"{away_games.filter(away_score__gt=F('home_score')).count()}-{away_games.filter(away_score__lt=F('home_score')).count()}-{away_games.filter(away_score=F('home_score')).count()}",
-        }
-        
-        analytics.performance_data = performance_data
-        analytics.save()
+    @action(detail=False, methods=['post'])
+    def generate_league(self, request):
+        """Generate or update analytics for every team in a league at once"""
+        league_id = request.data.get('league_id')
+        
+        if not league_id:
+            return Response({"detail": "League ID is required."}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            league = League.objects.with_counts().select_related('organizer__profile').get(id=int(league_id))
+        except (TypeError, ValueError):
+            return Response({"detail": "League ID must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        except League.DoesNotExist:
+            return Response({"detail": "League not found."}, status=status.HTTP_404_NOT_FOUND)
+        
+        try:
+            start_date, end_date = self._date_range(request, league)
+        except (TypeError, ValueError):
+            return Response({"detail": INVALID_DATES}, status=status.HTTP_400_BAD_REQUEST)
+        analytics = calculate_league_analytics(league, start_date, end_date)
+        
+        # Attach the nested teams in one go instead of per row
+        teams = Team.objects.with_summary().in_bulk([row.team_id for row in analytics])
+        for row in analytics:
+            row.team = teams[row.team_id]
+        
+        return Response(TeamAnalyticsSerializer(analytics, many=True).data)
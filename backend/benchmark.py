@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+"""
+Benchmark the hot API endpoints against generated datasets.
+
+Each dataset size is built with generate_data.py from a fixed seed, so
+every run sees the same rows (with dates relative to the day it runs), and
+is benchmarked in its own process.
+For every endpoint the suite records p50/p95/mean latency over the timed
+iterations, and the query count and peak Python memory of one extra
+instrumented request. Requests that write run in a transaction that is
+rolled back, so each iteration sees the same data.
+
+Every endpoint has a budget. Query budgets do not depend on the dataset
+size, so an N+1 regression fails them on the larger datasets. Latency
+budgets are only enforced from MIN_TIMED_ITERATIONS iterations up, as the
+p95 of a handful of requests is mostly noise. Results are
+written as JSON; pass a previous file to --compare to print the changes.
+The exit status is 1 if any budget is exceeded.
+
+Usage:
+    python benchmark.py [--sizes small,medium] [--iterations 20]
+        [--output benchmark-results.json] [--compare previous.json]
+        [--data-dir DIR]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timezone as dt_timezone
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sports_league_backend.settings')
+
+SEED = 1
+MIN_TIMED_ITERATIONS = 20
+
+# generate_data.py options of each dataset
+SIZES = {
+    'small': ['--leagues', '2', '--teams-per-league', '6', '--players-per-team', '8', '--fans', '50',
+              '--posts-per-user', '2', '--likes-per-user', '5'],
+    'medium': ['--leagues', '10', '--teams-per-league', '10', '--seasons', '2', '--players-per-team', '12',
+               '--fans', '1000', '--events-per-game', '8', '--posts-per-user', '5', '--likes-per-user', '30'],
+    'large': ['--leagues', '50', '--teams-per-league', '12', '--seasons', '3', '--players-per-team', '15',
+              '--fans', '20000', '--events-per-game', '15', '--posts-per-user', '10', '--likes-per-user', '50'],
+}
+
+# name: (method, path, body, user, budget). Paths and bodies are formatted
+# with the fixture ids found by find_fixtures(); user is a fixture name.
+# Query counts of writes include the BEGIN and ROLLBACK around them, and
+# generate_schedule inserts its games in batches (several on large leagues).
+ENDPOINTS = {
+    'league_list': ('get', '/api/leagues/', None, 'organizer', {'queries': 2, 'p95_ms': 100}),
+    'league_detail': ('get', '/api/leagues/{league}/', None, 'organizer', {'queries': 4, 'p95_ms': 100}),
+    'league_standings': ('get', '/api/leagues/{league}/standings/', None, 'organizer',
+                         {'queries': 2, 'p95_ms': 50}),
+    'game_list': ('get', '/api/games/?league_id={league}', None, 'organizer', {'queries': 7, 'p95_ms': 150}),
+    'game_detail': ('get', '/api/games/{game}/', None, 'organizer', {'queries': 8, 'p95_ms': 100}),
+    'community_feed': ('get', '/api/community/feed/', None, 'fan', {'queries': 4, 'p95_ms': 100}),
+    'post_list': ('get', '/api/community/posts/', None, 'fan', {'queries': 5, 'p95_ms': 100}),
+    'comments': ('get', '/api/community/posts/{post}/thread/', None, 'fan', {'queries': 3, 'p95_ms': 50}),
+    # Team with coaches, league with counts, analytics row, aggregate, UPDATE
+    'analytics_generate': ('post', '/api/analytics/team-analytics/generate/',
+                           {'team_id': '{team}', 'league_id': '{league}'}, 'organizer',
+                           {'queries': 8, 'p95_ms': 150}),
+    # The game_detail reads, then the lock, old result, save, standings
+    # upsert and update, analytics update, read and performance data
+    'update_score': ('post', '/api/games/{game}/update_score/', {'home_score': 3, 'away_score': 1}, 'organizer',
+                     {'queries': 20, 'p95_ms': 200}),
+    'generate_schedule': ('post', '/api/games/generate_schedule/', {'league_id': '{league}'}, 'organizer',
+                          {'queries': 6, 'p95_ms': 200}),
+}
+
+
+def configure(db_path):
+    """Point Django at the dataset (also used as the worker initializer)"""
+    import django
+    from django.conf import settings
+
+    settings.DATABASES['default']['NAME'] = db_path
+    # Time requests as in production: DEBUG logs every query
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = list(settings.ALLOWED_HOSTS) + ['testserver']
+    django.setup()
+
+
+def build_dataset(db_path, size):
+    import generate_data
+
+    args = generate_data.build_parser().parse_args(
+        ['--database', db_path, '--seed', str(SEED), '--no-search-index'] + SIZES[size]
+    )
+    return generate_data.generate(args)
+
+
+def find_fixtures():
+    """Ids the endpoints are called with: a league under way and its busiest rows"""
+    from community.models import Post
+    from games.models import Game
+    from leagues.models import League
+
+    league = League.objects.filter(status='active').order_by('id').first() or League.objects.order_by('id').first()
+    game = Game.objects.filter(league=league, status='completed').order_by('id').first()
+    post = Post.objects.order_by('-comments_count', 'id').first()
+    fan = (League.followers.through.objects.filter(league=league).order_by('user_id').first()
+           or League.followers.through.objects.order_by('user_id').first())
+    team = league.teams.order_by('id').first()
+    return {
+        'league': league.id, 'game': game.id, 'post': post.id, 'team': team.id,
+        'organizer': league.organizer_id, 'fan': fan.user_id if fan else league.organizer_id,
+        'counts': {
+            'leagues': League.objects.count(), 'games': Game.objects.count(),
+            'posts': Post.objects.count(), 'league_games': league.games.count(),
+            'post_comments': post.comments_count,
+        },
+    }
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def benchmark_endpoint(client, method, path, body, iterations):
+    from django.db import connection, transaction
+    from django.test.utils import CaptureQueriesContext
+
+    def call():
+        if method == 'get':
+            return client.get(path)
+        # Writes are rolled back so every iteration starts from the same data
+        with transaction.atomic():
+            response = getattr(client, method)(path, body, format='json')
+            transaction.set_rollback(True)
+        return response
+
+    response = call()  # Warm-up: URL resolution, imports, caches
+
+    tracemalloc.start()
+    with CaptureQueriesContext(connection) as queries:
+        response = call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # Read now: later requests reset the query log
+    query_count = len(queries)
+
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    return {
+        'status': response.status_code,
+        'queries': query_count,
+        'peak_kb': round(peak / 1024, 1),
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'mean_ms': round(statistics.mean(timings), 2),
+    }
+
+
+def run_size(size, iterations, names):
+    """Worker: benchmark every endpoint against the configured dataset"""
+    from django.contrib.auth import get_user_model
+    from rest_framework.test import APIClient
+
+    fixtures = find_fixtures()
+    users = get_user_model().objects.in_bulk([fixtures['organizer'], fixtures['fan']])
+    results = {}
+    for name in names:
+        method, path, body, user, budget = ENDPOINTS[name]
+        client = APIClient()
+        client.force_authenticate(users[fixtures[user]])
+        path = path.format(**fixtures)
+        if body:
+            body = {key: value.format(**fixtures) if isinstance(value, str) else value for key, value in body.items()}
+
+        result = benchmark_endpoint(client, method, path, body, iterations)
+        failures = []
+        if result['status'] >= 400:
+            failures.append(f"status {result['status']}")
+        for metric, limit in budget.items():
+            if metric.endswith('_ms') and iterations < MIN_TIMED_ITERATIONS:
+                continue
+            if result[metric] > limit:
+                failures.append(f"{metric} {result[metric]} > {limit}")
+        results[name] = {**result, 'budget': budget, 'passed': not failures, 'failures': failures}
+    return {'fixtures': fixtures, 'endpoints': results}
+
+
+def print_results(size, results, previous=None):
+    print(f"[{size}] {results['fixtures']['counts']}")
+    print(f"  {'endpoint':20} {'p50 ms':>8} {'p95 ms':>8} {'queries':>8} {'peak KB':>9}")
+    for name, result in results['endpoints'].items():
+        line = (f"  {name:20} {result['p50_ms']:8.1f} {result['p95_ms']:8.1f} "
+                f"{result['queries']:8} {result['peak_kb']:9.1f}")
+        before = (previous or {}).get(name)
+        if before:
+            change = (result['p95_ms'] - before['p95_ms']) / max(before['p95_ms'], 0.01) * 100
+            line += f"  p95 {change:+.0f}%, queries {result['queries'] - before['queries']:+d}"
+        status = '✅' if result['passed'] else '❌ ' + ', '.join(result['failures'])
+        print(f"{line}  {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='small,medium', help=f"Comma-separated, from {', '.join(SIZES)}")
+    parser.add_argument('--endpoint', action='append', choices=sorted(ENDPOINTS),
+                        help='Endpoint to run (default: all)')
+    parser.add_argument('--iterations', type=int, default=MIN_TIMED_ITERATIONS,
+                        help='Timed requests per endpoint; latency budgets need at least the default')
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--compare', help='Results of an earlier run to compare with')
+    parser.add_argument('--data-dir', help='Keep the generated datasets here and reuse them on later runs')
+    args = parser.parse_args()
+
+    sizes = args.sizes.split(',')
+    unknown = set(sizes) - set(SIZES)
+    if unknown:
+        parser.error(f"unknown size: {', '.join(sorted(unknown))}")
+    names = args.endpoint or list(ENDPOINTS)
+    if args.iterations < MIN_TIMED_ITERATIONS:
+        print(f"Fewer than {MIN_TIMED_ITERATIONS} iterations: checking query budgets only")
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)['sizes']
+
+    report = {
+        'meta': {
+            'started_at': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+            'seed': SEED, 'today': date.today().isoformat(), 'iterations': args.iterations,
+            'python': platform.python_version(), 'platform': platform.platform(),
+        },
+        'sizes': {},
+    }
+    passed = True
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or tmp
+        os.makedirs(data_dir, exist_ok=True)
+        ctx = multiprocessing.get_context('spawn')
+        for size in sizes:
+            db_path = os.path.join(data_dir, f'{size}-seed{SEED}-{date.today()}.sqlite3')
+            # A fresh process per dataset, as Django is configured once per process
+            with ctx.Pool(1, initializer=configure, initargs=(db_path,)) as pool:
+                if not os.path.exists(db_path):
+                    pool.apply(build_dataset, (db_path, size))
+                results = pool.apply(run_size, (size, args.iterations, names))
+            print_results(size, results, previous.get(size, {}).get('endpoints'))
+            report['sizes'][size] = results
+            passed = passed and all(result['passed'] for result in results['endpoints'].values())
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == '__main__':
+    main()
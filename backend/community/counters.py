@@ -0,0 +1,253 @@
+"""
+Write-behind buffer for hot engagement counters.
+
+Likes, shares and views of a popular post all update the same row, and on
+SQLite every one of those writes waits for the previous one. Instead,
+increments are added to a cache (atomic incr/decr) and flushed to the
+counter columns in batched UPDATEs, every COUNTER_FLUSH_INTERVAL seconds
+by whichever request comes along, by the flush_counters command, and at
+process exit. Reads add the pending deltas to the stored values; value()
+retries when a flush moves a delta from the cache to the database while it
+reads, so it never counts that delta twice.
+
+COUNTER_CACHE should name a cache that never evicts, shared by all
+processes (Redis) in production; with a local-memory cache each process
+buffers and flushes its own increments. When the cache fails, increments
+are written straight to the database.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 5  # Seconds
+KEY_PREFIX = 'counter:'
+REGISTRY_KEY = 'counter-registry'
+REGISTRY_LOCK_KEY = 'counter-registry-lock'
+FLUSH_LOCK_KEY = 'counter-flush-lock'
+FLUSH_GENERATION_KEY = 'counter-flush-generation'
+LOCK_TIMEOUT = 60
+VALUE_ATTEMPTS = 3
+
+# Counter columns that may be buffered
+BUFFERED_FIELDS = {
+    'community.post': ('likes_count', 'shares_count', 'views_count'),
+    'community.comment': ('likes_count',),
+}
+
+
+def counter_key(model, pk, field):
+    return f'{KEY_PREFIX}{model._meta.label_lower}:{pk}:{field}'
+
+
+def parse_key(key):
+    label, pk, field = key[len(KEY_PREFIX):].split(':')
+    return apps.get_model(label), int(pk), field
+
+
+class CounterBuffer:
+    def __init__(self):
+        # Keys this process has added to, whether or not they are registered
+        self.dirty = set()
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'COUNTER_CACHE', 'default')]
+
+    def add(self, model, pk, field, delta=1):
+        """Add ``delta`` to a counter, without touching the database when the cache works"""
+        if field not in BUFFERED_FIELDS.get(model._meta.label_lower, ()):
+            raise ValueError(f'{model._meta.label}.{field} is not a buffered counter')
+
+        if delta:
+            key = counter_key(model, pk, field)
+            try:
+                self._cache_incr(key, delta)
+            except Exception:
+                logger.warning('Counter cache unavailable, writing %s to the database', key, exc_info=True)
+                model.objects.filter(pk=pk).update(**{field: F(field) + delta})
+            else:
+                # The change is recorded; failing to flush must not fail the request
+                try:
+                    self._mark_dirty(key)
+                    self.flush_if_due()
+                except Exception:
+                    logger.exception('Could not flush buffered counters')
+
+    def value(self, model, pk, field):
+        """
+        Return a counter's current value, pending deltas included.
+
+        The stored value and the pending delta are read within one flush
+        generation: if a flush ran (or is running) meanwhile, the delta may
+        be in both, so they are read again.
+        """
+        key = counter_key(model, pk, field)
+        cache = self.cache
+        for attempt in range(VALUE_ATTEMPTS):
+            try:
+                generation = cache.get(FLUSH_GENERATION_KEY)
+            except Exception:
+                return model.objects.values_list(field, flat=True).get(pk=pk)
+            stored = model.objects.values_list(field, flat=True).get(pk=pk)
+            try:
+                values = cache.get_many([key, FLUSH_GENERATION_KEY, FLUSH_LOCK_KEY])
+            except Exception:
+                return stored
+            value = stored + (values.get(key) or 0)
+            if values.get(FLUSH_GENERATION_KEY) == generation and FLUSH_LOCK_KEY not in values:
+                break
+            time.sleep(0.005 * (attempt + 1))
+        return value
+
+    def pending(self, model, pks, field):
+        """Return ``{pk: delta}`` of the unflushed changes to ``field``"""
+        keys = {counter_key(model, pk, field): pk for pk in pks}
+        try:
+            values = self.cache.get_many(list(keys))
+        except Exception:
+            return {}
+        return {keys[key]: value for key, value in values.items() if value}
+
+    def apply_pending(self, objects, fields=None):
+        """Add the pending deltas to the counter attributes of model instances, in place"""
+        objects = [obj for obj in objects if obj is not None]
+        if not objects:
+            return objects
+
+        model = type(objects[0])
+        fields = fields or BUFFERED_FIELDS.get(model._meta.label_lower, ())
+        keys = {counter_key(model, obj.pk, field): (obj, field) for obj in objects for field in fields}
+        try:
+            values = self.cache.get_many(list(keys))
+        except Exception:
+            return objects
+
+        for key, value in values.items():
+            if value:
+                obj, field = keys[key]
+                setattr(obj, field, getattr(obj, field) + value)
+        return objects
+
+    def discard(self, model, pks, field):
+        """Drop the pending deltas of counters about to be recomputed from scratch"""
+        try:
+            self.cache.delete_many([counter_key(model, pk, field) for pk in pks])
+        except Exception:
+            pass
+
+    def flush_if_due(self):
+        interval = getattr(settings, 'COUNTER_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+        if time.monotonic() - self.last_flush >= interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Write pending deltas to the database and return how many counters changed.
+
+        Deltas are read, applied with one UPDATE per model and field, then
+        subtracted from the cache, so increments arriving meanwhile stay
+        pending for the next flush. One process flushes at a time.
+        """
+        self.last_flush = time.monotonic()
+        cache = self.cache
+        try:
+            if not cache.add(FLUSH_LOCK_KEY, 1, LOCK_TIMEOUT):
+                return 0
+        except Exception:
+            return 0
+
+        try:
+            with self.lock:
+                keys = self.dirty | set(cache.get(REGISTRY_KEY) or ())
+            values = {key: value for key, value in cache.get_many(list(keys)).items() if value}
+
+            changes = defaultdict(dict)
+            for key, value in values.items():
+                model, pk, field = parse_key(key)
+                changes[(model, field)][pk] = value
+
+            if changes:
+                with transaction.atomic():
+                    for (model, field), deltas in changes.items():
+                        whens = [When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()]
+                        model.objects.filter(pk__in=deltas).update(
+                            **{field: F(field) + Case(*whens, default=Value(0), output_field=IntegerField())}
+                        )
+
+            for key, value in values.items():
+                try:
+                    cache.decr(key, value)
+                except ValueError:
+                    # Gone (evicted): its delta is in the database already
+                    logger.warning('Counter %s disappeared from the cache during a flush', key)
+            if values:
+                # Tells value() readers that deltas moved to the database
+                self._cache_incr(FLUSH_GENERATION_KEY, 1)
+
+            # Forget counters with nothing pending; holding the lock makes a
+            # concurrent increment in this process mark its key again
+            with self.lock:
+                remaining = cache.get_many(list(keys))
+                idle = {key for key in keys if not remaining.get(key)}
+                self.dirty -= idle
+            self._unregister(idle)
+            return len(values)
+        finally:
+            cache.delete(FLUSH_LOCK_KEY)
+
+    def _cache_incr(self, key, delta):
+        cache = self.cache
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # Missing key; another process may create it first
+            if not cache.add(key, delta, timeout=None):
+                cache.incr(key, delta)
+
+    def _mark_dirty(self, key):
+        with self.lock:
+            if key in self.dirty:
+                return
+            self.dirty.add(key)
+        # Let the flush_counters command (or any process) find the key
+        self._update_registry(lambda registry: registry | {key})
+
+    def _unregister(self, keys):
+        if keys:
+            self._update_registry(lambda registry: registry - keys)
+
+    def _update_registry(self, change):
+        cache = self.cache
+        for _ in range(50):
+            if cache.add(REGISTRY_LOCK_KEY, 1, LOCK_TIMEOUT):
+                try:
+                    cache.set(REGISTRY_KEY, change(set(cache.get(REGISTRY_KEY) or ())), timeout=None)
+                finally:
+                    cache.delete(REGISTRY_LOCK_KEY)
+                return
+            time.sleep(0.01)
+        # Still in this process's dirty set, so its own flushes pick it up
+        logger.warning('Could not update the counter registry')
+
+
+counter_buffer = CounterBuffer()
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        counter_buffer.flush()
+    except Exception:
+        logger.exception('Could not flush buffered counters at exit')
@@ -0,0 +1,21 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from sports_league_backend.imaging import VariantImageField, build_variants
+
+
+class Command(BaseCommand):
+    help = 'Build resized variants of post images, team logos and avatars that have none yet'
+
+    def handle(self, *args, **options):
+        built = 0
+        for model in apps.get_models():
+            for field in model._meta.fields:
+                if not isinstance(field, VariantImageField) or not field.variants_field:
+                    continue
+                rows = model.objects.exclude(**{field.name: ''}).exclude(**{f'{field.name}__isnull': True})
+                for pk, name, variants in rows.values_list('pk', field.name, field.variants_field).iterator():
+                    if (variants or {}).get('source') != name:
+                        build_variants(model._meta.label, pk, field.name, name)
+                        built += 1
+        self.stdout.write(self.style.SUCCESS(f"{built} images processed."))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from community.counters import counter_buffer
+
+
+class Command(BaseCommand):
+    help = 'Write buffered engagement counters (likes, shares, views) to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='Keep running, flushing every INTERVAL seconds')
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            flushed = counter_buffer.flush()
+            if options['verbosity'] > 1 or interval is None:
+                self.stdout.write(self.style.SUCCESS(f"{flushed} counters flushed."))
+            if interval is None:
+                return
+            time.sleep(interval)
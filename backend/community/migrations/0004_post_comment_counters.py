@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:56
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(field)
+        .annotate(total=Count('id')).values('total')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('community', 'Post')
+    Comment = apps.get_model('community', 'Comment')
+    Post.objects.update(
+        likes_count=_count(Post.likes.through, 'post_id'),
+        comments_count=_count(Comment, 'post_id'),
+    )
+    Comment.objects.update(likes_count=_count(Comment.likes.through, 'comment_id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0003_cursor_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
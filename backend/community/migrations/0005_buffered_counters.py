@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0004_post_comment_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='views_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='likes_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='likes_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
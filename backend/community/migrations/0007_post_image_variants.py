@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:11
+
+from django.db import migrations, models
+import sports_league_backend.imaging
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0006_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postimage',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='postimage',
+            name='image',
+            field=sports_league_backend.imaging.VariantImageField(upload_to='post_images/', variants=(320, 640, 1280), variants_field='image_variants'),
+        ),
+    ]
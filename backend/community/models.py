@@ -1,6 +1,7 @@
 from django.db import models
 from django.conf import settings
 from teams.models import Team
+from sports_league_backend.imaging import VariantImageField
 
 class Post(models.Model):
     """Community post model"""
@@ -18,21 +19,29 @@ class Post(models.Model):
     # Shares
     shares_count = models.IntegerField(default=0)
     
+    # Kept current by community.signals; likes, shares and views may also
+    # have increments pending in community.counters. Likes are signed: with
+    # per-process buffers an unlike can be flushed before its like.
+    likes_count = models.IntegerField(default=0, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    views_count = models.PositiveIntegerField(default=0, editable=False)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='post_created_idx'),
+            # Home feeds read the newest posts of some teams and authors
+            models.Index(fields=['team', 'created_at', 'id'], name='post_team_created_idx'),
+            models.Index(fields=['author', 'created_at', 'id'], name='post_author_created_idx'),
+        ]
+    
     def __str__(self):
         return f"Post by {self.author.username} at {self.created_at}"
-    
-    @property
-    def likes_count(self):
-        return self.likes.count()
-    
-    @property
-    def comments_count(self):
-        return self.comments.count()
 
 class PostImage(models.Model):
     """Images attached to posts"""
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='post_images/')
+    image = VariantImageField(upload_to='post_images/', variants=(320, 640, 1280), variants_field='image_variants')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     alt_text = models.CharField(max_length=255, blank=True)
     
     def __str__(self):
@@ -52,12 +61,11 @@ class Comment(models.Model):
     # Parent comment for replies
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
     
+    # Kept current by community.signals and community.counters
+    likes_count = models.IntegerField(default=0, editable=False)
+    
     def __str__(self):
         return f"Comment by {self.author.username} at {self.created_at}"
-    
-    @property
-    def likes_count(self):
-        return self.likes.count()
 
 class Event(models.Model):
     """Community event model"""
@@ -77,9 +85,17 @@ class Event(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'time', 'id'], name='event_date_time_idx'),
+        ]
+    
     def __str__(self):
         return self.title
     
+    # Uses the num_attendees annotation when present
     @property
     def attendees_count(self):
+        if hasattr(self, 'num_attendees'):
+            return self.num_attendees
         return self.attendees.count()
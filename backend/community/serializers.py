@@ -1,14 +1,32 @@
 from rest_framework import serializers
 from .models import Post, PostImage, Comment, Event
+from .counters import counter_buffer
 from users.serializers import UserSerializer
 from teams.serializers import TeamSerializer
+from sports_league_backend.imaging import SrcsetField
+
+class EditedFieldsMixin:
+    """
+    Save only the fields an update changed.
+    
+    Counter columns are changed with F() updates and by the counter buffer;
+    saving the whole row would write back the counts read with it.
+    """
+    
+    def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
 
 class PostImageSerializer(serializers.ModelSerializer):
+    srcset = SrcsetField('image', source='*')
+    
     class Meta:
         model = PostImage
-        fields = ['id', 'image', 'alt_text']
+        fields = ['id', 'image', 'srcset', 'alt_text']
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(EditedFieldsMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     likes_count = serializers.IntegerField(read_only=True)
     
@@ -21,18 +39,19 @@ class CommentSerializer(serializers.ModelSerializer):
         user = self.context['request'].user
         return Comment.objects.create(author=user, **validated_data)
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(EditedFieldsMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     team = TeamSerializer(read_only=True)
     team_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
     images = PostImageSerializer(many=True, read_only=True)
     likes_count = serializers.IntegerField(read_only=True)
     comments_count = serializers.IntegerField(read_only=True)
+    views_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Post
         fields = ['id', 'author', 'content', 'team', 'team_id', 'created_at', 'updated_at', 
-                  'images', 'likes_count', 'comments_count', 'shares_count']
+                  'images', 'likes_count', 'comments_count', 'shares_count', 'views_count']
         read_only_fields = ['id', 'created_at', 'updated_at', 'shares_count']
     
     def create(self, validated_data):
@@ -47,8 +66,8 @@ class PostDetailSerializer(PostSerializer):
     
     def get_comments(self, obj):
         # Only get top-level comments (no parent)
-        comments = obj.comments.filter(parent=None).order_by('-created_at')
-        return CommentSerializer(comments, many=True).data
+        comments = obj.comments.filter(parent=None).select_related('author__profile').order_by('-created_at')
+        return CommentSerializer(counter_buffer.apply_pending(list(comments)), many=True).data
 
 class EventSerializer(serializers.ModelSerializer):
     organizer = UserSerializer(read_only=True)
@@ -0,0 +1,92 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from leagues.models import League
+from teams.models import TeamMember
+from .counters import counter_buffer
+from .models import Comment, Post
+from .timelines import fan_out, invalidate_timeline
+
+
+def recount_likes(model, ids):
+    """Recount ``likes_count`` of the ``model`` rows in ``ids`` from their likes table"""
+    through = model.likes.through
+    fk_name = f'{model._meta.model_name}_id'
+    likes = (through.objects.filter(**{fk_name: OuterRef('pk')})
+             .order_by().values(fk_name).annotate(total=Count('id')).values('total'))
+    counter_buffer.discard(model, ids, 'likes_count')
+    model.objects.filter(pk__in=ids).update(likes_count=Coalesce(Subquery(likes), 0))
+
+
+def _likes_changed(model, instance, action, reverse, pk_set):
+    if action == 'pre_clear' and reverse:
+        # pk_set is not sent with clear(), so remember what the user liked
+        fk_name = f'{model._meta.model_name}_id'
+        instance._cleared_likes = list(model.likes.through.objects.filter(user_id=instance.pk)
+                                       .values_list(fk_name, flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            ids = [instance.pk]
+        elif action == 'post_clear':
+            ids = getattr(instance, '_cleared_likes', [])
+        else:
+            ids = pk_set
+        if ids:
+            # A recount rather than +/- len(pk_set): add() skips existing likes
+            recount_likes(model, ids)
+
+
+@receiver(m2m_changed, sender=Post.likes.through)
+def post_likes_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    _likes_changed(Post, instance, action, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=Comment.likes.through)
+def comment_likes_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    _likes_changed(Comment, instance, action, reverse, pk_set)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Post.objects.filter(pk=instance.post_id).update(comments_count=F('comments_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id, comments_count__gt=0).update(comments_count=F('comments_count') - 1)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(lambda: fan_out(instance))
+
+
+@receiver(post_save, sender=TeamMember)
+@receiver(post_delete, sender=TeamMember)
+def team_membership_changed(sender, instance, **kwargs):
+    invalidate_timeline(instance.user_id)
+
+
+@receiver(m2m_changed, sender=League.followers.through)
+def league_followers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and not reverse:
+        invalidate_timeline(*instance.followers.values_list('id', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_timeline(*([instance.pk] if reverse else pk_set or ()))
+
+
+@receiver(m2m_changed, sender=League.teams.through)
+def league_teams_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Followers of the league now see a different set of teams
+    if action in ('pre_clear', 'post_add', 'post_remove'):
+        if reverse:
+            league_ids = pk_set if pk_set is not None else instance.leagues.values_list('id', flat=True)
+        else:
+            league_ids = [instance.pk]
+        followers = League.followers.through.objects.filter(league_id__in=list(league_ids))
+        invalidate_timeline(*set(followers.values_list('user_id', flat=True)))
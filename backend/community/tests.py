@@ -0,0 +1,474 @@
+import shutil
+import tempfile
+from datetime import date, time
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError
+from django.test import override_settings
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from leagues.models import League
+from teams.models import Team, TeamMember
+from . import timelines
+from .counters import counter_buffer
+from .models import Comment, Event, Post, PostImage
+
+User = get_user_model()
+
+
+class PostCounterTests(APITestCase):
+    """Like and comment counters follow every way of changing likes and comments"""
+
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f'user{i}', email=f'user{i}@test.com', password='password')
+                      for i in range(4)]
+        self.post = Post.objects.create(author=self.users[0], content='Match report')
+
+    def assert_counts(self, post, likes, comments):
+        post.refresh_from_db()
+        self.assertEqual((post.likes_count, post.comments_count), (likes, comments))
+        self.assertEqual((post.likes.count(), post.comments.count()), (likes, comments))
+
+    def test_post_likes(self):
+        self.post.likes.add(*self.users)
+        self.post.likes.add(self.users[0])
+        self.assert_counts(self.post, 4, 0)
+
+        self.post.likes.remove(self.users[1])
+        self.assert_counts(self.post, 3, 0)
+
+        self.users[2].liked_posts.clear()
+        self.assert_counts(self.post, 2, 0)
+
+        self.users[1].liked_posts.add(self.post)
+        self.post.likes.clear()
+        self.assert_counts(self.post, 0, 0)
+
+    def test_comment_likes(self):
+        comment = Comment.objects.create(post=self.post, author=self.users[1], content='Great game')
+        comment.likes.add(*self.users[:3])
+        self.users[0].liked_comments.remove(comment)
+        comment.refresh_from_db()
+        self.assertEqual(comment.likes_count, 2)
+
+    def test_comments(self):
+        comment = Comment.objects.create(post=self.post, author=self.users[1], content='Great game')
+        Comment.objects.create(post=self.post, author=self.users[2], content='Agreed', parent=comment)
+        Comment.objects.create(post=self.post, author=self.users[3], content='Well played')
+        self.assert_counts(self.post, 0, 3)
+
+        # Deleting a comment deletes its replies too
+        comment.delete()
+        self.assert_counts(self.post, 0, 1)
+
+
+class FeedQueryTests(APITestCase):
+    """A feed page must not run per-post queries"""
+
+    def setUp(self):
+        users = [User.objects.create_user(username=f'user{i}', email=f'user{i}@test.com', password='password')
+                 for i in range(5)]
+        teams = [Team.objects.create(name=f'Team {i}', sport='Soccer') for i in range(3)]
+        for team, user in zip(teams, users):
+            TeamMember.objects.create(team=team, user=user, role='coach')
+
+        for i in range(25):
+            post = Post.objects.create(author=users[i % 5], content=f'Post {i}', team=teams[i % 3] if i % 2 else None)
+            post.likes.add(*users[:i % 4])
+            PostImage.objects.create(post=post, image=f'post_images/{i}.jpg')
+            for j in range(i % 3):
+                Comment.objects.create(post=post, author=users[j], content='Nice')
+
+        self.client.force_authenticate(users[0])
+
+    def test_feed_page_query_count_is_constant(self):
+        # Paginator COUNT, posts with authors, teams and their coaches, images
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/community/posts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 20)
+
+        for item in response.data['results']:
+            post = Post.objects.get(id=item['id'])
+            self.assertEqual(item['likes_count'], post.likes.count())
+            self.assertEqual(item['comments_count'], post.comments.count())
+            self.assertEqual(len(item['images']), 1)
+
+
+class ToggleTests(APITestCase):
+    """Toggles and shares report the new state and count"""
+
+    def setUp(self):
+        counter_buffer.cache.clear()
+        self.author = User.objects.create_user(username='author', email='author@test.com', password='password')
+        self.fan = User.objects.create_user(username='fan', email='fan@test.com', password='password')
+        self.post = Post.objects.create(author=self.author, content='Match report')
+        self.comment = Comment.objects.create(post=self.post, author=self.author, content='Great game')
+        self.event = Event.objects.create(title='Final', description='Cup final', date=date.today(),
+                                          time=time(18, 0), location='Stadium', organizer=self.author)
+        self.post.likes.add(self.author)
+        self.client.force_authenticate(self.fan)
+
+    def test_post_like_toggle(self):
+        url = f'/api/community/posts/{self.post.id}/like/'
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['liked'], response.data['likes_count']), (True, 2))
+
+        response = self.client.post(url)
+        self.assertEqual((response.data['liked'], response.data['likes_count']), (False, 1))
+        counter_buffer.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertEqual(list(self.post.likes.all()), [self.author])
+
+    def test_comment_like_toggle(self):
+        url = f'/api/community/comments/{self.comment.id}/like/'
+        self.assertEqual(self.client.post(url).data['likes_count'], 1)
+        self.assertEqual(self.client.post(url).data['likes_count'], 0)
+        self.assertEqual(self.client.post(url).data['liked'], True)
+
+    def test_share(self):
+        url = f'/api/community/posts/{self.post.id}/share/'
+        self.assertEqual([self.client.post(url).data['shares_count'] for _ in range(3)], [1, 2, 3])
+        counter_buffer.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.shares_count, 3)
+
+    def test_attend_toggle(self):
+        url = f'/api/community/events/{self.event.id}/attend/'
+        response = self.client.post(url)
+        self.assertEqual((response.data['attending'], response.data['attendees_count']), (True, 1))
+        response = self.client.post(url)
+        self.assertEqual((response.data['attending'], response.data['attendees_count']), (False, 0))
+
+
+@override_settings(COUNTER_FLUSH_INTERVAL=3600)
+class CounterBufferTests(APITestCase):
+    """Buffered counters reach the database in batches, and straight away without a cache"""
+
+    def setUp(self):
+        counter_buffer.cache.clear()
+        self.user = User.objects.create_user(username='fan', email='fan@test.com', password='password')
+        self.posts = [Post.objects.create(author=self.user, content=f'Post {i}') for i in range(3)]
+        self.client.force_authenticate(self.user)
+
+    def test_increments_are_buffered_until_flushed(self):
+        for post in self.posts:
+            for _ in range(post.id):
+                self.client.post(f'/api/community/posts/{post.id}/share/')
+            self.client.get(f'/api/community/posts/{post.id}/')
+        self.assertFalse(Post.objects.filter(shares_count__gt=0).exists())
+
+        # Reads include the pending deltas
+        response = self.client.get('/api/community/posts/')
+        self.assertEqual({item['id']: item['shares_count'] for item in response.data['results']},
+                         {post.id: post.id for post in self.posts})
+        self.assertEqual(response.data['results'][0]['views_count'], 1)
+
+        self.assertEqual(counter_buffer.flush(), 6)
+        for post in Post.objects.all():
+            self.assertEqual((post.shares_count, post.views_count), (post.id, 1))
+        self.assertEqual(counter_buffer.pending(Post, [post.id for post in self.posts], 'shares_count'), {})
+
+        # Nothing left to write
+        self.assertEqual(counter_buffer.flush(), 0)
+
+    def test_due_flush_runs_on_increment(self):
+        with self.settings(COUNTER_FLUSH_INTERVAL=0):
+            self.client.post(f'/api/community/posts/{self.posts[0].id}/share/')
+        self.posts[0].refresh_from_db()
+        self.assertEqual(self.posts[0].shares_count, 1)
+
+    def test_flush_errors_do_not_fail_requests(self):
+        with self.settings(COUNTER_FLUSH_INTERVAL=0), self.assertLogs('community.counters', 'ERROR'), \
+                mock.patch.object(counter_buffer, 'flush', side_effect=DatabaseError):
+            response = self.client.post(f'/api/community/posts/{self.posts[0].id}/share/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['shares_count'], 1)
+
+    def test_value_is_not_counted_twice_during_a_flush(self):
+        post = self.posts[0]
+        self.client.post(f'/api/community/posts/{post.id}/share/')
+        get_many = counter_buffer.cache.get_many
+        calls = []
+
+        def flush_first(keys):
+            # A flush lands between reading the row and the pending delta
+            if not calls:
+                calls.append(keys)
+                counter_buffer.flush()
+            return get_many(keys)
+
+        with mock.patch.object(counter_buffer.cache, 'get_many', side_effect=flush_first):
+            self.assertEqual(counter_buffer.value(Post, post.id, 'shares_count'), 1)
+        post.refresh_from_db()
+        self.assertEqual(post.shares_count, 1)
+
+    def test_edits_do_not_save_pending_counts(self):
+        post = self.posts[0]
+        for _ in range(3):
+            self.client.post(f'/api/community/posts/{post.id}/share/')
+        comment = Comment.objects.create(post=post, author=self.user, content='First')
+        self.client.post(f'/api/community/comments/{comment.id}/like/')
+
+        response = self.client.patch(f'/api/community/posts/{post.id}/', {'content': 'Edited'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.put(f'/api/community/comments/{comment.id}/', {'content': 'Edited'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(f'/api/community/comments/{comment.id}/').data['likes_count'], 1)
+
+        counter_buffer.flush()
+        post.refresh_from_db()
+        comment.refresh_from_db()
+        self.assertEqual((post.content, post.shares_count), ('Edited', 3))
+        self.assertEqual((comment.content, comment.likes_count), ('Edited', 1))
+
+    def test_many_counters_are_not_evicted(self):
+        posts = Post.objects.bulk_create([Post(author=self.user, content=f'Bulk {i}') for i in range(400)])
+        for post in posts:
+            counter_buffer.add(Post, post.id, 'shares_count')
+        self.assertEqual(counter_buffer.flush(), 400)
+        self.assertEqual(Post.objects.filter(shares_count=1).count(), 400)
+
+    def test_counter_evicted_during_a_flush_is_not_applied_twice(self):
+        post = self.posts[0]
+        for _ in range(2):
+            self.client.post(f'/api/community/posts/{post.id}/share/')
+        counters = counter_buffer.cache
+        decr = counters.decr
+
+        def evicted(key, delta):
+            counters.delete(key)
+            return decr(key, delta)
+
+        with mock.patch.object(counters, 'decr', side_effect=evicted), self.assertLogs('community.counters', 'WARNING'):
+            self.assertEqual(counter_buffer.flush(), 1)
+        self.assertEqual(counter_buffer.flush(), 0)
+        post.refresh_from_db()
+        self.assertEqual(post.shares_count, 2)
+
+    def test_writes_through_without_cache(self):
+        with mock.patch.object(counter_buffer.cache, 'incr', side_effect=ConnectionError), \
+                self.assertLogs('community.counters'):
+            response = self.client.post(f'/api/community/posts/{self.posts[0].id}/share/')
+        self.assertEqual(response.data['shares_count'], 1)
+        self.posts[0].refresh_from_db()
+        self.assertEqual(self.posts[0].shares_count, 1)
+
+
+class HomeFeedTests(APITestCase):
+    """The home feed shows the posts of the user's teams and followed leagues, newest first"""
+
+    def setUp(self):
+        cache.clear()
+        self.fan = User.objects.create_user(username='fan', email='fan@test.com', password='password')
+        self.other = User.objects.create_user(username='other', email='other@test.com', password='password')
+        self.teams = [Team.objects.create(name=f'Team {i}', sport='Soccer') for i in range(4)]
+        TeamMember.objects.create(team=self.teams[0], user=self.fan, role='player')
+        self.league = League.objects.create(
+            name='League', sport='Soccer', season='2024',
+            start_date=date(2024, 1, 1), end_date=date(2024, 12, 31), organizer=self.other,
+        )
+        self.league.teams.add(self.teams[1])
+
+        for i in range(30):
+            Post.objects.create(author=self.other, content=f'Post {i}', team=self.teams[i % 4])
+        Post.objects.create(author=self.fan, content='My post')
+        self.client.force_authenticate(self.fan)
+
+    def expected(self):
+        teams = list(TeamMember.objects.filter(user=self.fan).values_list('team', flat=True))
+        teams += self.fan.followed_leagues.values_list('teams', flat=True)
+        posts = Post.objects.filter(team__in=teams) | Post.objects.filter(author=self.fan)
+        return list(posts.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def get_ids(self):
+        response = self.client.get('/api/community/feed/')
+        self.assertEqual(response.status_code, 200)
+        ids = [item['id'] for item in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            ids += [item['id'] for item in response.data['results']]
+        return ids
+
+    def follow(self):
+        response = self.client.post(f'/api/leagues/{self.league.id}/follow/')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_feed_follows_memberships_and_leagues(self):
+        self.assertEqual(self.get_ids(), self.expected())
+        self.assertEqual(self.follow().data['following'], True)
+        self.assertEqual(len(self.get_ids()), 17)
+        self.assertEqual(self.get_ids(), self.expected())
+
+        self.assertEqual(self.follow().data['following'], False)
+        TeamMember.objects.create(team=self.teams[2], user=self.fan, role='player')
+        self.assertEqual(len(self.get_ids()), 16)
+        self.assertEqual(self.get_ids(), self.expected())
+
+    def test_new_posts_are_fanned_out(self):
+        self.follow()
+        self.get_ids()
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(author=self.other, content='New', team=self.teams[1])
+            Post.objects.create(author=self.other, content='Elsewhere', team=self.teams[3])
+        self.assertEqual(cache.get(timelines.timeline_key(self.fan.id))['positions'][0][1], post.id)
+        self.assertEqual(self.get_ids(), self.expected())
+
+    def test_popular_teams_are_merged_on_read(self):
+        self.get_ids()
+        with mock.patch.object(timelines, 'FANOUT_LIMIT', 0), self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(author=self.other, content='Hot', team=self.teams[0])
+        self.assertEqual(timelines.popular_teams([team.id for team in self.teams]), {self.teams[0].id})
+        cached = [post_id for _, post_id in cache.get(timelines.timeline_key(self.fan.id))['positions']]
+        self.assertNotIn(post.id, cached)
+        self.assertEqual(self.get_ids(), self.expected())
+
+    def test_fan_out_keeps_expiry(self):
+        self.get_ids()
+        expires = cache.get(timelines.timeline_key(self.fan.id))['expires']
+        with mock.patch.object(timelines.time, 'time', return_value=expires - 1), \
+                self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(author=self.other, content='New', team=self.teams[0])
+        timeline = cache.get(timelines.timeline_key(self.fan.id))
+        self.assertEqual(timeline['positions'][0][1], post.id)
+        self.assertEqual(timeline['expires'], expires)
+
+    def test_feed_requires_authentication(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/community/feed/').status_code, 401)
+
+    def test_page_query_count_is_constant(self):
+        self.get_ids()
+        # Cached timeline: posts with authors, teams and their coaches, images
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/community/feed/')
+        self.assertEqual(len(response.data['results']), 9)
+
+
+@override_settings(IMAGE_VARIANTS_ASYNC=False)
+class ImageVariantTests(APITestCase):
+    """Uploads are stored once per content and get resized WebP and JPEG variants"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        # Post views are buffered in the cache
+        counter_buffer.cache.clear()
+        self.addCleanup(counter_buffer.cache.clear)
+
+        self.user = User.objects.create_user(username='author', email='author@test.com', password='password')
+        self.post = Post.objects.create(author=self.user, content='Match report')
+        self.client.force_authenticate(self.user)
+
+    def upload(self, size, color='red'):
+        buffer = BytesIO()
+        Image.new('RGB', size, color).save(buffer, 'JPEG')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/community/posts/{self.post.id}/add_image/',
+                                        {'image': SimpleUploadedFile('photo.JPG', buffer.getvalue())})
+        self.assertEqual(response.status_code, 201)
+        return PostImage.objects.get(id=response.data['id'])
+
+    def test_variants_are_built(self):
+        image = self.upload((2000, 1000))
+        self.assertRegex(image.image.name, r'^post_images/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(image.image_variants, {'source': image.image.name, 'widths': [320, 640, 1280]})
+
+        name = image.image.name[:-len('.jpg')]
+        with default_storage.open(f'{name}.640w.webp') as variant, Image.open(variant) as resized:
+            self.assertEqual((resized.format, resized.size), ('WEBP', (640, 320)))
+        self.assertTrue(default_storage.exists(f'{name}.1280w.jpeg'))
+
+        srcset = self.client.get(f'/api/community/posts/{self.post.id}/').data['images'][0]['srcset']
+        self.assertEqual(srcset['webp'].split(', ')[0], f'http://testserver/media/{name}.320w.webp 320w')
+        self.assertIn('.1280w.jpeg 1280w', srcset['jpeg'])
+
+    def test_small_images_are_not_enlarged(self):
+        image = self.upload((500, 500))
+        self.assertEqual(image.image_variants['widths'], [320, 500])
+
+    def test_duplicate_uploads_are_stored_once(self):
+        first, second = self.upload((800, 600)), self.upload((800, 600))
+        self.assertEqual(first.image.name, second.image.name)
+        # The original and three widths in two formats
+        self.assertEqual(len(default_storage.listdir(first.image.name.rsplit('/', 1)[0])[1]), 7)
+        self.assertNotEqual(self.upload((800, 600), 'blue').image.name, first.image.name)
+
+
+class CommentThreadTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='fan', email='fan@test.com', password='password')
+        self.post = Post.objects.create(author=self.user, content='Match report')
+        # Created in this order, so t1 is the oldest top-level comment:
+        # t1 > (r1 > r1a > r1a1, r2), t2 > r3
+        self.comments = {}
+        for name, parent in (('t1', None), ('r1', 't1'), ('t2', None), ('r2', 't1'),
+                             ('r1a', 'r1'), ('r3', 't2'), ('r1a1', 'r1a')):
+            self.comments[name] = Comment.objects.create(post=self.post, author=self.user, content=name,
+                                                         parent=self.comments.get(parent))
+        self.client.force_authenticate(self.user)
+
+    def thread(self, **params):
+        response = self.client.get(f'/api/community/posts/{self.post.id}/thread/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def tree(self, nodes):
+        """``(content, replies_count, [replies])`` of each node"""
+        return [(node['content'], node['replies_count'], self.tree(node['replies'])) for node in nodes]
+
+    def test_whole_thread(self):
+        # The post and its images, then all of its comments at once
+        with self.assertNumQueries(3):
+            data = self.thread()
+        self.assertEqual((data['count'], data['returned'], data['truncated']), (7, 7, False))
+        # Newest top-level comment first, replies in conversation order
+        self.assertEqual(self.tree(data['comments']), [
+            ('t2', 1, [('r3', 0, [])]),
+            ('t1', 2, [('r1', 1, [('r1a', 1, [('r1a1', 0, [])])]), ('r2', 0, [])]),
+        ])
+
+    def test_depth(self):
+        data = self.thread(depth=2)
+        self.assertEqual((data['count'], data['returned'], data['truncated']), (7, 5, True))
+        # Replies cut off below the depth still count
+        self.assertEqual(self.tree(data['comments']), [
+            ('t2', 1, [('r3', 0, [])]),
+            ('t1', 2, [('r1', 1, []), ('r2', 0, [])]),
+        ])
+
+    def test_limit_prefers_shallow_comments(self):
+        data = self.thread(limit=3)
+        self.assertEqual((data['returned'], data['truncated']), (3, True))
+        self.assertEqual(self.tree(data['comments']), [('t2', 1, [('r3', 0, [])]), ('t1', 2, [])])
+
+    def test_root(self):
+        data = self.thread(root=self.comments['r1'].id)
+        self.assertEqual((data['count'], data['returned'], data['truncated']), (2, 2, False))
+        self.assertEqual(self.tree(data['comments']), [('r1a', 1, [('r1a1', 0, [])])])
+
+        data = self.thread(root=self.comments['r1a1'].id)
+        self.assertEqual((data['count'], data['comments'], data['truncated']), (0, [], False))
+
+    def test_invalid_parameters(self):
+        url = f'/api/community/posts/{self.post.id}/thread/'
+        for params in ({'depth': 0}, {'limit': -1}, {'depth': 'all'}, {'root': 'first'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+
+        other = Post.objects.create(author=self.user, content='Other post')
+        elsewhere = Comment.objects.create(post=other, author=self.user, content='elsewhere')
+        self.assertEqual(self.client.get(url, {'root': elsewhere.id}).status_code, 404)
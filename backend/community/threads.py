@@ -0,0 +1,73 @@
+"""
+Comment threads built in memory.
+
+A post's comments are loaded with one query and nested here, instead of
+each comment fetching its replies.
+"""
+from collections import defaultdict
+
+DEFAULT_THREAD_DEPTH = 5
+MAX_THREAD_DEPTH = 50
+DEFAULT_THREAD_SIZE = 500
+MAX_THREAD_SIZE = 5000
+
+
+def select_thread(comments, root_id=None, max_depth=DEFAULT_THREAD_DEPTH, limit=DEFAULT_THREAD_SIZE):
+    """
+    Pick the comments of a thread to show, level by level.
+
+    ``comments`` are all comments of a post ordered oldest first. The thread
+    starts at the replies of ``root_id`` (top-level comments when ``None``,
+    newest first; replies stay in conversation order). Levels deeper than
+    ``max_depth`` are dropped, and once ``limit`` comments are picked the
+    rest are too, so shallow comments always win over deep ones.
+
+    Returns the selected comments (each level after its parents) and the
+    ``{parent_id: [replies]}`` map of the whole post.
+    """
+    children = defaultdict(list)
+    for comment in comments:
+        children[comment.parent_id].append(comment)
+    children[None].reverse()
+
+    selected = []
+    level = children[root_id]
+    depth = 1
+    while level and depth <= max_depth and len(selected) < limit:
+        level = level[:limit - len(selected)]
+        selected.extend(level)
+        level = [reply for comment in level for reply in children[comment.id]]
+        depth += 1
+
+    return selected, children
+
+
+def count_thread(children, root_id=None):
+    """Number of comments below ``root_id``"""
+    total = 0
+    stack = [root_id]
+    while stack:
+        replies = children[stack.pop()]
+        total += len(replies)
+        stack.extend(reply.id for reply in replies)
+    return total
+
+
+def nest_thread(selected, serialized, children, root_id=None):
+    """
+    Nest serialized comments (in the order of ``selected``) under their parents.
+
+    Every node gets ``replies`` and ``replies_count``, the number of direct
+    replies including those left out by the limits.
+    """
+    nodes = {}
+    thread = []
+    for comment, data in zip(selected, serialized):
+        data['replies'] = []
+        data['replies_count'] = len(children[comment.id])
+        nodes[comment.id] = data
+        if comment.parent_id == root_id:
+            thread.append(data)
+        else:
+            nodes[comment.parent_id]['replies'].append(data)
+    return thread
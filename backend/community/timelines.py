@@ -0,0 +1,185 @@
+"""
+Personal home feeds.
+
+A user's feed holds their own posts and the posts of teams they belong to
+or that play in leagues they follow. Rather than querying all of those
+teams on every read, each user has a cached timeline: the positions
+(created_at in microseconds, id) of their newest TIMELINE_SIZE feed posts.
+
+New posts are pushed (fanned out) into the cached timelines of their
+audience once committed. Teams whose audience is larger than FANOUT_LIMIT
+are skipped, as one post would rewrite thousands of timelines; their
+posts are merged in with an indexed query when a feed is read. Timelines
+missing from the cache, or invalidated by a membership or follow change,
+are rebuilt from the database on the next read.
+
+Fan-out and invalidation only reach other worker processes through a
+shared cache. With a process-local cache (the default LocMemCache) other
+workers see new posts and follows once their copy of a timeline expires,
+so timelines live TIMELINE_TIMEOUT seconds from when they are built, 5
+minutes by default. With a shared cache such as Redis it can be raised.
+"""
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+
+from leagues.models import League
+from teams.models import TeamMember
+from .models import Post
+
+TIMELINE_SIZE = 500
+DEFAULT_TIMEOUT = 5 * 60  # Seconds
+FANOUT_LIMIT = 1000
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _cache():
+    return caches[getattr(settings, 'TIMELINE_CACHE', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'TIMELINE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def timeline_key(user_id):
+    return f'timeline:{user_id}'
+
+
+def popular_key(team_id):
+    return f'timeline-popular-team:{team_id}'
+
+
+def post_position(created_at, post_id):
+    """Sortable (microseconds, id) position of a post; exact, unlike a float timestamp"""
+    return ((created_at - EPOCH) // timedelta(microseconds=1), post_id)
+
+
+def position_datetime(micros):
+    return EPOCH + timedelta(microseconds=micros)
+
+
+def feed_team_ids(user_id):
+    """Teams the user belongs to or follows through a league"""
+    members = TeamMember.objects.filter(user_id=user_id).values_list('team_id', flat=True)
+    followed = League.teams.through.objects.filter(league__followers__id=user_id).values_list('team_id', flat=True)
+    return sorted(set(members) | set(followed))
+
+
+def feed_positions(team_ids, user_id=None, before=None, limit=TIMELINE_SIZE):
+    """Positions of the newest posts of ``team_ids`` (and ``user_id``'s own posts) before ``before``"""
+    condition = Q(team_id__in=team_ids)
+    if user_id is not None:
+        condition |= Q(author_id=user_id)
+
+    posts = Post.objects.filter(condition)
+    if before is not None:
+        created_at = position_datetime(before[0])
+        posts = posts.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=before[1]))
+
+    rows = posts.order_by('-created_at', '-id').values_list('created_at', 'id')[:limit]
+    return [post_position(created_at, post_id) for created_at, post_id in rows]
+
+
+def build_timeline(user_id):
+    team_ids = feed_team_ids(user_id)
+    positions = feed_positions(team_ids, user_id)
+    timeline = {
+        'teams': team_ids,
+        'positions': [list(position) for position in positions],
+        # Whether older feed posts exist beyond the timeline
+        'truncated': len(positions) >= TIMELINE_SIZE,
+        # Fan-out keeps this expiry, so a timeline never outlives the
+        # popular team markers set after it was built
+        'expires': time.time() + _timeout(),
+    }
+    _cache().set(timeline_key(user_id), timeline, _timeout())
+    return timeline
+
+
+def get_timeline(user_id):
+    timeline = _cache().get(timeline_key(user_id))
+    if timeline is None or 'expires' not in timeline:
+        return build_timeline(user_id)
+    return timeline
+
+
+def invalidate_timeline(*user_ids):
+    """Drop cached timelines, e.g. after a user joins a team or follows a league"""
+    _cache().delete_many([timeline_key(user_id) for user_id in user_ids])
+
+
+def popular_teams(team_ids):
+    """Those of ``team_ids`` whose recent posts were not fanned out"""
+    markers = _cache().get_many([popular_key(team_id) for team_id in team_ids])
+    return {team_id for team_id in team_ids if popular_key(team_id) in markers}
+
+
+def _audience(post):
+    """User IDs whose feed shows ``post``, or None when the team is too popular to fan out"""
+    audience = {post.author_id}
+    if post.team_id is None:
+        return audience
+
+    members = TeamMember.objects.filter(team_id=post.team_id).values_list('user_id', flat=True)
+    followers = League.followers.through.objects.filter(
+        league__teams__id=post.team_id,
+    ).values_list('user_id', flat=True).distinct()
+    audience.update(members[:FANOUT_LIMIT + 1])
+    audience.update(followers[:FANOUT_LIMIT + 1])
+    return audience if len(audience) <= FANOUT_LIMIT else None
+
+
+def fan_out(post):
+    """Push a new post into the cached timelines of its audience"""
+    cache = _cache()
+    audience = _audience(post)
+    if audience is None:
+        # Outlives every timeline built before this post, which lack it;
+        # a team that stops posting drops out once its marker expires
+        cache.set(popular_key(post.team_id), True, _timeout())
+        audience = {post.author_id}
+
+    # Users without a cached timeline get the post when theirs is built
+    timelines = cache.get_many([timeline_key(user_id) for user_id in audience])
+    if not timelines:
+        return
+    position = list(post_position(post.created_at, post.id))
+    for timeline in timelines.values():
+        positions = timeline['positions']
+        if position in positions:
+            continue
+        positions.append(position)
+        positions.sort(reverse=True)
+        if len(positions) > TIMELINE_SIZE:
+            del positions[TIMELINE_SIZE:]
+            timeline['truncated'] = True
+    remaining = min(timeline.get('expires', 0) for timeline in timelines.values()) - time.time()
+    if remaining > 0:
+        cache.set_many(timelines, remaining)
+
+
+def read_feed(user_id, before=None, limit=20):
+    """
+    Return the positions of up to ``limit`` feed posts older than ``before``.
+
+    The cached timeline is merged with the posts of popular teams (never
+    fanned out) and, past the end of a truncated timeline, with a database
+    query, each bounded by ``limit``.
+    """
+    timeline = get_timeline(user_id)
+    positions = [tuple(position) for position in timeline['positions']]
+    page = [position for position in positions if before is None or position < before][:limit]
+
+    if timeline['truncated'] and len(page) < limit:
+        oldest = min(positions[-1], before) if before is not None else positions[-1]
+        page += feed_positions(timeline['teams'], user_id, before=oldest, limit=limit - len(page))
+
+    hot = popular_teams(timeline['teams'])
+    if hot:
+        page += feed_positions(sorted(hot), before=before, limit=limit)
+
+    return sorted(set(page), reverse=True)[:limit]
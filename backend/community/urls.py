@@ -8,5 +8,6 @@ router.register(r'comments', CommentViewSet)
 router.register(r'events', EventViewSet)
 
 urlpatterns = [
+    path('feed/', PostViewSet.as_view({'get': 'feed'}), name='feed'),
     path('', include(router.urls)),
 ]
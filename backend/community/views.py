@@ -1,15 +1,42 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from django.db import transaction
 from django.db.models import Count
 from .models import Post, PostImage, Comment, Event
 from .serializers import PostSerializer, PostDetailSerializer, CommentSerializer, EventSerializer, PostImageSerializer
 from .permissions import IsAuthorOrReadOnly
+from .counters import counter_buffer
+from .timelines import read_feed
+from .threads import (
+    DEFAULT_THREAD_DEPTH, DEFAULT_THREAD_SIZE, MAX_THREAD_DEPTH, MAX_THREAD_SIZE,
+    select_thread, count_thread, nest_thread
+)
+from teams.models import team_prefetch
+from sports_league_backend.pagination import OptionalCursorPagination
+
+def _toggle(through, **row):
+    """
+    Delete the ``through`` row matching ``row``, or create it if there was none.
+    
+    Returns whether the row exists afterwards and the matching counter
+    change: 0 when a concurrent request inserted the same row first. Must
+    run in a transaction; the DELETE comes first so it takes the write lock.
+    Counter changes go to the counter buffer once the transaction commits.
+    """
+    deleted, _ = through.objects.filter(**row).delete()
+    if deleted:
+        return False, -1
+    _, created = through.objects.get_or_create(**row)
+    return True, 1 if created else 0
 
 class PostViewSet(viewsets.ModelViewSet):
     queryset = Post.objects.all().order_by('-created_at')
     serializer_class = PostSerializer
     permission_classes = [IsAuthorOrReadOnly]
+    pagination_class = OptionalCursorPagination
+    cursor_ordering = ('-created_at', '-id')
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -17,7 +44,7 @@ class PostViewSet(viewsets.ModelViewSet):
         return PostSerializer
     
     def get_queryset(self):
-        queryset = Post.objects.all().order_by('-created_at')
+        queryset = self._posts().order_by(*self.cursor_ordering)
         
         # Filter by team
         team_id = self.request.query_params.get('team_id')
@@ -31,36 +58,87 @@ class PostViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    def _posts(self):
+        # Counters are columns and related rows are fetched in bulk, so a
+        # feed page costs a fixed number of queries
+        return Post.objects.select_related('author__profile').prefetch_related(team_prefetch('team'), 'images')
+    
+    # Buffered likes, shares and views are shown before they are flushed.
+    # Only on reads: objects that get saved must keep the stored counts.
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        return page if page is None else counter_buffer.apply_pending(page)
+    
+    def retrieve(self, request, *args, **kwargs):
+        post = counter_buffer.apply_pending([self.get_object()])[0]
+        counter_buffer.add(Post, post.id, 'views_count')
+        post.views_count += 1
+        return Response(self.get_serializer(post).data)
+    
     def get_serializer_context(self):
         context = super().get_serializer_context()
         return context
     
-    @action(detail=True, methods=['post'])
+    def get_permissions(self):
+        if self.action == 'feed':
+            return [permissions.IsAuthenticated()]
+        return super().get_permissions()
+    
+    # Routed at /api/community/feed/ (see urls.py)
+    def feed(self, request):
+        """
+        The user's home feed: their posts and those of their teams and followed leagues.
+        
+        Newest first, read from the user's cached timeline; follow ``next``
+        for older posts.
+        """
+        before = request.query_params.get('before')
+        if before:
+            try:
+                micros, post_id = (int(value) for value in before.split('_'))
+                before = (micros, post_id)
+            except ValueError:
+                return Response({"detail": "Invalid before cursor."}, status=status.HTTP_400_BAD_REQUEST)
+        
+        page_size = self.paginator.page_size
+        positions = read_feed(request.user.id, before or None, page_size + 1)
+        page = positions[:page_size]
+        
+        posts = self._posts().in_bulk([post_id for _, post_id in page])
+        # Posts deleted since they were added to the timeline are skipped
+        results = counter_buffer.apply_pending([posts[post_id] for _, post_id in page if post_id in posts])
+        
+        next_link = None
+        if len(positions) > page_size:
+            next_link = replace_query_param(request.build_absolute_uri(), 'before', '%d_%d' % page[-1])
+        return Response({"next": next_link, "results": self.get_serializer(results, many=True).data})
+    
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def like(self, request, pk=None):
         post = self.get_object()
-        user = request.user
         
-        if post.likes.filter(id=user.id).exists():
-            post.likes.remove(user)
-            return Response({"detail": "Post unliked."})
-        else:
-            post.likes.add(user)
-            return Response({"detail": "Post liked."})
+        with transaction.atomic():
+            liked, delta = _toggle(Post.likes.through, post_id=post.id, user_id=request.user.id)
+        counter_buffer.add(Post, post.id, 'likes_count', delta)
+        likes_count = counter_buffer.value(Post, post.id, 'likes_count')
+        
+        return Response({"detail": "Post liked." if liked else "Post unliked.",
+                         "liked": liked, "likes_count": likes_count})
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def share(self, request, pk=None):
         post = self.get_object()
-        post.shares_count += 1
-        post.save()
-        return Response({"detail": "Post shared."})
+        counter_buffer.add(Post, post.id, 'shares_count')
+        shares_count = counter_buffer.value(Post, post.id, 'shares_count')
+        return Response({"detail": "Post shared.", "shares_count": shares_count})
     
     @action(detail=True, methods=['get', 'post'])
     def comments(self, request, pk=None):
         post = self.get_object()
         
         if request.method == 'GET':
-            comments = post.comments.filter(parent=None).order_by('-created_at')
-            serializer = CommentSerializer(comments, many=True)
+            comments = post.comments.filter(parent=None).select_related('author__profile').order_by('-created_at')
+            serializer = CommentSerializer(counter_buffer.apply_pending(list(comments)), many=True)
             return Response(serializer.data)
         
         elif request.method == 'POST':
@@ -70,6 +148,43 @@ class PostViewSet(viewsets.ModelViewSet):
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=True, methods=['get'])
+    def thread(self, request, pk=None):
+        """
+        The post's comment tree, nested, from a single comments query.
+        
+        ``depth`` and ``limit`` bound the levels and the number of comments
+        returned; ``root`` returns the replies below one comment, e.g. to
+        expand a branch that was cut off.
+        """
+        post = self.get_object()
+        
+        try:
+            max_depth = min(int(request.query_params.get('depth', DEFAULT_THREAD_DEPTH)), MAX_THREAD_DEPTH)
+            limit = min(int(request.query_params.get('limit', DEFAULT_THREAD_SIZE)), MAX_THREAD_SIZE)
+            root_id = request.query_params.get('root')
+            root_id = int(root_id) if root_id else None
+            if max_depth < 1 or limit < 1:
+                raise ValueError
+        except ValueError:
+            return Response({"detail": "depth, limit and root must be positive integers."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        comments = list(post.comments.select_related('author__profile').order_by('created_at', 'id'))
+        if root_id is not None and not any(comment.id == root_id for comment in comments):
+            return Response({"detail": "Comment not found in this post."}, status=status.HTTP_404_NOT_FOUND)
+        
+        selected, children = select_thread(comments, root_id, max_depth, limit)
+        serialized = CommentSerializer(counter_buffer.apply_pending(selected), many=True).data
+        total = count_thread(children, root_id)
+        
+        return Response({
+            "count": total,
+            "returned": len(selected),
+            "truncated": len(selected) < total,
+            "comments": nest_thread(selected, serialized, children, root_id),
+        })
+    
     @action(detail=True, methods=['post'])
     def add_image(self, request, pk=None):
         post = self.get_object()
@@ -81,25 +196,34 @@ class PostViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class CommentViewSet(viewsets.ModelViewSet):
-    queryset = Comment.objects.all()
+    queryset = Comment.objects.select_related('author__profile')
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticated, IsAuthorOrReadOnly]
     
+    # Pending likes are shown on reads only, as in PostViewSet
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        return page if page is None else counter_buffer.apply_pending(page)
+    
+    def retrieve(self, request, *args, **kwargs):
+        comment = counter_buffer.apply_pending([self.get_object()])[0]
+        return Response(self.get_serializer(comment).data)
+    
     def get_serializer_context(self):
         context = super().get_serializer_context()
         return context
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def like(self, request, pk=None):
         comment = self.get_object()
-        user = request.user
         
-        if comment.likes.filter(id=user.id).exists():
-            comment.likes.remove(user)
-            return Response({"detail": "Comment unliked."})
-        else:
-            comment.likes.add(user)
-            return Response({"detail": "Comment liked."})
+        with transaction.atomic():
+            liked, delta = _toggle(Comment.likes.through, comment_id=comment.id, user_id=request.user.id)
+        counter_buffer.add(Comment, comment.id, 'likes_count', delta)
+        likes_count = counter_buffer.value(Comment, comment.id, 'likes_count')
+        
+        return Response({"detail": "Comment liked." if liked else "Comment unliked.",
+                         "liked": liked, "likes_count": likes_count})
     
     @action(detail=True, methods=['post'])
     def reply(self, request, pk=None):
@@ -115,9 +239,12 @@ class EventViewSet(viewsets.ModelViewSet):
     queryset = Event.objects.all().order_by('date', 'time')
     serializer_class = EventSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OptionalCursorPagination
+    cursor_ordering = ('date', 'time', 'id')
     
     def get_queryset(self):
-        queryset = Event.objects.all().order_by('date', 'time')
+        queryset = (Event.objects.select_related('organizer__profile').prefetch_related(team_prefetch('team'))
+                    .annotate(num_attendees=Count('attendees')).order_by(*self.cursor_ordering))
         
         # Filter by team
         team_id = self.request.query_params.get('team_id')
@@ -142,11 +269,13 @@ class EventViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def attend(self, request, pk=None):
         event = self.get_object()
-        user = request.user
         
-        if event.attendees.filter(id=user.id).exists():
-            event.attendees.remove(user)
-            return Response({"detail": "You are no longer attending this event."})
+        with transaction.atomic():
+            attending, _ = _toggle(Event.attendees.through, event_id=event.id, user_id=request.user.id)
+            attendees_count = event.attendees.count()
+        
+        if attending:
+            detail = "You are now attending this event."
         else:
-            event.attendees.add(user)
-            return Response({"detail": "You are now attending this event."})
+            detail = "You are no longer attending this event."
+        return Response({"detail": detail, "attending": attending, "attendees_count": attendees_count})
@@ -0,0 +1,177 @@
+"""
+Live score broadcasting.
+
+Score changes and game events are published once to a broker, which fans
+them out to every open stream in the process. The backend is chosen with
+the LIVE_SCORES_BROKER setting; the Redis backend relays messages between
+worker processes so each process still broadcasts every message once.
+
+Streams are async generators and are only served under ASGI.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+DEFAULT_BROKER = 'games.live.InProcessBroker'
+SUBSCRIPTION_QUEUE_SIZE = 100
+
+
+def game_channel(game_id):
+    return f'game:{game_id}'
+
+
+def league_channel(league_id):
+    return f'league:{league_id}'
+
+
+class Subscription:
+    """
+    A stream's view of the broker.
+
+    Messages may be published from any thread; they are handed to the
+    subscriber's event loop and queued there. A subscriber that falls too
+    far behind drops its oldest messages rather than blocking publishers.
+    """
+
+    def __init__(self, broker, channels):
+        self.broker = broker
+        self.channels = list(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+
+    def put(self, message):
+        self.loop.call_soon_threadsafe(self._enqueue, message)
+
+    def _enqueue(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Fans messages out to the subscriptions of this process"""
+
+    def __init__(self, **options):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels):
+        """Subscribe to ``channels``; must be called from the subscriber's event loop"""
+        subscription = Subscription(self, channels)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions[channel].discard(subscription)
+                if not self._subscriptions[channel]:
+                    del self._subscriptions[channel]
+
+    def publish(self, channel, message):
+        self.dispatch(channel, message)
+
+    def dispatch(self, channel, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.put(message)
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Shares messages between processes through Redis pub/sub.
+
+    Publishing goes to Redis only; one listener thread per process receives
+    every message and dispatches it to the local subscriptions.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='live:', **options):
+        import redis
+
+        super().__init__()
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url)
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self.pubsub.psubscribe(f'{prefix}*')
+        threading.Thread(target=self._listen, name='live-scores-redis', daemon=True).start()
+
+    def publish(self, channel, message):
+        self.client.publish(self.prefix + channel, json.dumps(message, cls=DjangoJSONEncoder))
+
+    def _listen(self):
+        for item in self.pubsub.listen():
+            channel = item['channel'].decode()[len(self.prefix):]
+            self.dispatch(channel, json.loads(item['data']))
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the process-wide broker configured by LIVE_SCORES_BROKER"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                config = getattr(settings, 'LIVE_SCORES_BROKER', {})
+                broker_class = import_string(config.get('BACKEND', DEFAULT_BROKER))
+                _broker = broker_class(**config.get('OPTIONS', {}))
+    return _broker
+
+
+def _publish(game, message):
+    broker = get_broker()
+    # Plain JSON types only, whichever backend carries the message
+    message = json.loads(json.dumps(message, cls=DjangoJSONEncoder))
+    broker.publish(game_channel(game.id), message)
+    broker.publish(league_channel(game.league_id), message)
+
+
+def score_message(game):
+    return {
+        'type': 'score',
+        'game_id': game.id,
+        'league_id': game.league_id,
+        'status': game.status,
+        'home_score': game.home_score,
+        'away_score': game.away_score,
+        'updated_at': game.updated_at,
+    }
+
+
+def publish_score(game):
+    _publish(game, score_message(game))
+
+
+def publish_events(game, events):
+    """Publish newly recorded game events, one message per event"""
+    for event in events:
+        _publish(game, {
+            'type': 'event',
+            'game_id': game.id,
+            'league_id': game.league_id,
+            'event': {
+                'id': event.id,
+                'time': event.time,
+                'description': event.description,
+                'event_type': event.event_type,
+                'player_id': event.player_id,
+                'data': event.data,
+                'created_at': event.created_at,
+            },
+        })
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameevent',
+            name='client_id',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='gameevent',
+            constraint=models.UniqueConstraint(fields=('game', 'client_id'), name='unique_game_event_client_id'),
+        ),
+    ]
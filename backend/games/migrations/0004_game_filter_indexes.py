@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0003_gameevent_client_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['league', 'date'], name='game_league_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['home_team', 'date'], name='game_home_team_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['away_team', 'date'], name='game_away_team_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['status', 'date'], name='game_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['date', 'time'], name='game_date_time_idx'),
+        ),
+    ]
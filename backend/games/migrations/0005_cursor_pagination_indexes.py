@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0004_game_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='game',
+            name='game_date_time_idx',
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['date', 'time', 'id'], name='game_date_time_idx'),
+        ),
+    ]
@@ -40,6 +40,17 @@ class Game(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        # Back the game list filters, which all narrow by date as well
+        indexes = [
+            models.Index(fields=['league', 'date'], name='game_league_date_idx'),
+            models.Index(fields=['home_team', 'date'], name='game_home_team_date_idx'),
+            models.Index(fields=['away_team', 'date'], name='game_away_team_date_idx'),
+            models.Index(fields=['status', 'date'], name='game_status_date_idx'),
+            # Date-only ranges and the (date, time, id) list and cursor ordering
+            models.Index(fields=['date', 'time', 'id'], name='game_date_time_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.home_team.name} vs {self.away_team.name} - {self.date}"
     
@@ -98,7 +109,15 @@ class GameEvent(models.Model):
     # Additional data as JSON
     data = models.JSONField(default=dict)
     
+    # ID assigned by the recording device, so replayed events are only stored once
+    client_id = models.CharField(max_length=64, null=True, blank=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['game', 'client_id'], name='unique_game_event_client_id'),
+        ]
+    
     def __str__(self):
         return f"{self.event_type} at {self.time} - {self.game}"
@@ -0,0 +1,319 @@
+"""
+Schedule generation for leagues.
+
+Fixtures are built with the circle method so every team plays at most once
+per round, and rounds are then spread over the league's calendar. The
+slot-aware variant also assigns venues and kick-off times without
+double-booking a venue, across every league sharing those venues.
+"""
+import bisect
+import datetime
+import itertools
+import time as timer
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from .models import Game, Venue
+
+DEFAULT_GAME_TIME = datetime.time(18, 0)  # 6:00 PM default
+BULK_BATCH_SIZE = 500
+
+# Games in these states do not occupy their venue
+INACTIVE_STATUSES = ('cancelled', 'postponed')
+
+
+def round_robin_rounds(teams, double=True):
+    """
+    Build matchday rounds using the circle method.
+
+    Returns a list of rounds, each a list of (home_team, away_team) pairs.
+    With an odd number of teams one team sits out each round. When
+    ``double`` is set, a second leg with home and away swapped is appended.
+    """
+    slots = list(teams)
+    if len(slots) < 2:
+        return []
+    if len(slots) % 2:
+        slots.insert(0, None)  # Bye, paired with a different team each round
+
+    fixed, rotating = slots[0], slots[1:]
+    half = len(slots) // 2
+    rounds = []
+
+    for round_number in range(len(slots) - 1):
+        order = [fixed] + rotating
+        pairs = []
+        for i in range(half):
+            first, second = order[i], order[-1 - i]
+            if first is None or second is None:
+                continue
+            # Alternate home advantage so every team gets an even split
+            if (round_number % 2) if i == 0 else (i % 2):
+                first, second = second, first
+            pairs.append((first, second))
+        rounds.append(pairs)
+        rotating = rotating[-1:] + rotating[:-1]
+
+    if double:
+        rounds += [[(away, home) for home, away in pairs] for pairs in rounds]
+
+    return rounds
+
+
+def spread_dates(start_date, end_date, count):
+    """Return ``count`` distinct dates spread evenly from start to end (inclusive)."""
+    span = (end_date - start_date).days
+    if count <= 0 or span < 0:
+        return []
+    count = min(count, span + 1)
+    if count == 1:
+        return [start_date]
+    return [start_date + datetime.timedelta(days=(i * span) // (count - 1)) for i in range(count)]
+
+
+def generate_round_robin(league, teams, game_time=DEFAULT_GAME_TIME, start_date=None):
+    """
+    Create a double round-robin schedule for ``teams`` within ``league``.
+
+    Rounds that do not fit between the start date and ``league.end_date``
+    (one round per day at most) are dropped. All games are written with a
+    single batched insert.
+    """
+    started = timer.perf_counter()
+
+    # Start date is league start date or today if league has already started
+    if start_date is None:
+        start_date = max(league.start_date, datetime.date.today())
+
+    rounds = round_robin_rounds(teams)
+    dates = spread_dates(start_date, league.end_date, len(rounds))
+
+    games = [
+        Game(
+            league=league,
+            home_team=home_team,
+            away_team=away_team,
+            date=game_date,
+            time=game_time,
+        )
+        for game_date, pairs in zip(dates, rounds)
+        for home_team, away_team in pairs
+    ]
+    Game.objects.bulk_create(games, batch_size=BULK_BATCH_SIZE)
+
+    total_games = sum(len(pairs) for pairs in rounds)
+    return {
+        'games_created': len(games),
+        'games_dropped': total_games - len(games),
+        'rounds': len(dates),
+        'rounds_dropped': len(rounds) - len(dates),
+        'elapsed_ms': round((timer.perf_counter() - started) * 1000, 2),
+    }
+
+
+def parse_slots(slots):
+    """
+    Parse ``[{"weekday": 5, "time": "18:00"}, ...]`` into ``{weekday: [times]}``.
+
+    Weekdays follow ``date.weekday()`` (Monday is 0). Raises ``ValueError``
+    on malformed input.
+    """
+    parsed = {}
+    for slot in slots or []:
+        try:
+            weekday = int(slot['weekday'])
+            slot_time = slot['time']
+            if isinstance(slot_time, str):
+                slot_time = datetime.time.fromisoformat(slot_time)
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Invalid slot: {slot!r}")
+        if not 0 <= weekday <= 6:
+            raise ValueError(f"Invalid weekday: {weekday}")
+        parsed.setdefault(weekday, set()).add(slot_time)
+    if not parsed:
+        raise ValueError("At least one time slot is required.")
+    return {weekday: sorted(times) for weekday, times in parsed.items()}
+
+
+class VenueOccupancy:
+    """
+    In-memory index of booked venue slots and team match days.
+
+    Loaded once from existing games (of any league) on the given venues, so
+    placing a game is a set lookup instead of a query.
+    """
+
+    def __init__(self, venue_ids, slots, start_date, end_date):
+        self.venue_ids = list(venue_ids)
+        self.slots = slots
+        self.dates = []
+        day = start_date
+        while day <= end_date:
+            if day.weekday() in slots:
+                self.dates.append(day)
+            day += datetime.timedelta(days=1)
+
+        self.booked = set()
+        self.team_days = set()
+        # Free cells per date let full days be skipped without probing them
+        self.free = {day: len(slots[day.weekday()]) * len(self.venue_ids) for day in self.dates}
+
+        existing = Game.objects.filter(
+            venue_id__in=self.venue_ids, date__range=(start_date, end_date)
+        ).exclude(status__in=INACTIVE_STATUSES).values_list('venue_id', 'date', 'time')
+        for venue_id, game_date, game_time in existing:
+            self.book(venue_id, game_date, game_time)
+
+    def load_team_days(self, team_ids):
+        """Mark the dates on which any of ``team_ids`` already play."""
+        if not self.dates:
+            return
+        team_ids = set(team_ids)
+        games = Game.objects.filter(
+            Q(home_team_id__in=team_ids) | Q(away_team_id__in=team_ids),
+            date__range=(self.dates[0], self.dates[-1]),
+        ).exclude(status__in=INACTIVE_STATUSES).values_list('home_team_id', 'away_team_id', 'date')
+        for home_id, away_id, game_date in games:
+            self.team_days.add((home_id, game_date))
+            self.team_days.add((away_id, game_date))
+
+    def book(self, venue_id, game_date, game_time):
+        key = (venue_id, game_date, game_time)
+        if key in self.booked:
+            return
+        self.booked.add(key)
+        if game_date in self.free and game_time in self.slots.get(game_date.weekday(), ()):
+            self.free[game_date] -= 1
+
+    def index_range(self, start_date, end_date):
+        """Return the [lo, hi) slice of slot dates falling within the given range."""
+        return bisect.bisect_left(self.dates, start_date), bisect.bisect_right(self.dates, end_date)
+
+    def place(self, home_id, away_id, lo, target, hi):
+        """
+        Book a free slot on a date in [lo, hi) when neither team plays.
+
+        Dates from ``target`` onwards are tried first, then earlier ones
+        (latest first) so late rounds are not dropped while room remains.
+        """
+        for day in itertools.chain(self.dates[target:hi], reversed(self.dates[lo:target])):
+            if not self.free[day]:
+                continue
+            if (home_id, day) in self.team_days or (away_id, day) in self.team_days:
+                continue
+            for slot_time in self.slots[day.weekday()]:
+                for venue_id in self.venue_ids:
+                    if (venue_id, day, slot_time) not in self.booked:
+                        self.book(venue_id, day, slot_time)
+                        self.team_days.add((home_id, day))
+                        self.team_days.add((away_id, day))
+                        return venue_id, day, slot_time
+        return None
+
+
+def lock_venues(venue_ids):
+    """
+    Take write locks on venues inside the current transaction.
+
+    As with the score updates' game locks, writing first (rather than
+    SELECT ... FOR UPDATE) also makes SQLite acquire its write lock up
+    front, so concurrent schedules for the same venues run one at a time
+    and each sees the games the other booked.
+    """
+    Venue.objects.filter(pk__in=venue_ids).update(capacity=F('capacity'))
+
+
+@transaction.atomic
+def generate_slotted_schedule(leagues, venue_ids, slots, start_date=None):
+    """
+    Schedule a double round-robin for each league onto venues and time slots.
+
+    Every league shares one ``VenueOccupancy`` index, so no venue is booked
+    twice for the same date and time, including by games that already
+    exist. Rounds are aimed at evenly spread slot dates and move to the
+    nearest later (then earlier) date when their target is full; games that
+    cannot be placed within the league's dates are dropped. Runs in one
+    transaction holding the venues' write locks.
+    """
+    started = timer.perf_counter()
+    today = datetime.date.today()
+    lock_venues(venue_ids)
+
+    league_teams = [(league, list(league.teams.all())) for league in leagues]
+    starts = {league.id: start_date or max(league.start_date, today) for league, _ in league_teams}
+    occupancy = VenueOccupancy(
+        venue_ids,
+        slots,
+        min(starts.values(), default=today),
+        max((league.end_date for league, _ in league_teams), default=today),
+    )
+    occupancy.load_team_days(team.id for _, teams in league_teams for team in teams)
+
+    games = []
+    results = []
+    for league, teams in league_teams:
+        rounds = round_robin_rounds(teams)
+        lo, hi = occupancy.index_range(starts[league.id], league.end_date)
+        created = dropped = 0
+        for round_number, pairs in enumerate(rounds):
+            # Aim each round at an evenly spaced slot date
+            offset = (round_number * (hi - lo - 1)) // max(len(rounds) - 1, 1)
+            for home_team, away_team in pairs:
+                placed = occupancy.place(home_team.id, away_team.id, lo, lo + offset, hi) if hi > lo else None
+                if placed is None:
+                    dropped += 1
+                    continue
+                venue_id, game_date, game_time = placed
+                games.append(Game(
+                    league=league,
+                    home_team=home_team,
+                    away_team=away_team,
+                    venue_id=venue_id,
+                    date=game_date,
+                    time=game_time,
+                ))
+                created += 1
+        results.append({'league_id': league.id, 'games_created': created, 'games_dropped': dropped})
+
+    Game.objects.bulk_create(games, batch_size=BULK_BATCH_SIZE)
+
+    return {
+        'games_created': len(games),
+        'games_dropped': sum(result['games_dropped'] for result in results),
+        'leagues': results,
+        'elapsed_ms': round((timer.perf_counter() - started) * 1000, 2),
+    }
+
+
+def find_venue_conflicts(queryset, league_id=None):
+    """
+    Return venue double-bookings among ``queryset`` games.
+
+    Each conflict lists the venue, date, time and the ids of every game
+    booked into that slot. With ``league_id`` only conflicts involving at
+    least one of that league's games are reported, including clashes with
+    other leagues.
+    """
+    queryset = queryset.exclude(venue=None).exclude(status__in=INACTIVE_STATUSES)
+    clashing = queryset.values('venue_id', 'date', 'time').annotate(games=Count('id')).filter(games__gt=1)
+    conflicts = {(slot['venue_id'], slot['date'], slot['time']): [] for slot in clashing}
+    if not conflicts:
+        return []
+
+    leagues = {}
+    games = queryset.filter(
+        venue_id__in={venue_id for venue_id, _, _ in conflicts},
+        date__in={game_date for _, game_date, _ in conflicts},
+    ).values_list('venue_id', 'date', 'time', 'id', 'league_id').order_by('id')
+    for venue_id, game_date, game_time, game_id, game_league_id in games:
+        key = (venue_id, game_date, game_time)
+        if key in conflicts:
+            conflicts[key].append(game_id)
+            leagues.setdefault(key, set()).add(game_league_id)
+
+    return [
+        {'venue_id': venue_id, 'date': game_date, 'time': game_time, 'game_ids': game_ids}
+        for (venue_id, game_date, game_time), game_ids in sorted(conflicts.items())
+        if league_id is None or int(league_id) in leagues[(venue_id, game_date, game_time)]
+    ]
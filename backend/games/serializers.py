@@ -23,8 +23,12 @@ class GameEventSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = GameEvent
-        fields = ['id', 'time', 'description', 'event_type', 'player', 'player_id', 'data', 'created_at']
+        fields = ['id', 'client_id', 'time', 'description', 'event_type', 'player', 'player_id', 'data', 'created_at']
         read_only_fields = ['id', 'created_at']
+    
+    def validate_client_id(self, value):
+        # Blank ids would all collide on the (game, client_id) constraint
+        return value or None
 
 class GameStatisticSerializer(serializers.ModelSerializer):
     class Meta:
@@ -52,6 +56,7 @@ class GameDetailSerializer(GameSerializer):
     officials = GameOfficialSerializer(many=True, read_only=True)
     statistics = GameStatisticSerializer(read_only=True)
     events = GameEventSerializer(many=True, read_only=True)
+    winner = TeamSerializer(read_only=True)
     
     class Meta(GameSerializer.Meta):
         fields = GameSerializer.Meta.fields + ['officials', 'statistics', 'events', 'is_completed', 'winner']
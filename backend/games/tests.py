@@ -0,0 +1,699 @@
+import asyncio
+import itertools
+import json
+import threading
+from collections import Counter
+from datetime import date, time, timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connection
+from django.core.serializers.json import DjangoJSONEncoder
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from leagues.models import League, Standing
+from teams.models import Team, TeamMember
+from .live import (
+    SUBSCRIPTION_QUEUE_SIZE, InProcessBroker, RedisBroker, game_channel, league_channel, score_message,
+)
+from .models import Game, GameEvent, GameOfficial, GameStatistic, Venue
+from .scheduling import generate_round_robin, round_robin_rounds, spread_dates
+from .views import GameViewSet
+
+User = get_user_model()
+
+
+class GameQueryTests(APITestCase):
+    """Game endpoints must not run per-row queries for nested data"""
+
+    def setUp(self):
+        organizer = User.objects.create_user(username='organizer', email='org@test.com', password='password')
+        self.league = League.objects.create(
+            name='League', sport='Soccer', season='2024',
+            start_date=date.today(), end_date=date.today() + timedelta(days=90),
+            organizer=organizer,
+        )
+        venue = Venue.objects.create(name='Stadium', address='1 Main St', city='City', state='ST', zip_code='00000')
+
+        teams = [Team.objects.create(name=f'Team {i}', sport='Soccer') for i in range(6)]
+        self.league.teams.add(*teams)
+        for i, team in enumerate(teams):
+            coach = User.objects.create_user(username=f'coach{i}', email=f'coach{i}@test.com', password='password')
+            TeamMember.objects.create(team=team, user=coach, role='coach')
+
+        self.games = []
+        for i in range(25):
+            self.games.append(Game.objects.create(
+                league=self.league, home_team=teams[i % 6], away_team=teams[(i + 1) % 6], venue=venue,
+                date=date.today() + timedelta(days=i), time=time(18, 0),
+                status='completed', home_score=i % 3, away_score=1,
+            ))
+
+        self.game = self.games[0]
+        GameStatistic.objects.create(game=self.game, attendance=500)
+        for i in range(5):
+            official = User.objects.create_user(username=f'ref{i}', email=f'ref{i}@test.com', password='password')
+            GameOfficial.objects.create(game=self.game, user=official, role='Referee')
+            GameEvent.objects.create(game=self.game, time=f'{i}:00', description='Goal',
+                                     event_type='score', player=official)
+
+    def test_list_page_query_count_is_constant(self):
+        # Paginator COUNT, games with venues, leagues with counts, then home
+        # and away teams with their coaches
+        with self.assertNumQueries(7):
+            response = self.client.get('/api/games/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_retrieve_query_count_is_constant(self):
+        # Game with venue and statistics, league, home and away teams with
+        # their coaches, officials and events
+        with self.assertNumQueries(8):
+            response = self.client.get(f'/api/games/{self.game.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['officials']), 5)
+        self.assertEqual(len(response.data['events']), 5)
+        self.assertEqual(response.data['statistics']['attendance'], 500)
+
+    def test_update_score_query_count_does_not_grow_with_events(self):
+        self.client.force_authenticate(self.league.organizer)
+
+        def update_score_queries(home_score):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(f'/api/games/{self.game.id}/update_score/',
+                                            {'home_score': home_score, 'away_score': 1}, format='json')
+            self.assertEqual(response.status_code, 200)
+            # The statistics fetched with the game still serve the response
+            self.assertEqual([query for query in queries if 'FROM "games_gamestatistic"' in query['sql']], [])
+            return len(queries), response
+
+        update_score_queries(1)  # Creates the standings and analytics rows
+        before, _ = update_score_queries(2)
+        for i in range(10):
+            player = User.objects.create_user(username=f'player{i}', email=f'player{i}@test.com', password='password')
+            GameEvent.objects.create(game=self.game, time=f'{i}:30', description='Foul', event_type='foul',
+                                     player=player)
+        after, response = update_score_queries(3)
+        self.assertEqual(after, before)
+        self.assertEqual(len(response.data['events']), 15)
+        self.assertEqual(response.data['home_score'], 3)
+
+    def test_nested_data_matches_models(self):
+        response = self.client.get('/api/games/')
+        for item in response.data['results']:
+            game = Game.objects.get(id=item['id'])
+            self.assertEqual(item['league']['games_count'], self.league.games.count())
+            self.assertEqual(item['league']['teams_count'], self.league.teams.count())
+            self.assertEqual(item['home_team']['coach']['id'], game.home_team.coach.id)
+            self.assertEqual(item['venue']['name'], 'Stadium')
+
+        response = self.client.get(f'/api/games/{self.game.id}/')
+        winner = self.game.winner
+        self.assertEqual(response.data['winner']['id'] if response.data['winner'] else None,
+                         winner.id if winner else None)
+        self.assertEqual(response.data['officials'][0]['user']['username'], 'ref0')
+        self.assertEqual(response.data['events'][0]['player']['username'], 'ref0')
+
+
+class GameFilterTests(APITestCase):
+    """List filters return the right games and use the (column, date) indexes"""
+
+    def setUp(self):
+        organizer = User.objects.create_user(username='organizer', email='org@test.com', password='password')
+        self.teams = [Team.objects.create(name=f'Team {i}', sport='Soccer') for i in range(4)]
+        self.leagues = []
+        for i in range(2):
+            league = League.objects.create(
+                name=f'League {i}', sport='Soccer', season='2024',
+                start_date=date(2024, 1, 1), end_date=date(2024, 12, 31), organizer=organizer,
+            )
+            league.teams.add(*self.teams)
+            self.leagues.append(league)
+
+        for i in range(40):
+            Game.objects.create(
+                league=self.leagues[i % 2], home_team=self.teams[i % 4], away_team=self.teams[(i + 1) % 4],
+                date=date(2024, 1, 1) + timedelta(days=i), time=time(18, 0),
+                status='completed' if i < 20 else 'scheduled',
+            )
+
+    def get_ids(self, params):
+        response = self.client.get('/api/games/', params)
+        self.assertEqual(response.status_code, 200)
+        ids = [item['id'] for item in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            ids += [item['id'] for item in response.data['results']]
+        return ids
+
+    def query_plan(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/games/', params)
+        sql = next(query['sql'] for query in queries.captured_queries
+                   if 'FROM "games_game"' in query['sql'] and 'LIMIT' in query['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return ' '.join(row[-1] for row in cursor.fetchall())
+
+    def test_filters(self):
+        league, team = self.leagues[0], self.teams[0]
+        cases = [
+            ({'league_id': league.id}, Game.objects.filter(league=league)),
+            ({'team_id': team.id}, Game.objects.filter(home_team=team) | Game.objects.filter(away_team=team)),
+            ({'status': 'completed'}, Game.objects.filter(status='completed')),
+            ({'date__gte': '2024-01-10', 'date__lte': '2024-01-20'},
+             Game.objects.filter(date__range=(date(2024, 1, 10), date(2024, 1, 20)))),
+            ({'league_id': league.id, 'status': 'scheduled', 'date__gte': '2024-01-25'},
+             Game.objects.filter(league=league, status='scheduled', date__gte=date(2024, 1, 25))),
+        ]
+        for params, expected in cases:
+            with self.subTest(params=params):
+                self.assertEqual(self.get_ids(params), list(expected.order_by('date', 'time', 'id').values_list('id', flat=True)))
+
+    def test_invalid_filters(self):
+        for params in ({'league_id': 'x'}, {'team_id': '1.5'}, {'status': 'finished'}, {'date__gte': '01/02/2024'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/games/', params).status_code, 400)
+
+    def test_filters_use_indexes(self):
+        cases = [
+            ({'league_id': self.leagues[0].id, 'date__gte': '2024-01-10'}, 'game_league_date_idx'),
+            ({'team_id': self.teams[0].id}, 'game_home_team_date_idx'),
+            ({'team_id': self.teams[0].id}, 'game_away_team_date_idx'),
+            ({'status': 'completed', 'date__gte': '2024-01-10'}, 'game_status_date_idx'),
+            ({'date__gte': '2024-01-10', 'date__lte': '2024-01-20'}, 'game_date_time_idx'),
+        ]
+        for params, index in cases:
+            with self.subTest(params=params):
+                self.assertIn(f'USING INDEX {index}', self.query_plan(params))
+
+
+class ScheduleTests(APITestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', email='org@test.com', password='password')
+        self.leagues = []
+        for i in range(2):
+            league = League.objects.create(
+                name=f'League {i}', sport='Soccer', season='2024',
+                start_date=date.today() + timedelta(days=1), end_date=date.today() + timedelta(days=120),
+                organizer=self.organizer,
+            )
+            league.teams.add(*[Team.objects.create(name=f'Team {i}-{j}', sport='Soccer') for j in range(4)])
+            self.leagues.append(league)
+        self.venues = [
+            Venue.objects.create(name=f'Stadium {i}', address='1 Main St', city='City', state='ST', zip_code='00000')
+            for i in range(2)
+        ]
+        self.slots = [{'weekday': 5, 'time': '18:00'}, {'weekday': 6, 'time': '10:00'}]
+        self.client.force_authenticate(self.organizer)
+
+    def schedule(self, leagues):
+        return self.client.post('/api/games/generate_schedule/', {
+            'league_ids': [league.id for league in leagues],
+            'venue_ids': [venue.id for venue in self.venues],
+            'slots': self.slots,
+        }, format='json')
+
+    def test_slotted_schedule_uses_slots(self):
+        response = self.schedule([self.leagues[0]])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['games_created'], 12)
+        self.assertEqual(response.data['games_dropped'], 0)
+
+        allowed = {(5, time(18, 0)), (6, time(10, 0))}
+        team_days = set()
+        for game in Game.objects.filter(league=self.leagues[0]):
+            self.assertIn((game.date.weekday(), game.time), allowed)
+            self.assertIn(game.venue_id, {venue.id for venue in self.venues})
+            for team_id in (game.home_team_id, game.away_team_id):
+                self.assertNotIn((team_id, game.date), team_days)
+                team_days.add((team_id, game.date))
+
+    def test_no_double_booking_across_leagues(self):
+        # Scheduled separately, the second league works around the first
+        for league in self.leagues:
+            self.assertEqual(self.schedule([league]).status_code, 201)
+
+        slots = list(Game.objects.values_list('venue_id', 'date', 'time'))
+        self.assertEqual(len(slots), 24)
+        self.assertEqual(len(set(slots)), len(slots))
+        self.assertEqual(self.client.get('/api/games/venue_conflicts/').data, [])
+
+    def test_venues_are_locked_before_occupancy_is_read(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.schedule([self.leagues[0]]).status_code, 201)
+        statements = [query['sql'] for query in queries]
+        lock = next(i for i, sql in enumerate(statements) if sql.startswith('UPDATE "games_venue"'))
+        occupancy = next(i for i, sql in enumerate(statements) if sql.startswith('SELECT "games_game"."venue_id"'))
+        self.assertLess(lock, occupancy)
+
+    def test_failed_batch_leaves_no_games(self):
+        bulk_create = Game.objects.bulk_create
+
+        def fail_after_insert(*args, **kwargs):
+            bulk_create(*args, **kwargs)
+            raise DatabaseError('disk full')
+
+        with mock.patch.object(Game.objects, 'bulk_create', side_effect=fail_after_insert):
+            with self.assertRaises(DatabaseError):
+                self.schedule(self.leagues)
+        self.assertFalse(Game.objects.exists())
+
+    def test_venue_conflicts(self):
+        teams = list(self.leagues[0].teams.all()) + list(self.leagues[1].teams.all())
+        game_date = date.today() + timedelta(days=7)
+        clashing = [
+            Game.objects.create(league=self.leagues[i], home_team=teams[i * 4], away_team=teams[i * 4 + 1],
+                                venue=self.venues[0], date=game_date, time=time(18, 0))
+            for i in range(2)
+        ]
+        # Cancelled games and other venues do not clash
+        Game.objects.create(league=self.leagues[0], home_team=teams[2], away_team=teams[3], venue=self.venues[0],
+                            date=game_date, time=time(18, 0), status='cancelled')
+        Game.objects.create(league=self.leagues[0], home_team=teams[2], away_team=teams[3], venue=self.venues[1],
+                            date=game_date, time=time(18, 0))
+
+        response = self.client.get('/api/games/venue_conflicts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['venue_id'], self.venues[0].id)
+        self.assertEqual(response.data[0]['game_ids'], [game.id for game in clashing])
+
+        params = {'league_id': self.leagues[1].id, 'start_date': game_date.isoformat(),
+                  'end_date': game_date.isoformat()}
+        self.assertEqual(len(self.client.get('/api/games/venue_conflicts/', params).data), 1)
+        params['start_date'] = (game_date + timedelta(days=1)).isoformat()
+        self.assertEqual(self.client.get('/api/games/venue_conflicts/', params).data, [])
+
+    def test_venue_conflicts_invalid_params(self):
+        for params in ({'start_date': '2024-13-01'}, {'end_date': 'tomorrow'}, {'venue_id': 'x'},
+                       {'league_id': '1.5'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/games/venue_conflicts/', params).status_code, 400)
+
+    def test_only_organizer_can_schedule(self):
+        other = User.objects.create_user(username='other', email='other@test.com', password='password')
+        self.client.force_authenticate(other)
+
+        response = self.client.post('/api/games/generate_schedule/', {'league_id': self.leagues[0].id},
+                                    format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.schedule(self.leagues).status_code, 403)
+        self.assertFalse(Game.objects.exists())
+
+
+class GameEventIngestTests(APITestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', email='org@test.com', password='password')
+        league = League.objects.create(
+            name='League', sport='Soccer', season='2024',
+            start_date=date(2024, 1, 1), end_date=date(2024, 12, 31), organizer=self.organizer,
+        )
+        teams = [Team.objects.create(name=f'Team {i}', sport='Soccer') for i in range(2)]
+        self.game = Game.objects.create(league=league, home_team=teams[0], away_team=teams[1],
+                                        date=date(2024, 3, 1), time=time(18, 0))
+        self.client.force_authenticate(self.organizer)
+
+    def event(self, client_id, **fields):
+        return {'client_id': client_id, 'time': '10:00', 'description': 'Goal', 'event_type': 'score', **fields}
+
+    def add_event(self, data):
+        return self.client.post(f'/api/games/{self.game.id}/add_event/', data, format='json')
+
+    def bulk(self, events):
+        return self.client.post(f'/api/games/{self.game.id}/events/bulk/', {'events': events}, format='json')
+
+    def test_replayed_event_is_stored_once(self):
+        first = self.add_event(self.event('device-1'))
+        self.assertEqual(first.status_code, 201)
+        replay = self.add_event(self.event('device-1', description='Goal (resent)'))
+        self.assertEqual(replay.status_code, 200)
+        self.assertEqual(replay.data['id'], first.data['id'])
+        self.assertEqual(replay.data['description'], 'Goal')
+
+        # Without a client_id nothing is deduplicated
+        self.assertEqual(self.add_event(self.event(None)).status_code, 201)
+        self.assertEqual(self.add_event(self.event(None)).status_code, 201)
+        self.assertEqual(self.game.events.count(), 3)
+
+    def test_blank_client_ids_are_not_deduplicated(self):
+        for client_id in ('', '  '):
+            response = self.add_event(self.event(client_id))
+            self.assertEqual(response.status_code, 201)
+            self.assertIsNone(response.data['client_id'])
+        response = self.bulk([self.event(''), self.event(''), self.event('  ')])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['duplicates']), (3, []))
+        self.assertEqual(self.game.events.filter(client_id=None).count(), 5)
+
+    def test_bulk_skips_stored_and_repeated_client_ids(self):
+        self.add_event(self.event('a'))
+        response = self.bulk([self.event('a'), self.event('b'), self.event('b'), self.event(None)])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['duplicates'], ['a', 'b'])
+
+        # Replaying the whole batch creates nothing
+        response = self.bulk([self.event('a'), self.event('b')])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(sorted(self.game.events.values_list('client_id', flat=True), key=str), [None, 'a', 'b'])
+
+    def test_bulk_rejects_the_whole_batch_on_any_error(self):
+        response = self.bulk([self.event('a'), self.event('b', event_type='goal'), self.event('c', player_id=999)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['events'][0], {})
+        self.assertIn('event_type', response.data['events'][1])
+
+        response = self.bulk([self.event('a'), self.event('c', player_id=999)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['events'], [{}, {'player_id': ['Player not found.']}])
+        self.assertFalse(self.game.events.exists())
+
+    def test_bulk_retries_after_a_concurrent_insert(self):
+        stored_client_ids = GameViewSet._stored_client_ids
+        calls = []
+
+        def concurrent_add_event(game, client_ids):
+            # add_event stores 'b' just after the batch looked for stored client_ids
+            calls.append(client_ids)
+            stored = stored_client_ids(game, client_ids)
+            if len(calls) == 1:
+                GameEvent.objects.create(game=game, **self.event('b'))
+            return stored
+
+        with mock.patch.object(GameViewSet, '_stored_client_ids', side_effect=concurrent_add_event):
+            response = self.bulk([self.event('a'), self.event('b')])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['duplicates'], ['b'])
+        self.assertEqual(self.game.events.count(), 2)
+
+
+class LiveBrokerTests(SimpleTestCase):
+    async def receive(self, subscription):
+        return await asyncio.wait_for(subscription.get(), timeout=1)
+
+    async def test_in_process_publish_reaches_subscribers_of_the_channel(self):
+        broker = InProcessBroker()
+        game = broker.subscribe([game_channel(1)])
+        league = broker.subscribe([league_channel(1), game_channel(2)])
+        broker.publish(game_channel(1), {'n': 1})
+        broker.publish(game_channel(2), {'n': 2})
+        self.assertEqual(await self.receive(game), {'n': 1})
+        self.assertEqual(await self.receive(league), {'n': 2})
+        self.assertTrue(game.queue.empty())
+
+        game.close()
+        league.close()
+        self.assertEqual(broker._subscriptions, {})
+        broker.publish(game_channel(1), {'n': 3})  # Nobody listening
+
+    async def test_slow_subscriber_drops_oldest_messages(self):
+        broker = InProcessBroker()
+        subscription = broker.subscribe([game_channel(1)])
+        for n in range(SUBSCRIPTION_QUEUE_SIZE + 5):
+            broker.publish(game_channel(1), {'n': n})
+        await asyncio.sleep(0)  # Let the loop run the queued puts
+        self.assertEqual(subscription.queue.qsize(), SUBSCRIPTION_QUEUE_SIZE)
+        self.assertEqual(await self.receive(subscription), {'n': 5})
+        subscription.close()
+
+    async def test_redis_relays_messages_through_pubsub(self):
+        redis = mock.Mock()
+        client = redis.Redis.from_url.return_value
+        pubsub = client.pubsub.return_value
+        message = {'type': 'score', 'game_id': 1}
+        listened = threading.Event()
+
+        def listen():
+            # Wait for the subscription, as a message only reaches current subscribers
+            listened.wait(1)
+            yield {'channel': b'live:game:1', 'data': json.dumps(message).encode()}
+
+        pubsub.listen.side_effect = listen
+        with mock.patch.dict('sys.modules', redis=redis):
+            broker = RedisBroker(url='redis://cache:6379/1')
+        redis.Redis.from_url.assert_called_once_with('redis://cache:6379/1')
+        pubsub.psubscribe.assert_called_once_with('live:*')
+
+        broker.publish(game_channel(1), message)
+        client.publish.assert_called_once_with('live:game:1', json.dumps(message))
+
+        subscription = broker.subscribe([game_channel(1)])
+        listened.set()
+        self.assertEqual(await self.receive(subscription), message)
+        subscription.close()
+
+
+class LiveStreamTests(TestCase):
+    def setUp(self):
+        organizer = User.objects.create_user(username='organizer', email='org@test.com', password='password')
+        self.league = League.objects.create(
+            name='League', sport='Soccer', season='2024',
+            start_date=date.today(), end_date=date.today() + timedelta(days=90),
+            organizer=organizer,
+        )
+        home = Team.objects.create(name='Home', sport='Soccer')
+        away = Team.objects.create(name='Away', sport='Soccer')
+        self.game = Game.objects.create(league=self.league, home_team=home, away_team=away,
+                                        date=date.today(), time=time(18, 0), status='in_progress')
+
+    async def test_game_stream_sends_snapshot_then_broadcasts(self):
+        broker = InProcessBroker()
+        with mock.patch('games.views.get_broker', return_value=broker):
+            response = await self.async_client.get(f'/api/games/{self.game.id}/live/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            stream = aiter(response.streaming_content)
+
+            snapshot = (await anext(stream)).decode()
+            self.assertTrue(snapshot.startswith('retry: 3000\nevent: snapshot\n'))
+            self.assertIn(f'"game_id": {self.game.id}', snapshot)
+
+            self.game.home_score = 2
+            message = json.loads(json.dumps(score_message(self.game), cls=DjangoJSONEncoder))
+            broker.publish(game_channel(self.game.id), message)
+            score = (await anext(stream)).decode()
+            self.assertTrue(score.startswith('event: score\n'))
+            self.assertIn('"home_score": 2', score)
+
+            await stream.aclose()
+
+    async def test_league_stream_snapshot_lists_live_games(self):
+        with mock.patch('games.views.get_broker', return_value=InProcessBroker()):
+            response = await self.async_client.get(f'/api/games/league/{self.league.id}/live/')
+            stream = aiter(response.streaming_content)
+            snapshot = (await anext(stream)).decode()
+            await stream.aclose()
+        data = json.loads(snapshot.split('data: ', 1)[1])
+        self.assertEqual([message['game_id'] for message in data], [self.game.id])
+
+    async def test_unknown_game_or_league(self):
+        self.assertEqual((await self.async_client.get('/api/games/999999/live/')).status_code, 404)
+        self.assertEqual((await self.async_client.get('/api/games/league/999999/live/')).status_code, 404)
+
+    def test_wsgi_is_refused(self):
+        for url in (f'/api/games/{self.game.id}/live/', f'/api/games/league/{self.league.id}/live/'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 503)
+                self.assertFalse(response.streaming)
+
+
+class BatchScoreTests(APITestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', email='org@test.com', password='password')
+        other = User.objects.create_user(username='other', email='other@test.com', password='password')
+        self.home = Team.objects.create(name='Home', sport='Soccer')
+        self.away = Team.objects.create(name='Away', sport='Soccer')
+
+        def league(name, organizer):
+            league = League.objects.create(
+                name=name, sport='Soccer', season='2024',
+                start_date=date.today(), end_date=date.today() + timedelta(days=90), organizer=organizer,
+            )
+            league.teams.add(self.home, self.away)
+            return league
+
+        self.league = league('Mine', self.organizer)
+        self.other_league = league('Theirs', other)
+        self.games = [self.game(self.league, day) for day in range(2)]
+        self.other_game = self.game(self.other_league, 0)
+        self.client.force_authenticate(self.organizer)
+
+    def game(self, league, day):
+        return Game.objects.create(league=league, home_team=self.home, away_team=self.away,
+                                   date=date.today() + timedelta(days=day), time=time(18, 0))
+
+    def submit(self, results):
+        return self.client.post('/api/games/batch_update_scores/', {'results': results}, format='json')
+
+    def standing(self, team, league=None):
+        return Standing.objects.filter(league=league or self.league, team=team).values(
+            'wins', 'losses', 'draws', 'points_for', 'points_against', 'games_played', 'points').first()
+
+    def test_invalid_items_do_not_abort_the_batch(self):
+        response = self.submit([
+            {'game_id': self.games[0].id, 'home_score': 2, 'away_score': 1},
+            {'game_id': self.games[1].id, 'home_score': 'two', 'away_score': 1},
+            {'game_id': self.games[1].id, 'home_score': -1, 'away_score': 0},
+            {'home_score': 1, 'away_score': 0},
+            {'game_id': 999999, 'home_score': 1, 'away_score': 0},
+            'not an object',
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['updated'], response.data['failed']), (1, 5))
+        self.assertEqual([result['success'] for result in response.data['results']],
+                         [True, False, False, False, False, False])
+        self.assertEqual(response.data['results'][4]['error'], 'Game not found.')
+
+        self.games[0].refresh_from_db()
+        self.games[1].refresh_from_db()
+        self.assertEqual((self.games[0].status, self.games[0].home_score), ('completed', 2))
+        self.assertEqual((self.games[1].status, self.games[1].home_score), ('scheduled', None))
+        self.assertEqual(self.standing(self.home)['wins'], 1)
+
+    def test_only_games_of_own_leagues_are_scored(self):
+        response = self.submit([
+            {'game_id': self.other_game.id, 'home_score': 3, 'away_score': 0},
+            {'game_id': self.games[0].id, 'home_score': 0, 'away_score': 1},
+        ])
+        self.assertEqual([result['success'] for result in response.data['results']], [False, True])
+        self.assertEqual(response.data['results'][0]['error'], 'You do not have permission to update this game.')
+
+        self.other_game.refresh_from_db()
+        self.assertIsNone(self.other_game.home_score)
+        self.assertIsNone(self.standing(self.home, self.other_league))
+        self.assertEqual(self.standing(self.away)['wins'], 1)
+
+    def test_games_of_other_leagues_are_not_written(self):
+        updated_at = self.other_game.updated_at
+        self.submit([{'game_id': self.other_game.id, 'home_score': 3, 'away_score': 0}])
+        self.other_game.refresh_from_db()
+        self.assertEqual(self.other_game.updated_at, updated_at)
+
+    def test_anonymous_requests_are_rejected(self):
+        self.client.force_authenticate(None)
+        updated_at = self.games[0].updated_at
+        response = self.submit([{'game_id': self.games[0].id, 'home_score': 1, 'away_score': 0}])
+        self.assertEqual(response.status_code, 401)
+        self.games[0].refresh_from_db()
+        self.assertEqual((self.games[0].home_score, self.games[0].updated_at), (None, updated_at))
+
+    def test_single_update_rejects_negative_scores(self):
+        for home_score, away_score in ((-1, 0), (2, -3)):
+            response = self.client.post(f'/api/games/{self.games[0].id}/update_score/',
+                                        {'home_score': home_score, 'away_score': away_score}, format='json')
+            self.assertEqual(response.status_code, 400)
+        self.games[0].refresh_from_db()
+        self.assertEqual((self.games[0].status, self.games[0].home_score), ('scheduled', None))
+        self.assertIsNone(self.standing(self.home))
+
+    def test_rescoring_reverts_the_previous_result(self):
+        self.submit([{'game_id': game.id, 'home_score': 2, 'away_score': 0} for game in self.games])
+        self.assertEqual(self.standing(self.home)['wins'], 2)
+
+        response = self.submit([{'game_id': self.games[0].id, 'home_score': 1, 'away_score': 1}])
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(self.standing(self.home), {
+            'wins': 1, 'losses': 0, 'draws': 1, 'points_for': 3, 'points_against': 1,
+            'games_played': 2, 'points': 4,
+        })
+        self.assertEqual(self.standing(self.away), {
+            'wins': 0, 'losses': 1, 'draws': 1, 'points_for': 1, 'points_against': 3,
+            'games_played': 2, 'points': 1,
+        })
+
+
+class RoundRobinTests(SimpleTestCase):
+    def check_leg(self, teams, rounds):
+        pairs = [frozenset(pair) for pairs in rounds for pair in pairs]
+        # Every pair meets exactly once
+        self.assertEqual(len(pairs), len(set(pairs)))
+        self.assertEqual(set(pairs), {frozenset(pair) for pair in itertools.combinations(teams, 2)})
+        for pairs in rounds:
+            playing = [team for pair in pairs for team in pair]
+            self.assertEqual(len(playing), len(set(playing)), 'a team plays twice in one round')
+
+    def test_even_team_count(self):
+        teams = list('ABCDEF')
+        rounds = round_robin_rounds(teams, double=False)
+        self.assertEqual([len(pairs) for pairs in rounds], [3] * 5)
+        self.check_leg(teams, rounds)
+        home = Counter(home for pairs in rounds for home, _ in pairs)
+        self.assertLessEqual(max(home.values()) - min(home[team] for team in teams), 1)
+
+    def test_odd_team_count_gets_one_bye_per_round(self):
+        teams = list('ABCDE')
+        rounds = round_robin_rounds(teams, double=False)
+        self.assertEqual([len(pairs) for pairs in rounds], [2] * 5)
+        self.check_leg(teams, rounds)
+        byes = [(set(teams) - {team for pair in pairs for team in pair}).pop() for pairs in rounds]
+        self.assertEqual(sorted(byes), teams)
+
+    def test_second_leg_swaps_home_and_away(self):
+        teams = list('ABCDE')
+        rounds = round_robin_rounds(teams)
+        self.assertEqual(len(rounds), 10)
+        first, second = rounds[:5], rounds[5:]
+        self.check_leg(teams, second)
+        self.assertEqual(second, [[(away, home) for home, away in pairs] for pairs in first])
+        home = Counter(home for pairs in rounds for home, _ in pairs)
+        self.assertEqual(set(home.values()), {4})
+
+    def test_too_few_teams(self):
+        self.assertEqual(round_robin_rounds([]), [])
+        self.assertEqual(round_robin_rounds(['A']), [])
+
+    def test_spread_dates(self):
+        start = date(2024, 1, 1)
+        dates = spread_dates(start, date(2024, 1, 31), 4)
+        self.assertEqual(dates, [date(2024, 1, 1), date(2024, 1, 11), date(2024, 1, 21), date(2024, 1, 31)])
+        # At most one date per day
+        self.assertEqual(spread_dates(start, date(2024, 1, 3), 10),
+                         [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 3)])
+        self.assertEqual(spread_dates(start, start, 3), [start])
+        self.assertEqual(spread_dates(start, date(2023, 12, 31), 3), [])
+        self.assertEqual(spread_dates(start, date(2024, 1, 31), 0), [])
+
+
+class GenerateRoundRobinTests(TestCase):
+    def setUp(self):
+        organizer = User.objects.create_user(username='organizer', email='org@test.com', password='password')
+        self.league = League.objects.create(
+            name='League', sport='Soccer', season='2024',
+            start_date=date(2024, 1, 1), end_date=date(2024, 3, 31), organizer=organizer,
+        )
+        self.teams = [Team.objects.create(name=f'Team {i}', sport='Soccer') for i in range(5)]
+
+    def test_full_schedule(self):
+        result = generate_round_robin(self.league, self.teams, start_date=self.league.start_date)
+        self.assertEqual((result['games_created'], result['games_dropped']), (20, 0))
+        self.assertEqual((result['rounds'], result['rounds_dropped']), (10, 0))
+
+        games = list(Game.objects.filter(league=self.league).order_by('date'))
+        self.assertEqual(len(games), 20)
+        dates = sorted({game.date for game in games})
+        self.assertEqual((dates[0], dates[-1], len(dates)), (date(2024, 1, 1), date(2024, 3, 31), 10))
+        for day in dates:
+            playing = [team for game in games if game.date == day for team in (game.home_team_id, game.away_team_id)]
+            self.assertEqual(len(playing), len(set(playing)))
+        self.assertEqual(Counter((game.home_team_id, game.away_team_id) for game in games).most_common(1)[0][1], 1)
+
+    def test_rounds_that_do_not_fit_are_dropped(self):
+        self.league.end_date = date(2024, 1, 3)
+        result = generate_round_robin(self.league, self.teams, start_date=self.league.start_date)
+        self.assertEqual((result['rounds'], result['rounds_dropped']), (3, 7))
+        self.assertEqual((result['games_created'], result['games_dropped']), (6, 14))
+        self.assertEqual(Game.objects.filter(league=self.league).count(), 6)
+
+    def test_schedule_starts_today_once_the_league_has_started(self):
+        today = date.today()
+        self.league.start_date = today - timedelta(days=30)
+        self.league.end_date = today + timedelta(days=30)
+        generate_round_robin(self.league, self.teams)
+        self.assertEqual(Game.objects.filter(league=self.league).earliest('date').date, today)
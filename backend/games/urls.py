@@ -1,11 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import GameViewSet, VenueViewSet
+from .views import GameViewSet, VenueViewSet, game_live_stream, league_live_stream
 
 router = DefaultRouter()
 router.register(r'', GameViewSet)
 router.register(r'venues', VenueViewSet)
 
 urlpatterns = [
+    path('<int:pk>/live/', game_live_stream, name='game-live'),
+    path('league/<int:league_id>/live/', league_live_stream, name='league-live'),
     path('', include(router.urls)),
 ]
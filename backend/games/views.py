@@ -1,13 +1,40 @@
+import asyncio
+import datetime
+import json
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, Q
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
 from .models import Game, Venue, GameOfficial, GameStatistic, GameEvent
 from .serializers import (
     GameSerializer, GameDetailSerializer, VenueSerializer,
     GameOfficialSerializer, GameStatisticSerializer, GameEventSerializer
 )
 from .permissions import IsLeagueOrganizerOrReadOnly
-from leagues.models import League, Standing
+from .live import get_broker, game_channel, league_channel, score_message, publish_score, publish_events
+from .scheduling import (
+    BULK_BATCH_SIZE, generate_round_robin, generate_slotted_schedule, parse_slots, find_venue_conflicts
+)
+from leagues.models import League
+from teams.models import team_prefetch
+from leagues.standings import StandingDeltas
+from analytics.calculations import AnalyticsDeltas
+from sports_league_backend.pagination import OptionalCursorPagination
+
+User = get_user_model()
+
+MAX_BATCH_SCORES = 1000
+MAX_BATCH_EVENTS = 5000
+LIVE_KEEPALIVE_SECONDS = 15
+# Clients reconnect automatically, so streams are recycled periodically
+LIVE_STREAM_MAX_SECONDS = 30 * 60
 
 class VenueViewSet(viewsets.ModelViewSet):
     queryset = Venue.objects.all()
@@ -18,12 +45,75 @@ class GameViewSet(viewsets.ModelViewSet):
     queryset = Game.objects.all()
     serializer_class = GameSerializer
     permission_classes = [IsLeagueOrganizerOrReadOnly]
+    pagination_class = OptionalCursorPagination
+    cursor_ordering = ('date', 'time', 'id')
     
     def get_serializer_class(self):
-        if self.action == 'retrieve':
+        if self.action in ('retrieve', 'update_score'):
+            # update_score responds with the game's details too
             return GameDetailSerializer
         return GameSerializer
     
+    def get_queryset(self):
+        # Everything the serializers read is fetched up front, so a page of
+        # games (or one game with its officials and events) costs a fixed
+        # number of queries
+        queryset = Game.objects.select_related('venue').prefetch_related(
+            Prefetch('league', queryset=League.objects.with_counts().select_related('organizer__profile')),
+            team_prefetch('home_team'),
+            team_prefetch('away_team'),
+        ).order_by(*self.cursor_ordering)
+        
+        if self.action == 'list':
+            queryset = self._filter_games(queryset)
+        
+        if self.action in ('retrieve', 'update_score'):
+            # update_score responds with the game's details too
+            queryset = queryset.select_related('statistics').prefetch_related(
+                Prefetch('officials', queryset=GameOfficial.objects.select_related('user__profile').order_by('id')),
+                Prefetch('events', queryset=GameEvent.objects.select_related('player__profile').order_by('id')),
+            )
+        
+        return queryset
+    
+    def _filter_games(self, queryset):
+        """Apply the list filters, each backed by one of the (column, date) indexes"""
+        params = self.request.query_params
+        
+        for param in ('league_id', 'team_id'):
+            value = params.get(param)
+            if value and not value.isdigit():
+                raise ValidationError({param: "Must be an integer."})
+        
+        league_id = params.get('league_id')
+        if league_id:
+            queryset = queryset.filter(league_id=league_id)
+        
+        # Filter by team, playing at home or away
+        team_id = params.get('team_id')
+        if team_id:
+            queryset = queryset.filter(Q(home_team_id=team_id) | Q(away_team_id=team_id))
+        
+        game_status = params.get('status')
+        if game_status:
+            statuses = game_status.split(',')
+            valid = dict(Game.STATUS_CHOICES)
+            if any(value not in valid for value in statuses):
+                raise ValidationError({"status": f"Must be one of: {', '.join(valid)}."})
+            queryset = queryset.filter(status__in=statuses)
+        
+        # Filter by date range
+        for lookup in ('date__gte', 'date__lte'):
+            value = params.get(lookup)
+            if value:
+                try:
+                    value = datetime.date.fromisoformat(value)
+                except ValueError:
+                    raise ValidationError({lookup: "Use the YYYY-MM-DD format."})
+                queryset = queryset.filter(**{lookup: value})
+        
+        return queryset
+    
     @action(detail=True, methods=['post'])
     def update_score(self, request, pk=None):
         game = self.get_object()
@@ -31,70 +121,150 @@ class GameViewSet(viewsets.ModelViewSet):
         away_score = request.data.get('away_score')
         
         if home_score is not None and away_score is not None:
-            # Capture old state before update
-            old_home_score = game.home_score
-            old_away_score = game.away_score
-            old_status = game.status
-
-            game.home_score = home_score
-            game.away_score = away_score
-            game.status = 'completed'
-            game.save()
+            try:
+                home_score = int(home_score)
+                away_score = int(away_score)
+                if home_score < 0 or away_score < 0:
+                    raise ValueError
+            except (TypeError, ValueError):
+                return Response({"detail": "Scores must be non-negative integers."},
+                                status=status.HTTP_400_BAD_REQUEST)
             
-            # Update standings with old state context
-            self._update_standings(game, old_home_score, old_away_score, old_status)
+            with transaction.atomic():
+                # Claim the row before reading its old result so concurrent
+                # re-scores of this game revert each other's result in turn
+                self._lock_games([game.pk])
+                
+                # Capture old state before update (refresh_from_db would also
+                # drop the prefetched statistics the response reads)
+                old_home_score, old_away_score, old_status = Game.objects.values_list(
+                    'home_score', 'away_score', 'status').get(pk=game.pk)
+
+                game.home_score = home_score
+                game.away_score = away_score
+                game.status = 'completed'
+                game.save()
+                
+                # Update standings and analytics with old state context
+                self._update_standings(game, old_home_score, old_away_score, old_status)
+                self._update_analytics(game, old_home_score, old_away_score, old_status)
+                transaction.on_commit(lambda: publish_score(game))
             
             return Response(GameDetailSerializer(game).data)
         return Response({"detail": "Home score and away score are required."}, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def batch_update_scores(self, request):
+        """Apply a batch of final scores in one transaction"""
+        results = request.data.get('results')
+        
+        if not isinstance(results, list) or not results:
+            return Response({"detail": "A non-empty list of results is required."}, 
+                           status=status.HTTP_400_BAD_REQUEST)
+        if len(results) > MAX_BATCH_SCORES:
+            return Response({"detail": f"At most {MAX_BATCH_SCORES} results can be submitted at once."}, 
+                           status=status.HTTP_400_BAD_REQUEST)
+        
+        parsed = []
+        for item in results:
+            try:
+                game_id = int(item['game_id'])
+                home_score = int(item['home_score'])
+                away_score = int(item['away_score'])
+                if home_score < 0 or away_score < 0:
+                    raise ValueError
+                parsed.append((game_id, home_score, away_score))
+            except (KeyError, TypeError, ValueError):
+                parsed.append((item.get('game_id') if isinstance(item, dict) else None, None, None))
+        
+        responses = []
+        changed = {}
+        deltas = StandingDeltas()
+        analytics_deltas = AnalyticsDeltas()
+        
+        with transaction.atomic():
+            valid_ids = [game_id for game_id, home_score, _ in parsed if home_score is not None]
+            # Lock (which writes) only the games this user may update
+            self._lock_games(Game.objects.filter(pk__in=valid_ids, league__organizer_id=request.user.id)
+                             .values_list('pk', flat=True))
+            games = Game.objects.select_related('league').in_bulk(valid_ids)
+            
+            for game_id, home_score, away_score in parsed:
+                if home_score is None:
+                    responses.append({"game_id": game_id, "success": False,
+                                      "error": "Valid game ID, home score and away score are required."})
+                    continue
+                
+                game = games.get(game_id)
+                if game is None:
+                    responses.append({"game_id": game_id, "success": False, "error": "Game not found."})
+                    continue
+                if game.league.organizer_id != request.user.id:
+                    responses.append({"game_id": game_id, "success": False,
+                                      "error": "You do not have permission to update this game."})
+                    continue
+                
+                # Revert the previous result of re-scored games
+                if game.is_completed and game.home_score is not None and game.away_score is not None:
+                    deltas.add_game(game, sign=-1)
+                    analytics_deltas.add_game(game, sign=-1)
+                
+                game.home_score = home_score
+                game.away_score = away_score
+                game.status = 'completed'
+                game.updated_at = timezone.now()
+                deltas.add_game(game)
+                analytics_deltas.add_game(game)
+                changed[game.id] = game
+                
+                responses.append({"game_id": game_id, "success": True,
+                                  "home_score": home_score, "away_score": away_score})
+            
+            Game.objects.bulk_update(changed.values(), ['home_score', 'away_score', 'status', 'updated_at'],
+                                     batch_size=BULK_BATCH_SIZE)
+            deltas.apply()
+            analytics_deltas.apply()
+            transaction.on_commit(lambda: [publish_score(game) for game in changed.values()])
+        
+        failed = sum(1 for response in responses if not response['success'])
+        return Response({"updated": len(responses) - failed, "failed": failed, "results": responses})
+    
+    def _lock_games(self, game_ids):
+        """
+        Take write locks on games inside the current transaction.
+
+        Writing first (rather than SELECT ... FOR UPDATE) also makes SQLite
+        acquire its write lock up front, so the old scores read afterwards
+        cannot be changed by a concurrent request.
+        """
+        Game.objects.filter(pk__in=game_ids).update(updated_at=timezone.now())
+    
     def _update_standings(self, game, old_home_score=None, old_away_score=None, old_status=None):
         """Update team standings after a game is completed"""
         if not game.is_completed or game.home_score is None or game.away_score is None:
             return
         
-        # Get or create standings
-        home_standing, _ = Standing.objects.get_or_create(league=game.league, team=game.home_team)
-        away_standing, _ = Standing.objects.get_or_create(league=game.league, team=game.away_team)
+        deltas = StandingDeltas()
         
         # If game was already completed, revert previous stats
         if old_status == 'completed' and old_home_score is not None and old_away_score is not None:
-            # Revert points for
-            home_standing.points_for -= old_home_score
-            home_standing.points_against -= old_away_score
-            away_standing.points_for -= old_away_score
-            away_standing.points_against -= old_home_score
-            
-            # Revert wins/losses/draws
-            if old_home_score > old_away_score:
-                home_standing.wins -= 1
-                away_standing.losses -= 1
-            elif old_away_score > old_home_score:
-                away_standing.wins -= 1
-                home_standing.losses -= 1
-            else:
-                home_standing.draws -= 1
-                away_standing.draws -= 1
-
-        # Add new stats
-        # Update points scored
-        home_standing.points_for += game.home_score
-        home_standing.points_against += game.away_score
-        away_standing.points_for += game.away_score
-        away_standing.points_against += game.home_score
-        
-        # Update wins/losses/draws
-        if game.home_score > game.away_score:
-            home_standing.wins += 1
-            away_standing.losses += 1
-        elif game.away_score > game.home_score:
-            away_standing.wins += 1
-            home_standing.losses += 1
-        else:
-            home_standing.draws += 1
-            away_standing.draws += 1
-        
-        home_standing.save()
-        away_standing.save()
+            deltas.add_game(game, old_home_score, old_away_score, sign=-1)
+        
+        # Add new stats as database-side increments, so concurrent results
+        # for the same team never overwrite each other
+        deltas.add_game(game)
+        deltas.apply()
+    
+    def _update_analytics(self, game, old_home_score=None, old_away_score=None, old_status=None):
+        """Apply a score change to every analytics window containing the game"""
+        if not game.is_completed or game.home_score is None or game.away_score is None:
+            return
+        
+        deltas = AnalyticsDeltas()
+        if old_status == 'completed' and old_home_score is not None and old_away_score is not None:
+            deltas.add_game(game, old_home_score, old_away_score, sign=-1)
+        deltas.add_game(game)
+        deltas.apply()
     
     @action(detail=True, methods=['post'])
     def add_official(self, request, pk=None):
@@ -112,10 +282,93 @@ class GameViewSet(viewsets.ModelViewSet):
         serializer = GameEventSerializer(data=request.data)
         
         if serializer.is_valid():
-            serializer.save(game=game)
+            client_id = serializer.validated_data.get('client_id')
+            try:
+                with transaction.atomic():
+                    event = serializer.save(game=game)
+            except IntegrityError:
+                # A replay of an event that was already recorded, possibly
+                # by a concurrent request; the unique constraint decides
+                existing = game.events.filter(client_id=client_id).first() if client_id else None
+                if existing is None:
+                    raise
+                return Response(GameEventSerializer(existing).data)
+            
+            publish_events(game, [event])
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=True, methods=['post'], url_path='events/bulk')
+    def bulk_events(self, request, pk=None):
+        """
+        Record an ordered batch of events, e.g. replayed by an offline device.
+        
+        Events carrying a ``client_id`` that is already stored (or repeated
+        in the batch) are skipped. The batch is validated as a whole, so
+        either every new event is inserted or none is.
+        """
+        game = self.get_object()
+        events = request.data.get('events')
+        
+        if not isinstance(events, list) or not events:
+            return Response({"detail": "A non-empty list of events is required."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(events) > MAX_BATCH_EVENTS:
+            return Response({"detail": f"At most {MAX_BATCH_EVENTS} events can be recorded at once."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer = GameEventSerializer(data=events, many=True)
+        if not serializer.is_valid():
+            return Response({"events": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        items = serializer.validated_data
+        
+        player_ids = {item['player_id'] for item in items if item.get('player_id') is not None}
+        known_players = set(User.objects.filter(id__in=player_ids).values_list('id', flat=True))
+        errors = [{"player_id": ["Player not found."]}
+                  if item.get('player_id') is not None and item['player_id'] not in known_players else {}
+                  for item in items]
+        if any(errors):
+            return Response({"events": errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        with transaction.atomic():
+            # Serializes concurrent replays of the same game
+            self._lock_games([game.id])
+            client_ids = {item['client_id'] for item in items if item.get('client_id')}
+            # A single add_event does not take the lock, so it can still
+            # store one of these client_ids first; then look again
+            for attempt in range(2):
+                seen = self._stored_client_ids(game, client_ids)
+                
+                new_events = []
+                duplicates = []
+                for item in items:
+                    client_id = item.get('client_id')
+                    if client_id:
+                        if client_id in seen:
+                            duplicates.append(client_id)
+                            continue
+                        seen.add(client_id)
+                    new_events.append(GameEvent(game=game, **item))
+                
+                try:
+                    with transaction.atomic():
+                        created = GameEvent.objects.bulk_create(new_events, batch_size=BULK_BATCH_SIZE)
+                    break
+                except IntegrityError:
+                    if attempt:
+                        raise
+            transaction.on_commit(lambda: publish_events(game, created))
+        
+        return Response({
+            "created": len(created),
+            "duplicates": duplicates,
+            "events": [{"id": event.id, "client_id": event.client_id} for event in created],
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+    
+    @staticmethod
+    def _stored_client_ids(game, client_ids):
+        return set(game.events.filter(client_id__in=client_ids).values_list('client_id', flat=True))
+    
     @action(detail=True, methods=['post'])
     def update_statistics(self, request, pk=None):
         game = self.get_object()
@@ -134,71 +387,137 @@ class GameViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['post'])
     def generate_schedule(self, request):
+        if request.data.get('venue_ids'):
+            return self._generate_slotted_schedule(request)
+        
         league_id = request.data.get('league_id')
         
         try:
             league = League.objects.get(id=league_id)
+            if league.organizer_id != request.user.id:
+                return Response({"detail": "You do not have permission to schedule this league."},
+                               status=status.HTTP_403_FORBIDDEN)
             teams = list(league.teams.all())
             
             if len(teams) < 2:
                 return Response({"detail": "League must have at least 2 teams to generate a schedule."}, 
                                status=status.HTTP_400_BAD_REQUEST)
             
-            # Simple round-robin schedule generation
-            games_created = self._generate_round_robin(league, teams)
+            # Balanced double round-robin, one round per matchday
+            result = generate_round_robin(league, teams)
             
-            return Response({"detail": f"{games_created} games have been scheduled."}, 
+            return Response({"detail": f"{result['games_created']} games have been scheduled.", **result}, 
                            status=status.HTTP_201_CREATED)
         except League.DoesNotExist:
             return Response({"detail": "League not found."}, status=status.HTTP_404_NOT_FOUND)
     
-    def _generate_round_robin(self, league, teams):
-        """Generate a round-robin schedule for the teams"""
-        import datetime
-        from itertools import combinations
+    def _generate_slotted_schedule(self, request):
+        """Schedule one or more leagues onto shared venues and weekly time slots"""
+        try:
+            league_ids = [int(league_id) for league_id in
+                          (request.data.get('league_ids') or [request.data.get('league_id')])]
+            venue_ids = [int(venue_id) for venue_id in request.data.get('venue_ids')]
+            slots = parse_slots(request.data.get('slots'))
+        except (TypeError, ValueError) as e:
+            return Response({"detail": str(e) or "Invalid league_ids or venue_ids."},
+                           status=status.HTTP_400_BAD_REQUEST)
         
-        # Get all possible team combinations
-        team_pairs = list(combinations(teams, 2))
-        games_created = 0
+        leagues = list(League.objects.filter(id__in=league_ids).prefetch_related('teams'))
+        if len(leagues) != len(set(league_ids)):
+            return Response({"detail": "League not found."}, status=status.HTTP_404_NOT_FOUND)
+        if any(league.organizer_id != request.user.id for league in leagues):
+            return Response({"detail": "You do not have permission to schedule this league."},
+                           status=status.HTTP_403_FORBIDDEN)
+        if Venue.objects.filter(id__in=venue_ids).count() != len(set(venue_ids)):
+            return Response({"detail": "Venue not found."}, status=status.HTTP_404_NOT_FOUND)
+        if any(len(league.teams.all()) < 2 for league in leagues):
+            return Response({"detail": "League must have at least 2 teams to generate a schedule."}, 
+                           status=status.HTTP_400_BAD_REQUEST)
         
-        # Start date is league start date or today if league has already started
-        start_date = max(league.start_date, datetime.date.today())
+        result = generate_slotted_schedule(leagues, venue_ids, slots)
         
-        if start_date > league.end_date:
-            return 0  # Cannot schedule games if season is over
-            
-        game_date = start_date
-        
-        # Schedule games with 3 days between each game
-        for home_team, away_team in team_pairs:
-            # Create home game
-            Game.objects.create(
-                league=league,
-                home_team=home_team,
-                away_team=away_team,
-                date=game_date,
-                time=datetime.time(18, 0)  # 6:00 PM default
-            )
-            games_created += 1
-            
-            # Add days for next game
-            game_date += datetime.timedelta(days=3)
-            
-            # Create away game (return match)
-            Game.objects.create(
-                league=league,
-                home_team=away_team,
-                away_team=home_team,
-                date=game_date,
-                time=datetime.time(18, 0)  # 6:00 PM default
-            )
-            games_created += 1
-            
-            # Add days for next game
-            game_date += datetime.timedelta(days=3)
-            
-            # Make sure we don't schedule past the league end date
-            if game_date > league.end_date:
-                break
+        return Response({"detail": f"{result['games_created']} games have been scheduled.", **result}, 
+                       status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['get'])
+    def venue_conflicts(self, request):
+        """List venue double-bookings in existing schedules"""
+        queryset = Game.objects.all()
+        params = request.query_params
+        
+        for param in ('venue_id', 'league_id'):
+            value = params.get(param)
+            if value and not value.isdigit():
+                return Response({"detail": f"Invalid {param}."}, status=status.HTTP_400_BAD_REQUEST)
+        
+        venue_id = params.get('venue_id')
+        if venue_id:
+            queryset = queryset.filter(venue_id=venue_id)
+        
+        for param, lookup in (('start_date', 'date__gte'), ('end_date', 'date__lte')):
+            value = params.get(param)
+            if value:
+                try:
+                    value = datetime.date.fromisoformat(value)
+                except ValueError:
+                    return Response({"detail": f"Invalid {param}, use the YYYY-MM-DD format."},
+                                   status=status.HTTP_400_BAD_REQUEST)
+                queryset = queryset.filter(**{lookup: value})
         
-        return games_created
+        league_id = params.get('league_id')
+        
+        return Response(find_venue_conflicts(queryset, league_id=league_id))
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+async def _live_stream(channels, snapshot):
+    """Server-sent events: the current scores, then every broadcast message"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + LIVE_STREAM_MAX_SECONDS
+    subscription = get_broker().subscribe(channels)
+    try:
+        yield "retry: 3000\n" + _sse('snapshot', snapshot)
+        while loop.time() < deadline:
+            try:
+                message = await asyncio.wait_for(subscription.get(), timeout=LIVE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield _sse(message['type'], message)
+    finally:
+        subscription.close()
+
+def _stream_response(channels, snapshot):
+    response = StreamingHttpResponse(_live_stream(channels, snapshot), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def _require_asgi(request):
+    # Under WSGI an open stream holds a worker thread for up to
+    # LIVE_STREAM_MAX_SECONDS, so refuse rather than starve other requests
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"detail": "Live streams require an ASGI server."},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+async def game_live_stream(request, pk):
+    """Stream score changes and events of one game"""
+    unavailable = _require_asgi(request)
+    if unavailable:
+        return unavailable
+    game = await Game.objects.filter(pk=pk).afirst()
+    if game is None:
+        raise Http404("Game not found.")
+    return _stream_response([game_channel(game.id)], [score_message(game)])
+
+async def league_live_stream(request, league_id):
+    """Stream score changes and events of every game in a league"""
+    unavailable = _require_asgi(request)
+    if unavailable:
+        return unavailable
+    if not await League.objects.filter(pk=league_id).aexists():
+        raise Http404("League not found.")
+    live_games = Game.objects.filter(league_id=league_id, status='in_progress')
+    return _stream_response([league_channel(league_id)], [score_message(game) async for game in live_games])
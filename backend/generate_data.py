@@ -0,0 +1,392 @@
+#!/usr/bin/env python
+"""
+Generate a large synthetic dataset for load tests and benchmarks.
+
+Unlike setup_db.py, rows are written with batched INSERTs, table by table
+in dependency order, with ids assigned up front so nothing has to be read
+back. The same seed, sizes and --today always produce the same data.
+
+Derived data is then computed the way the app computes it: like and
+comment counters from their rows, standings with rebuild_standings(),
+team analytics with calculate_league_analytics() and the search index
+with rebuild_search_index.
+
+Every generated user's password is "password".
+
+Usage:
+    python generate_data.py [--database PATH] [--seed 1] [--leagues 10]
+        [--teams-per-league 8] [--seasons 1] [--players-per-team 12]
+        [--fans 200] [--events-per-game 4] [--posts-per-user 3]
+        [--likes-per-user 10] [--comments-per-post 2]
+
+About 10M rows, in around five minutes:
+    python generate_data.py --database /tmp/load.sqlite3 --leagues 100 \\
+        --teams-per-league 12 --seasons 3 --players-per-team 15 --fans 50000 \\
+        --events-per-game 20 --posts-per-user 10 --likes-per-user 100
+"""
+import argparse
+import itertools
+import os
+import random
+import time
+from io import StringIO
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sports_league_backend.settings')
+
+BATCH_SIZE = 10000
+SEASON_DAYS = 180
+
+SPORTS = ['Soccer', 'Basketball', 'Hockey', 'Volleyball', 'Baseball']
+CITIES = ['Riverside', 'Lakewood', 'Fairview', 'Springfield', 'Georgetown', 'Madison', 'Clinton', 'Ashland',
+          'Burlington', 'Franklin', 'Greenville', 'Kingston', 'Marion', 'Oxford', 'Salem', 'Milton',
+          'Newport', 'Dayton', 'Dover', 'Hudson', 'Jackson', 'Lexington', 'Arlington', 'Bristol']
+MASCOTS = ['Eagles', 'Sharks', 'Lions', 'Rapids', 'Scorpions', 'Wolves', 'Hawks', 'Bears', 'Tigers',
+           'Falcons', 'Comets', 'Rangers', 'Pirates', 'Titans', 'Storm', 'Thunder', 'Vipers', 'Owls']
+POSITIONS = ['Forward', 'Midfielder', 'Defender', 'Goalkeeper', 'Guard', 'Center', 'Wing']
+WORDS = ('match game goal win loss draw season league team coach player fans stadium training practice '
+         'tonight tomorrow weekend great tough amazing comeback defense attack score final playoffs '
+         'derby rivals home away crowd referee penalty injury lineup transfer captain keeper striker '
+         'celebrate proud thanks support ticket schedule highlights replay cup trophy champions').split()
+
+
+def configure(db_path):
+    import django
+    from django.conf import settings
+
+    if db_path:
+        settings.DATABASES['default']['NAME'] = db_path
+    django.setup()
+
+
+class TableWriter:
+    """Buffers rows for one model's table and INSERTs them BATCH_SIZE at a time"""
+
+    def __init__(self, model, fields):
+        from django.db import connection
+        from django.db.models import DateField, DateTimeField, JSONField, TimeField
+
+        self.connection = connection
+        self.model = model
+        fields = [model._meta.get_field(name) for name in fields]
+        # Only these need converting to what the database stores
+        self.converters = [
+            (i, field.get_db_prep_save) for i, field in enumerate(fields)
+            if isinstance(field, (DateField, DateTimeField, TimeField, JSONField))
+        ]
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        self.sql = (f'INSERT INTO {connection.ops.quote_name(model._meta.db_table)} ({columns}) '
+                    f'VALUES ({", ".join(["%s"] * len(fields))})')
+        self.rows = []
+        self.count = 0
+
+    def add(self, *values):
+        self.rows.append(values)
+        if len(self.rows) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        rows = self.rows
+        if self.converters:
+            rows = [list(row) for row in rows]
+            for row in rows:
+                for i, convert in self.converters:
+                    row[i] = convert(row[i], connection=self.connection)
+        with self.connection.cursor() as cursor:
+            cursor.executemany(self.sql, rows)
+        self.count += len(rows)
+        self.rows = []
+
+
+def next_id(model):
+    from django.db.models import Max
+
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+class Generator:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.today = args.today
+        self.now = datetime.combine(self.today, dt_time(12, 0), tzinfo=dt_timezone.utc)
+        self.counts = {}
+
+    def write(self, name, writers, fill):
+        """Run ``fill``, which adds rows to ``writers``, in one transaction"""
+        from django.db import transaction
+
+        started = time.monotonic()
+        with transaction.atomic():
+            fill()
+            for writer in writers:
+                writer.flush()
+        elapsed = time.monotonic() - started
+        for writer in writers:
+            self.counts[writer.model._meta.label] = writer.count
+        rows = sum(writer.count for writer in writers)
+        print(f"  {name}: {rows:,} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-6):,.0f} rows/s)")
+
+    def sentence(self, low, high):
+        words = self.rng.choices(WORDS, k=self.rng.randint(low, high))
+        return ' '.join(words).capitalize() + '.'
+
+    def moment(self, days_back):
+        """A datetime up to ``days_back`` days before --today"""
+        return self.now - timedelta(seconds=self.rng.randrange(max(days_back, 1) * 86400))
+
+    def run(self):
+        from django.contrib.auth.hashers import make_password
+        from django.contrib.auth import get_user_model
+        from community.models import Comment, Post
+        from games.models import Game, GameEvent, Venue
+        from games.scheduling import round_robin_rounds
+        from leagues.models import League
+        from teams.models import Team, TeamMember
+        from users.models import Profile
+
+        User = get_user_model()
+        args, rng = self.args, self.rng
+        teams_count = args.leagues * args.teams_per_league
+
+        # Ids are assigned up front, after whatever the database already holds
+        first_user, first_team, first_league = next_id(User), next_id(Team), next_id(League)
+        first_venue, first_game, first_post = next_id(Venue), next_id(Game), next_id(Post)
+
+        new_user_id = itertools.count(first_user)
+        organizers = [next(new_user_id) for _ in range(args.leagues)]
+        coaches = [next(new_user_id) for _ in range(teams_count)]
+        rosters = [[next(new_user_id) for _ in range(args.players_per_team)] for _ in range(teams_count)]
+        fans = [next(new_user_id) for _ in range(args.fans)]
+        user_ids = organizers + coaches + [pk for roster in rosters for pk in roster] + fans
+        team_ids = list(range(first_team, first_team + teams_count))
+
+        # Users and profiles
+        users = TableWriter(User, ['id', 'password', 'is_superuser', 'username', 'first_name', 'last_name',
+                                   'email', 'is_staff', 'is_active', 'date_joined'])
+        profiles = TableWriter(Profile, ['user_id', 'avatar', 'avatar_variants', 'bio', 'phone', 'address', 'roles'])
+        roles = {**{pk: 'organizer' for pk in organizers}, **{pk: 'coach' for pk in coaches},
+                 **{pk: 'fan' for pk in fans}}
+        # A fixed salt keeps the output identical from run to run
+        password = make_password('password', salt=f'generated{args.seed}')
+
+        def fill_users():
+            for pk in user_ids:
+                role = roles.get(pk, 'player')
+                users.add(pk, password, False, f'{role}{pk}', rng.choice(CITIES), rng.choice(MASCOTS),
+                          f'{role}{pk}@example.com', False, True, self.moment(730))
+                profiles.add(pk, '', {}, '', '', '', [role])
+        self.write('users', [users, profiles], fill_users)
+
+        # Teams, rosters, venues
+        teams = TableWriter(Team, ['id', 'name', 'sport', 'logo', 'logo_variants', 'created_at', 'updated_at'])
+        members = TableWriter(TeamMember, ['team_id', 'user_id', 'role', 'jersey_number', 'position', 'joined_date'])
+        venues = TableWriter(Venue, ['id', 'name', 'address', 'city', 'state', 'zip_code', 'capacity'])
+        sports = [SPORTS[i % len(SPORTS)] for i in range(args.leagues)]
+        venue_count = max(1, teams_count // 2)
+
+        def fill_teams():
+            for t, team_id in enumerate(team_ids):
+                created = self.moment(730)
+                teams.add(team_id, f'{rng.choice(CITIES)} {rng.choice(MASCOTS)}', sports[t // args.teams_per_league],
+                          '', {}, created, created)
+                members.add(team_id, coaches[t], 'coach', None, '', created.date())
+                for number, player in enumerate(rosters[t], start=1):
+                    members.add(team_id, player, 'player', number, rng.choice(POSITIONS), created.date())
+            for v in range(venue_count):
+                city = rng.choice(CITIES)
+                venues.add(first_venue + v, f'{city} Park {v + 1}', f'{rng.randint(1, 999)} Main St', city,
+                           'ST', f'{rng.randint(10000, 99999)}', rng.choice([None, 500, 2000, 10000]))
+        self.write('teams', [teams, members, venues], fill_teams)
+
+        # Leagues: one row per series and season, the newest season under way
+        leagues = TableWriter(League, ['id', 'name', 'sport', 'season', 'start_date', 'end_date', 'status',
+                                       'organizer_id', 'tiebreakers', 'created_at', 'updated_at'])
+        league_teams = TableWriter(League.teams.through, ['league_id', 'team_id'])
+        followers = TableWriter(League.followers.through, ['league_id', 'user_id'])
+        seasons = []  # (league_id, start_date, end_date, team ids)
+
+        def fill_leagues():
+            league_id = first_league
+            for series in range(args.leagues):
+                name = f'{rng.choice(CITIES)} {sports[series]} League'
+                series_teams = team_ids[series * args.teams_per_league:(series + 1) * args.teams_per_league]
+                for season in range(args.seasons):
+                    start = self.today - timedelta(days=SEASON_DAYS // 2 + 365 * (args.seasons - 1 - season))
+                    end = start + timedelta(days=SEASON_DAYS)
+                    status = 'completed' if end < self.today else 'active'
+                    created = datetime.combine(start, dt_time(9, 0), tzinfo=dt_timezone.utc) - timedelta(days=30)
+                    leagues.add(league_id, name, sports[series], str(start.year), start, end, status,
+                                organizers[series], ['point_differential', 'points_for'], created, created)
+                    for team_id in series_teams:
+                        league_teams.add(league_id, team_id)
+                    seasons.append((league_id, start, end, series_teams))
+                    league_id += 1
+            # Fans follow a few of the current seasons
+            current = [league_id for league_id, start, end, _ in seasons if end >= self.today] or [seasons[-1][0]]
+            for fan in fans:
+                for followed in rng.sample(current, min(len(current), rng.randint(1, 3))):
+                    followers.add(followed, fan)
+        self.write('leagues', [leagues, league_teams, followers], fill_leagues)
+
+        # Games: a double round robin per season; games before --today are completed
+        games = TableWriter(Game, ['id', 'league_id', 'home_team_id', 'away_team_id', 'venue_id', 'date', 'time',
+                                   'status', 'home_score', 'away_score', 'created_at', 'updated_at'])
+        events = TableWriter(GameEvent, ['game_id', 'time', 'description', 'player_id', 'event_type', 'data',
+                                         'created_at'])
+        event_types = [choice for choice, _ in GameEvent.EVENT_TYPES]
+        roster_of = dict(zip(team_ids, rosters))
+
+        def fill_games():
+            game_id = first_game
+            for league_id, start, end, series_teams in seasons:
+                rounds = round_robin_rounds(series_teams)
+                spacing = max(1, SEASON_DAYS // max(len(rounds), 1))
+                for r, pairs in enumerate(rounds):
+                    day = start + timedelta(days=r * spacing)
+                    kickoff = datetime.combine(day, dt_time(18, 0), tzinfo=dt_timezone.utc)
+                    for home, away in pairs:
+                        played = day < self.today
+                        home_score = rng.randint(0, 5) if played else None
+                        away_score = rng.randint(0, 5) if played else None
+                        games.add(game_id, league_id, home, away, first_venue + rng.randrange(venue_count), day,
+                                  dt_time(rng.choice([12, 15, 18, 20]), 0), 'completed' if played else 'scheduled',
+                                  home_score, away_score, kickoff - timedelta(days=60), kickoff)
+                        if played:
+                            players = roster_of[home] + roster_of[away]
+                            for minute in sorted(rng.sample(range(1, 91), min(args.events_per_game, 90))):
+                                events.add(game_id, f'{minute}:00', self.sentence(2, 6),
+                                           rng.choice(players) if players else None, rng.choice(event_types),
+                                           {}, kickoff + timedelta(minutes=minute))
+                        game_id += 1
+        self.write('games', [games, events], fill_games)
+
+        # Posts, likes and comments; counters are recounted from the rows afterwards
+        posts = TableWriter(Post, ['id', 'author_id', 'content', 'created_at', 'updated_at', 'team_id',
+                                   'shares_count', 'likes_count', 'comments_count', 'views_count'])
+        likes = TableWriter(Post.likes.through, ['post_id', 'user_id'])
+        comments = TableWriter(Comment, ['post_id', 'author_id', 'content', 'created_at', 'updated_at',
+                                         'parent_id', 'likes_count'])
+        team_of = {player: team_id for team_id, roster in roster_of.items() for player in roster}
+        team_of.update(zip(coaches, team_ids))
+        posts_count = len(user_ids) * args.posts_per_user
+
+        def fill_posts():
+            post_id = first_post
+            for author in user_ids:
+                for _ in range(args.posts_per_user):
+                    created = self.moment(365)
+                    posts.add(post_id, author, self.sentence(6, 30), created, created, team_of.get(author),
+                              rng.randint(0, 5), 0, 0, rng.randint(0, 200))
+                    for _ in range(rng.randint(0, 2 * args.comments_per_post)):
+                        comment_at = created + timedelta(minutes=rng.randint(1, 600))
+                        comments.add(post_id, rng.choice(user_ids), self.sentence(3, 15), comment_at, comment_at,
+                                     None, 0)
+                    post_id += 1
+            if posts_count:
+                for user in user_ids:
+                    for offset in rng.sample(range(posts_count), min(args.likes_per_user, posts_count)):
+                        likes.add(first_post + offset, user)
+        self.write('posts', [posts, likes, comments], fill_posts)
+
+        self.derive(first_post, first_post + posts_count - 1, [league[0] for league in seasons])
+        print(f"Generated {sum(self.counts.values()):,} rows:")
+        for label, count in sorted(self.counts.items()):
+            print(f"  {label}: {count:,}")
+
+    def derive(self, first_post, last_post, league_ids):
+        from django.core.management import call_command
+        from django.db import transaction
+        from django.db.models import Count, OuterRef, Subquery
+        from django.db.models.functions import Coalesce
+        from analytics.calculations import calculate_league_analytics
+        from community.models import Comment, Post
+        from leagues.models import League
+        from leagues.standings import rebuild_standings
+
+        def count(model, field):
+            return Coalesce(Subquery(
+                model.objects.filter(**{field: OuterRef('pk')}).order_by().values(field)
+                .annotate(total=Count('id')).values('total')
+            ), 0)
+
+        started = time.monotonic()
+        with transaction.atomic():
+            Post.objects.filter(pk__range=(first_post, last_post)).update(
+                likes_count=count(Post.likes.through, 'post_id'),
+                comments_count=count(Comment, 'post_id'),
+            )
+        print(f"  post counters: {time.monotonic() - started:.1f}s")
+
+        started = time.monotonic()
+        summary = rebuild_standings(league_ids=league_ids)
+        print(f"  standings: {summary['created'] + summary['updated']} rows in {time.monotonic() - started:.1f}s")
+        self.counts['leagues.Standing'] = summary['created']
+
+        started = time.monotonic()
+        analytics = 0
+        for league in League.objects.filter(id__in=league_ids):
+            analytics += len(calculate_league_analytics(league, league.start_date, league.end_date))
+        print(f"  team analytics: {analytics} rows in {time.monotonic() - started:.1f}s")
+        self.counts['analytics.TeamAnalytics'] = analytics
+
+        if self.args.search_index:
+            started = time.monotonic()
+            call_command('rebuild_search_index', stdout=StringIO())
+            print(f"  search index: {time.monotonic() - started:.1f}s")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', help='SQLite file to create and migrate (default: the configured database)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--today', type=date.fromisoformat, default=date.today(),
+                        help='Date the data is generated around (YYYY-MM-DD, default: today)')
+    parser.add_argument('--leagues', type=int, default=10)
+    parser.add_argument('--teams-per-league', type=int, default=8)
+    parser.add_argument('--seasons', type=int, default=1)
+    parser.add_argument('--players-per-team', type=int, default=12)
+    parser.add_argument('--fans', type=int, default=200, help='Users outside any team')
+    parser.add_argument('--events-per-game', type=int, default=4)
+    parser.add_argument('--posts-per-user', type=int, default=3)
+    parser.add_argument('--likes-per-user', type=int, default=10)
+    parser.add_argument('--comments-per-post', type=int, default=2, help='Average comments per post')
+    parser.add_argument('--no-search-index', dest='search_index', action='store_false',
+                        help='Skip rebuilding the search index')
+    return parser
+
+
+def generate(args):
+    """Migrate ``args.database`` if given, and fill the database"""
+    from django.core.management import call_command
+    from django.db import connection
+
+    if args.database:
+        call_command('migrate', verbosity=0)
+    if connection.vendor == 'sqlite':
+        # Bulk load: skip fsyncs; a crash mid-run leaves a throwaway database anyway
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous = OFF')
+
+    print(f"Generating data (seed {args.seed}) into {connection.settings_dict['NAME']}")
+    started = time.monotonic()
+    generator = Generator(args)
+    generator.run()
+    print(f"Done in {time.monotonic() - started:.1f}s")
+    return generator.counts
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.leagues < 1 or args.seasons < 1 or args.teams_per_league < 2:
+        parser.error('need at least one league and season, and two teams per league')
+
+    configure(args.database)
+    generate(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import League, Standing
+from .standings import rebuild_standings
 
 class StandingInline(admin.TabularInline):
     model = Standing
@@ -10,6 +11,16 @@ class LeagueAdmin(admin.ModelAdmin):
     list_filter = ('sport', 'status', 'season')
     search_fields = ('name', 'sport')
     inlines = [StandingInline]
+    actions = ['rebuild_standings']
+    
+    @admin.action(description='Rebuild standings from completed games')
+    def rebuild_standings(self, request, queryset):
+        summary = rebuild_standings(league_ids=list(queryset.values_list('id', flat=True)))
+        self.message_user(
+            request,
+            f"Standings rebuilt for {summary['leagues']} leagues: "
+            f"{summary['updated']} corrected, {summary['created']} created.",
+        )
 
 admin.site.register(League, LeagueAdmin)
 admin.site.register(Standing)
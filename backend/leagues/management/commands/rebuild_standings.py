@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from leagues.standings import REBUILD_BATCH_SIZE, rebuild_standings
+
+
+class Command(BaseCommand):
+    help = 'Rebuild league standings from completed games'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--league', type=int, action='append', dest='league_ids',
+                            help='League ID to rebuild (repeatable, default: all leagues)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only list the standings that differ from the games')
+        parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE,
+                            help='Leagues aggregated per batch')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        report = self.report_change if dry_run or options['verbosity'] > 1 else None
+
+        started = time.perf_counter()
+        summary = rebuild_standings(
+            league_ids=options['league_ids'],
+            dry_run=dry_run,
+            batch_size=options['batch_size'],
+            report=report,
+        )
+        elapsed = time.perf_counter() - started
+
+        verb = 'would be' if dry_run else 'were'
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['leagues']} leagues checked in {elapsed:.1f}s: "
+            f"{summary['updated']} standings {verb} corrected, {summary['created']} {verb} created."
+        ))
+
+    def report_change(self, change):
+        label = f"League {change['league_id']} / Team {change['team_id']}"
+        if change['current'] is None:
+            self.stdout.write(f"{label}: missing, expected {change['expected']}")
+            return
+
+        diffs = ', '.join(
+            f"{field} {change['current'][field]} -> {value}"
+            for field, value in change['expected'].items()
+            if change['current'][field] != value
+        )
+        self.stdout.write(f"{label}: {diffs}")
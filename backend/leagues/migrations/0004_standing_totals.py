@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:43
+
+from django.db import migrations, models
+from django.db.models import F
+import leagues.models
+
+
+def fill_standing_totals(apps, schema_editor):
+    Standing = apps.get_model('leagues', 'Standing')
+    Standing.objects.update(
+        games_played=F('wins') + F('losses') + F('draws'),
+        points=F('wins') * 3 + F('draws'),
+        point_differential=F('points_for') - F('points_against'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leagues', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='league',
+            name='tiebreakers',
+            field=models.JSONField(default=leagues.models.default_tiebreakers),
+        ),
+        migrations.AddField(
+            model_name='standing',
+            name='games_played',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='standing',
+            name='point_differential',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='standing',
+            name='points',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_standing_totals, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='standing',
+            index=models.Index(fields=['league', '-points', '-point_differential'], name='standing_rank_idx'),
+        ),
+    ]
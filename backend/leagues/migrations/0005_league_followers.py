@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('leagues', '0004_standing_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='league',
+            name='followers',
+            field=models.ManyToManyField(blank=True, related_name='followed_leagues', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
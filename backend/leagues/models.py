@@ -1,7 +1,43 @@
 from django.db import models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from teams.models import Team
 
+# Default scoring: 3 points for win, 1 for draw, 0 for loss
+POINTS_PER_WIN = 3
+POINTS_PER_DRAW = 1
+
+# Tie-breakers applied, in order, to teams level on points
+TIEBREAKER_CHOICES = ('head_to_head', 'point_differential', 'points_for', 'wins')
+
+def default_tiebreakers():
+    return ['point_differential', 'points_for']
+
+def standing_totals(wins, losses, draws, points_for, points_against):
+    """Derived standing columns. Linear, so it also converts deltas."""
+    return {
+        'games_played': wins + losses + draws,
+        'points': (wins * POINTS_PER_WIN) + (draws * POINTS_PER_DRAW),
+        'point_differential': points_for - points_against,
+    }
+
+class LeagueQuerySet(models.QuerySet):
+    def with_counts(self):
+        """Annotate the values behind teams_count, games_count and completed_games_count"""
+        # Correlated subqueries rather than a join, so a page of leagues
+        # counts only its own games instead of grouping every game first
+        teams = (League.teams.through.objects.filter(league_id=OuterRef('pk'))
+                 .order_by().values('league_id').annotate(total=Count('id')).values('total'))
+        Game = self.model._meta.get_field('games').related_model
+        games = (Game.objects.filter(league_id=OuterRef('pk'))
+                 .order_by().values('league_id').annotate(total=Count('id'), completed=Count('id', filter=Q(status='completed'))))
+        return self.annotate(
+            num_teams=Coalesce(Subquery(teams), 0),
+            num_games=Coalesce(Subquery(games.values('total')), 0),
+            num_completed_games=Coalesce(Subquery(games.values('completed')), 0),
+        )
+
 class League(models.Model):
     """League model for organizing teams and games"""
     name = models.CharField(max_length=100)
@@ -21,22 +57,37 @@ class League(models.Model):
     teams = models.ManyToManyField(Team, related_name='leagues', blank=True)
     organizer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='organized_leagues')
     
+    # Fans whose community feed includes posts of the league's teams
+    followers = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='followed_leagues', blank=True)
+    
+    # Order in which teams level on points are separated
+    tiebreakers = models.JSONField(default=default_tiebreakers)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = LeagueQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.name} - {self.season}"
     
+    # The counts below use the with_counts() annotations when present
     @property
     def teams_count(self):
+        if hasattr(self, 'num_teams'):
+            return self.num_teams
         return self.teams.count()
     
     @property
     def games_count(self):
+        if hasattr(self, 'num_games'):
+            return self.num_games
         return self.games.count()
     
     @property
     def completed_games_count(self):
+        if hasattr(self, 'num_completed_games'):
+            return self.num_completed_games
         return self.games.filter(status='completed').count()
 
 class Standing(models.Model):
@@ -49,21 +100,24 @@ class Standing(models.Model):
     points_for = models.IntegerField(default=0)
     points_against = models.IntegerField(default=0)
     
+    # Stored so the table can be sorted by the database
+    games_played = models.IntegerField(default=0, editable=False)
+    points = models.IntegerField(default=0, editable=False)
+    point_differential = models.IntegerField(default=0, editable=False)
+    
     class Meta:
         unique_together = ('league', 'team')
+        indexes = [
+            models.Index(fields=['league', '-points', '-point_differential'], name='standing_rank_idx'),
+        ]
     
     def __str__(self):
         return f"{self.team.name} in {self.league.name}"
     
-    @property
-    def games_played(self):
-        return self.wins + self.losses + self.draws
-    
-    @property
-    def points(self):
-        # Default scoring: 3 points for win, 1 for draw, 0 for loss
-        return (self.wins * 3) + self.draws
-    
-    @property
-    def point_differential(self):
-        return self.points_for - self.points_against
+    def save(self, *args, **kwargs):
+        for field, value in standing_totals(self.wins, self.losses, self.draws,
+                                            self.points_for, self.points_against).items():
+            setattr(self, field, value)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'games_played', 'points', 'point_differential'}
+        super().save(*args, **kwargs)
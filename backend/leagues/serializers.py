@@ -1,15 +1,20 @@
 from rest_framework import serializers
-from .models import League, Standing
+from .models import League, Standing, TIEBREAKER_CHOICES
 from teams.serializers import TeamSerializer
 from users.serializers import UserSerializer
 
 class StandingSerializer(serializers.ModelSerializer):
     team_name = serializers.CharField(source='team.name', read_only=True)
+    rank = serializers.SerializerMethodField()
     
     class Meta:
         model = Standing
-        fields = ['team_id', 'team_name', 'wins', 'losses', 'draws', 'points_for', 'points_against', 'games_played', 'points', 'point_differential']
+        fields = ['rank', 'team_id', 'team_name', 'wins', 'losses', 'draws', 'points_for', 'points_against', 'games_played', 'points', 'point_differential']
         read_only_fields = ['games_played', 'points', 'point_differential']
+    
+    def get_rank(self, obj):
+        # Only set when the standings were ranked (see rank_standings)
+        return getattr(obj, 'rank', None)
 
 class LeagueSerializer(serializers.ModelSerializer):
     teams_count = serializers.IntegerField(read_only=True)
@@ -21,9 +26,14 @@ class LeagueSerializer(serializers.ModelSerializer):
         model = League
         fields = ['id', 'name', 'sport', 'season', 'start_date', 'end_date', 'status', 
                   'teams_count', 'games_count', 'completed_games_count', 'organizer', 
-                  'created_at', 'updated_at']
+                  'tiebreakers', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
     
+    def validate_tiebreakers(self, value):
+        if not isinstance(value, list) or any(name not in TIEBREAKER_CHOICES for name in value):
+            raise serializers.ValidationError(f"Tie-breakers must be a list drawn from: {', '.join(TIEBREAKER_CHOICES)}.")
+        return value
+    
     def create(self, validated_data):
         user = self.context['request'].user
         league = League.objects.create(organizer=user, **validated_data)
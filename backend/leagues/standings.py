@@ -0,0 +1,237 @@
+"""
+Standings arithmetic shared by score updates, ranking and rebuilds.
+
+Game results are turned into per-team deltas which are applied with
+database-side arithmetic, one UPDATE per league. Rebuilds recompute the
+whole table from completed games with grouped aggregate queries.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+
+from games.models import Game
+from .models import League, Standing, standing_totals
+
+DELTA_FIELDS = ('wins', 'losses', 'draws', 'points_for', 'points_against')
+DERIVED_FIELDS = ('games_played', 'points', 'point_differential')
+REBUILD_BATCH_SIZE = 100  # Leagues per aggregation batch
+
+
+def result_deltas(home_score, away_score):
+    """Return the (home, away) standing changes produced by a final score."""
+    home = {'wins': 0, 'losses': 0, 'draws': 0, 'points_for': home_score, 'points_against': away_score}
+    away = {'wins': 0, 'losses': 0, 'draws': 0, 'points_for': away_score, 'points_against': home_score}
+
+    if home_score > away_score:
+        home['wins'] = away['losses'] = 1
+    elif away_score > home_score:
+        away['wins'] = home['losses'] = 1
+    else:
+        home['draws'] = away['draws'] = 1
+
+    return home, away
+
+
+class StandingDeltas:
+    """
+    Accumulates standing changes for many games.
+
+    ``add_result`` with ``sign=-1`` reverts a previously applied result, so
+    re-scored games can be corrected in the same batch. ``apply`` writes
+    everything with one INSERT (for missing rows) and one UPDATE per league.
+    """
+
+    def __init__(self):
+        self.deltas = defaultdict(lambda: defaultdict(lambda: dict.fromkeys(DELTA_FIELDS, 0)))
+
+    def add_result(self, league_id, home_team_id, away_team_id, home_score, away_score, sign=1):
+        home, away = result_deltas(home_score, away_score)
+        for team_id, changes in ((home_team_id, home), (away_team_id, away)):
+            totals = self.deltas[league_id][team_id]
+            for field, value in changes.items():
+                totals[field] += sign * value
+
+    def add_game(self, game, home_score=None, away_score=None, sign=1):
+        """Add a game's result, optionally with scores other than its current ones."""
+        self.add_result(
+            game.league_id,
+            game.home_team_id,
+            game.away_team_id,
+            game.home_score if home_score is None else home_score,
+            game.away_score if away_score is None else away_score,
+            sign,
+        )
+
+    def apply(self):
+        for league_id, teams in self.deltas.items():
+            teams = {team_id: {**changes, **standing_totals(**changes)}
+                     for team_id, changes in teams.items() if any(changes.values())}
+            if not teams:
+                continue
+
+            Standing.objects.bulk_create(
+                [Standing(league_id=league_id, team_id=team_id) for team_id in teams],
+                ignore_conflicts=True,
+            )
+
+            updates = {}
+            for field in DELTA_FIELDS + DERIVED_FIELDS:
+                whens = [When(team_id=team_id, then=Value(changes[field]))
+                         for team_id, changes in teams.items() if changes[field]]
+                if whens:
+                    updates[field] = F(field) + Case(*whens, default=Value(0), output_field=IntegerField())
+
+            Standing.objects.filter(league_id=league_id, team_id__in=teams).update(**updates)
+
+        self.deltas.clear()
+
+
+def head_to_head_points(league, standings):
+    """
+    League points each team earned against the teams level with it on points.
+
+    Uses one query over the completed games between tied teams.
+    """
+    group = {standing.team_id: standing.points for standing in standings}
+    level = defaultdict(int)
+    for points in group.values():
+        level[points] += 1
+    tied = [team_id for team_id, points in group.items() if level[points] > 1]
+
+    totals = dict.fromkeys(group, 0)
+    if not tied:
+        return totals
+
+    games = league.games.filter(
+        status='completed', home_team_id__in=tied, away_team_id__in=tied,
+    ).values_list('home_team_id', 'away_team_id', 'home_score', 'away_score')
+    for home_id, away_id, home_score, away_score in games:
+        if group[home_id] != group[away_id] or home_score is None or away_score is None:
+            continue
+        home, away = result_deltas(home_score, away_score)
+        totals[home_id] += standing_totals(**home)['points']
+        totals[away_id] += standing_totals(**away)['points']
+    return totals
+
+
+def rank_standings(league, tiebreakers=None):
+    """
+    Return the league's standings ranked by points, then by ``tiebreakers``.
+
+    Column tie-breakers are sorted by the database (backed by the
+    ``standing_rank_idx`` index); head-to-head is resolved in memory from a
+    single extra query. Each standing gets a ``rank`` attribute.
+    """
+    if tiebreakers is None:
+        tiebreakers = league.tiebreakers
+
+    ordering = ['-points'] + [f'-{name}' for name in tiebreakers if name != 'head_to_head'] + ['team__name']
+    standings = list(league.standings.select_related('team').order_by(*ordering))
+
+    if 'head_to_head' in tiebreakers:
+        head_to_head = head_to_head_points(league, standings)
+        # Stable sort, so remaining ties keep the database order
+        standings.sort(key=lambda standing: [-standing.points] + [
+            -(head_to_head[standing.team_id] if name == 'head_to_head' else getattr(standing, name))
+            for name in tiebreakers
+        ])
+
+    for position, standing in enumerate(standings, start=1):
+        standing.rank = position
+    return standings
+
+
+def game_totals(league_ids):
+    """
+    Aggregate completed games into ``{(league_id, team_id): totals}``.
+
+    Runs one grouped query for home sides and one for away sides, so memory
+    grows with the number of standings, not the number of games.
+    """
+    games = Game.objects.filter(
+        league_id__in=league_ids, status='completed', home_score__isnull=False, away_score__isnull=False,
+    )
+    totals = defaultdict(lambda: dict.fromkeys(DELTA_FIELDS, 0))
+
+    for side, other in (('home', 'away'), ('away', 'home')):
+        rows = games.values('league_id', f'{side}_team_id').annotate(
+            wins=Count('id', filter=Q(**{f'{side}_score__gt': F(f'{other}_score')})),
+            losses=Count('id', filter=Q(**{f'{side}_score__lt': F(f'{other}_score')})),
+            draws=Count('id', filter=Q(**{f'{side}_score': F(f'{other}_score')})),
+            points_for=Sum(f'{side}_score'),
+            points_against=Sum(f'{other}_score'),
+        ).order_by()
+        for row in rows:
+            team_totals = totals[(row['league_id'], row[f'{side}_team_id'])]
+            for field in DELTA_FIELDS:
+                team_totals[field] += row[field]
+
+    return totals
+
+
+def standing_changes(league_ids):
+    """
+    Compare stored standings of ``league_ids`` with their completed games.
+
+    Returns a list of dicts with the ``standing`` (``None`` when the row is
+    missing), its ``current`` values and the ``expected`` ones. Teams with
+    a standing but no completed games are expected to be all zeros.
+    """
+    expected = game_totals(league_ids)
+    changes = []
+
+    for standing in Standing.objects.filter(league_id__in=league_ids).order_by('league_id', 'team_id'):
+        totals = expected.pop((standing.league_id, standing.team_id), dict.fromkeys(DELTA_FIELDS, 0))
+        totals.update(standing_totals(**totals))
+        current = {field: getattr(standing, field) for field in DELTA_FIELDS + DERIVED_FIELDS}
+        if current != totals:
+            changes.append({'league_id': standing.league_id, 'team_id': standing.team_id,
+                            'standing': standing, 'current': current, 'expected': totals})
+
+    for (league_id, team_id), totals in sorted(expected.items()):
+        totals.update(standing_totals(**totals))
+        changes.append({'league_id': league_id, 'team_id': team_id,
+                        'standing': None, 'current': None, 'expected': totals})
+
+    return changes
+
+
+def rebuild_standings(league_ids=None, dry_run=False, batch_size=REBUILD_BATCH_SIZE, report=None):
+    """
+    Recompute standings from completed games for some or all leagues.
+
+    Leagues are processed in batches so memory stays bounded however many
+    games there are. Each change is passed to ``report`` (if given); with
+    ``dry_run`` nothing is written. Returns a summary of the work done.
+    """
+    leagues = League.objects.order_by('id')
+    if league_ids is not None:
+        leagues = leagues.filter(id__in=league_ids)
+    league_ids = list(leagues.values_list('id', flat=True))
+
+    summary = {'leagues': len(league_ids), 'updated': 0, 'created': 0}
+    for start in range(0, len(league_ids), batch_size):
+        changes = standing_changes(league_ids[start:start + batch_size])
+        if report:
+            for change in changes:
+                report(change)
+
+        updated = []
+        created = []
+        for change in changes:
+            standing = change['standing'] or Standing(league_id=change['league_id'], team_id=change['team_id'])
+            for field, value in change['expected'].items():
+                setattr(standing, field, value)
+            (updated if change['standing'] else created).append(standing)
+
+        summary['updated'] += len(updated)
+        summary['created'] += len(created)
+        if dry_run:
+            continue
+
+        with transaction.atomic():
+            Standing.objects.bulk_update(updated, DELTA_FIELDS + DERIVED_FIELDS, batch_size=500)
+            Standing.objects.bulk_create(created, batch_size=500)
+
+    return summary
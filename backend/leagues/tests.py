@@ -0,0 +1,206 @@
+from datetime import date, time, timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from teams.models import Team
+from games.models import Game
+from .models import League, Standing
+from .standings import head_to_head_points, rank_standings, rebuild_standings, standing_changes
+
+User = get_user_model()
+
+
+class LeagueListQueryTests(APITestCase):
+    """The league list must not run per-row count queries"""
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', email='org@test.com', password='password')
+        teams = [Team.objects.create(name=f'Team {i}', sport='Soccer') for i in range(4)]
+
+        for i in range(25):
+            league = League.objects.create(
+                name=f'League {i}', sport='Soccer', season='2024',
+                start_date=date.today(), end_date=date.today() + timedelta(days=90),
+                organizer=self.organizer,
+            )
+            league.teams.add(*teams[:i % 4 + 1])
+            for day in range(i % 3):
+                Game.objects.create(league=league, home_team=teams[0], away_team=teams[1],
+                                    date=date.today() + timedelta(days=day), time=time(18, 0),
+                                    status='completed' if day else 'scheduled')
+
+    def test_list_page_query_count_is_constant(self):
+        # One COUNT for the paginator, one query for the page
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/leagues/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_list_page_does_not_join_games(self):
+        # Joining and grouping every game before LIMIT made the list slow on
+        # large tables; each league on the page counts its own games instead
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/leagues/')
+        page = queries[-1]['sql']
+        self.assertNotIn('JOIN "games_game"', page)
+        self.assertNotIn('GROUP BY "leagues_league"', page)
+
+    def test_list_counts_match_properties(self):
+        response = self.client.get('/api/leagues/')
+        for item in response.data['results']:
+            league = League.objects.get(id=item['id'])
+            self.assertEqual(item['teams_count'], league.teams.count())
+            self.assertEqual(item['games_count'], league.games.count())
+            self.assertEqual(item['completed_games_count'], league.games.filter(status='completed').count())
+            self.assertEqual(item['organizer']['id'], self.organizer.id)
+
+
+class StandingsRankingTests(APITestCase):
+    def setUp(self):
+        organizer = User.objects.create_user(username='organizer', email='org@test.com', password='password')
+        self.league = League.objects.create(
+            name='League', sport='Soccer', season='2024',
+            start_date=date.today(), end_date=date.today() + timedelta(days=90),
+            organizer=organizer,
+        )
+        # Alpha, Bravo, Charlie and Echo are level on points; Alpha and Echo on everything
+        rows = {
+            'Alpha': (2, 1, 5, 4), 'Bravo': (2, 1, 6, 3), 'Charlie': (2, 1, 8, 5),
+            'Delta': (0, 3, 1, 9), 'Echo': (2, 1, 5, 4),
+        }
+        self.teams = {}
+        for name, (wins, losses, points_for, points_against) in rows.items():
+            team = self.teams[name] = Team.objects.create(name=name, sport='Soccer')
+            self.league.teams.add(team)
+            Standing.objects.create(league=self.league, team=team, wins=wins, losses=losses,
+                                    points_for=points_for, points_against=points_against)
+
+        # Alpha beat Charlie; Delta's win over Alpha is not between tied teams
+        self.game('Alpha', 'Charlie', 1, 0)
+        self.game('Delta', 'Alpha', 2, 0)
+        self.game('Bravo', 'Echo', 1, 1, status='scheduled')
+
+    def game(self, home, away, home_score, away_score, status='completed'):
+        Game.objects.create(league=self.league, home_team=self.teams[home], away_team=self.teams[away],
+                            date=date.today(), time=time(18, 0), status=status,
+                            home_score=home_score, away_score=away_score)
+
+    def names(self, standings):
+        return [standing.team.name for standing in standings]
+
+    def test_default_tiebreakers_then_team_name(self):
+        standings = rank_standings(self.league)
+        # Point differential, then points for, then name for Alpha and Echo
+        self.assertEqual(self.names(standings), ['Charlie', 'Bravo', 'Alpha', 'Echo', 'Delta'])
+        self.assertEqual([standing.rank for standing in standings], [1, 2, 3, 4, 5])
+
+    def test_head_to_head_points(self):
+        standings = list(self.league.standings.all())
+        points = head_to_head_points(self.league, standings)
+        by_name = {standing.team.name: points[standing.team_id] for standing in standings}
+        self.assertEqual(by_name, {'Alpha': 3, 'Bravo': 0, 'Charlie': 0, 'Delta': 0, 'Echo': 0})
+
+    def test_head_to_head_before_point_differential(self):
+        standings = rank_standings(self.league, ['head_to_head', 'point_differential'])
+        # Bravo and Charlie stay level after both, so their names decide
+        self.assertEqual(self.names(standings), ['Alpha', 'Bravo', 'Charlie', 'Echo', 'Delta'])
+
+    def test_league_tiebreakers_are_the_default(self):
+        self.league.tiebreakers = ['points_for']
+        self.league.save()
+        self.assertEqual(self.names(rank_standings(self.league)), ['Charlie', 'Bravo', 'Alpha', 'Echo', 'Delta'])
+        self.league.tiebreakers = ['wins']
+        self.assertEqual(self.names(rank_standings(self.league)), ['Alpha', 'Bravo', 'Charlie', 'Echo', 'Delta'])
+
+    def test_standings_endpoint(self):
+        url = f'/api/leagues/{self.league.id}/standings/'
+        response = self.client.get(url, {'tiebreakers': 'head_to_head,points_for'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['team_name'] for row in response.data], ['Alpha', 'Charlie', 'Bravo', 'Echo', 'Delta'])
+        self.assertEqual(response.data[0]['rank'], 1)
+
+        response = self.client.get(url, {'tiebreakers': 'coin_toss'})
+        self.assertEqual(response.status_code, 400)
+
+
+class RebuildStandingsTests(TestCase):
+    def setUp(self):
+        organizer = User.objects.create_user(username='organizer', email='org@test.com', password='password')
+        self.teams = [Team.objects.create(name=f'Team {i}', sport='Soccer') for i in range(3)]
+        self.leagues = []
+        for name in ('First', 'Second'):
+            league = League.objects.create(
+                name=name, sport='Soccer', season='2024',
+                start_date=date.today(), end_date=date.today() + timedelta(days=90), organizer=organizer,
+            )
+            league.teams.add(*self.teams)
+            a, b, c = self.teams
+            for home, away, home_score, away_score, status in ((a, b, 2, 1, 'completed'), (b, c, 0, 0, 'completed'),
+                                                               (a, c, None, None, 'scheduled')):
+                Game.objects.create(league=league, home_team=home, away_team=away, date=date.today(),
+                                    time=time(18, 0), status=status, home_score=home_score, away_score=away_score)
+            self.leagues.append(league)
+        rebuild_standings()
+        self.expected = self.table()
+
+        # Drift: a lost update, a wrong total and a missing row in each league
+        a, b, c = self.teams
+        Standing.objects.filter(team=a).update(wins=F('wins') + 1)
+        Standing.objects.filter(team=b).update(points_for=7)
+        Standing.objects.filter(team=c).delete()
+
+    def table(self):
+        return {(row.pop('league_id'), row.pop('team_id')): row
+                for row in Standing.objects.values('league_id', 'team_id', 'wins', 'losses', 'draws',
+                                                   'points_for', 'points_against', 'points')}
+
+    def rebuild(self, *args):
+        out = StringIO()
+        call_command('rebuild_standings', *args, stdout=out)
+        return out.getvalue()
+
+    def test_expected_standings(self):
+        a, b, c = self.teams
+        first = self.leagues[0].id
+        self.assertEqual(self.expected[(first, a.id)],
+                         {'wins': 1, 'losses': 0, 'draws': 0, 'points_for': 2, 'points_against': 1, 'points': 3})
+        self.assertEqual(self.expected[(first, b.id)],
+                         {'wins': 0, 'losses': 1, 'draws': 1, 'points_for': 1, 'points_against': 2, 'points': 1})
+        self.assertEqual(self.expected[(first, c.id)],
+                         {'wins': 0, 'losses': 0, 'draws': 1, 'points_for': 0, 'points_against': 0, 'points': 1})
+
+    def test_dry_run_lists_differences_without_writing(self):
+        drifted = self.table()
+        a, b, c = self.teams
+        first = self.leagues[0].id
+        output = self.rebuild('--dry-run', '--league', str(first))
+
+        self.assertIn(f'League {first} / Team {a.id}: wins 2 -> 1\n', output)
+        self.assertIn(f'League {first} / Team {b.id}: points_for 7 -> 1\n', output)
+        self.assertIn(f'League {first} / Team {c.id}: missing, expected ', output)
+        self.assertNotIn(f'League {self.leagues[1].id} /', output)
+        self.assertIn('1 leagues checked', output)
+        self.assertIn('2 standings would be corrected, 1 would be created.', output)
+        self.assertEqual(self.table(), drifted)
+
+    def test_rebuild_corrects_drift(self):
+        output = self.rebuild()
+        self.assertIn('2 leagues checked', output)
+        self.assertIn('4 standings were corrected, 2 were created.', output)
+        self.assertEqual(self.table(), self.expected)
+        self.assertEqual(standing_changes([league.id for league in self.leagues]), [])
+        self.assertIn('0 standings were corrected, 0 were created.', self.rebuild())
+
+    def test_rebuild_only_selected_leagues(self):
+        first, second = (league.id for league in self.leagues)
+        summary = rebuild_standings(league_ids=[second], batch_size=1)
+        self.assertEqual(summary, {'leagues': 1, 'updated': 2, 'created': 1})
+        self.assertEqual(standing_changes([second]), [])
+        self.assertEqual(len(standing_changes([first])), 3)
@@ -1,11 +1,15 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import League, Standing
+from django.db import transaction
+from django.db.models import Prefetch
+from .models import League, Standing, TIEBREAKER_CHOICES
+from .standings import rank_standings
 from .serializers import LeagueSerializer, LeagueDetailSerializer, StandingSerializer
 from .permissions import IsLeagueOrganizerOrReadOnly
-from teams.models import Team
+from teams.models import Team, team_prefetch
 from teams.serializers import TeamSerializer
+from community.timelines import invalidate_timeline
 
 class LeagueViewSet(viewsets.ModelViewSet):
     queryset = League.objects.all()
@@ -17,6 +21,19 @@ class LeagueViewSet(viewsets.ModelViewSet):
             return LeagueDetailSerializer
         return LeagueSerializer
     
+    def get_queryset(self):
+        # Counts are annotated and the organizer fetched up front, so a page
+        # of leagues costs a fixed number of queries
+        queryset = League.objects.with_counts().select_related('organizer__profile').order_by('id')
+        
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(
+                team_prefetch('teams'),
+                Prefetch('standings', queryset=Standing.objects.select_related('team')),
+            )
+        
+        return queryset
+    
     def get_serializer_context(self):
         context = super().get_serializer_context()
         return context
@@ -26,7 +43,7 @@ class LeagueViewSet(viewsets.ModelViewSet):
         league = self.get_object()
         
         if request.method == 'GET':
-            teams = league.teams.all()
+            teams = league.teams.with_summary()
             serializer = TeamSerializer(teams, many=True)
             return Response(serializer.data)
         
@@ -55,10 +72,35 @@ class LeagueViewSet(viewsets.ModelViewSet):
         except Team.DoesNotExist:
             return Response({"detail": "Team not found."}, status=status.HTTP_404_NOT_FOUND)
     
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def follow(self, request, pk=None):
+        """Follow the league, or stop following it"""
+        league = self.get_object()
+        
+        with transaction.atomic():
+            deleted, _ = League.followers.through.objects.filter(league_id=league.id, user_id=request.user.id).delete()
+            if not deleted:
+                League.followers.through.objects.get_or_create(league_id=league.id, user_id=request.user.id)
+            followers_count = league.followers.count()
+        
+        # The through rows were changed directly, so refresh the user's feed here
+        invalidate_timeline(request.user.id)
+        following = not deleted
+        return Response({"detail": "League followed." if following else "League unfollowed.",
+                         "following": following, "followers_count": followers_count})
+    
     @action(detail=True, methods=['get'])
     def standings(self, request, pk=None):
         league = self.get_object()
-        standings = league.standings.all().order_by('-points', '-point_differential')
+        
+        # Tie-breakers default to the league's own, e.g. ?tiebreakers=head_to_head,points_for
+        tiebreakers = request.query_params.get('tiebreakers')
+        tiebreakers = tiebreakers.split(',') if tiebreakers else league.tiebreakers
+        if any(name not in TIEBREAKER_CHOICES for name in tiebreakers):
+            return Response({"detail": f"Unknown tie-breaker. Choose from: {', '.join(TIEBREAKER_CHOICES)}."}, 
+                           status=status.HTTP_400_BAD_REQUEST)
+        
+        standings = rank_standings(league, tiebreakers)
         serializer = StandingSerializer(standings, many=True)
         return Response(serializer.data)
     
@@ -0,0 +1,160 @@
+"""
+Search backends.
+
+SEARCH_BACKEND selects the backend, like LIVE_SCORES_BROKER does for live
+scores. The default keeps an SQLite FTS5 table, ``search_index``, in the
+application database, so index updates commit or roll back with the
+changes they index. Another engine can be plugged in by subclassing
+BaseSearchBackend.
+"""
+import re
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .documents import DOCUMENT_TYPES
+
+DEFAULT_BACKEND = 'search.backends.SQLiteFTSBackend'
+MAX_QUERY_TERMS = 10
+
+
+class BaseSearchBackend:
+    """Indexes ``(doc_type, pk, title, body)`` documents and ranks them for a query"""
+
+    def index(self, documents):
+        """Add or replace documents"""
+        raise NotImplementedError
+
+    def remove(self, keys):
+        """Remove the documents with the given ``(doc_type, pk)`` keys"""
+        raise NotImplementedError
+
+    def clear(self, doc_types=None):
+        raise NotImplementedError
+
+    def search(self, query, doc_types=None, limit=20):
+        """
+        Return up to ``limit`` results, best first, as dicts with ``type``,
+        ``id``, ``title``, ``snippet`` and ``score`` (lower is better).
+        """
+        raise NotImplementedError
+
+
+def query_terms(query):
+    """The words of a user's query, at most MAX_QUERY_TERMS"""
+    return re.findall(r'\w+', query)[:MAX_QUERY_TERMS]
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """
+    SQLite FTS5 index (created by the search app's migration).
+
+    Rows are keyed by ``rowid = type code * KEY_SPACE + pk``, so updating or
+    deleting a document is a primary key lookup and each type is a rowid
+    range. Queries match every term, the last one as a prefix, and are
+    ranked by BM25 with title matches weighted TITLE_WEIGHT times higher.
+
+    BM25 scores every match, which takes hundreds of milliseconds for a word
+    found in 100,000 posts, so only the newest RANK_WINDOW matches of each
+    type (found by walking the index backwards) are ranked.
+    """
+
+    table = 'search_index'
+    KEY_SPACE = 2 ** 40
+    TITLE_WEIGHT = 10.0
+    RANK_WINDOW = 5000
+    BATCH_SIZE = 1000
+
+    def __init__(self, snippet_tokens=16, rank_window=RANK_WINDOW):
+        self.snippet_tokens = snippet_tokens
+        self.rank_window = rank_window
+        self.codes = {doc_type: spec.code for doc_type, spec in DOCUMENT_TYPES.items()}
+        self.types = {code: doc_type for doc_type, code in self.codes.items()}
+
+    def rowid(self, doc_type, pk):
+        return self.codes[doc_type] * self.KEY_SPACE + pk
+
+    def rowid_range(self, doc_type):
+        start = self.codes[doc_type] * self.KEY_SPACE
+        return start, start + self.KEY_SPACE - 1
+
+    def index(self, documents):
+        rows = [(self.rowid(doc_type, pk), title, body) for doc_type, pk, title, body in documents]
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), self.BATCH_SIZE):
+                batch = rows[start:start + self.BATCH_SIZE]
+                cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(row[0],) for row in batch])
+                cursor.executemany(f'INSERT INTO {self.table} (rowid, title, body) VALUES (%s, %s, %s)', batch)
+
+    def remove(self, keys):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s',
+                               [(self.rowid(doc_type, pk),) for doc_type, pk in keys])
+
+    def clear(self, doc_types=None):
+        with connection.cursor() as cursor:
+            if doc_types is None:
+                cursor.execute(f'DELETE FROM {self.table}')
+            for doc_type in doc_types or ():
+                cursor.execute(f'DELETE FROM {self.table} WHERE rowid BETWEEN %s AND %s', self.rowid_range(doc_type))
+
+    def optimize(self):
+        """Merge the index's b-trees, e.g. after a rebuild"""
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+
+    def search(self, query, doc_types=None, limit=20):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        # Quoted, so user input is never read as FTS5 syntax
+        match = ' '.join(f'"{term}"' for term in terms) + '*'
+
+        # One ranked, windowed query per type, merged by score
+        parts, params = [], []
+        for doc_type in doc_types or DOCUMENT_TYPES:
+            low, high = self.rowid_range(doc_type)
+            parts.append(
+                f'SELECT * FROM ('
+                f'SELECT rowid, title, snippet({self.table}, -1, \'\', \'\', \'…\', %s) AS snippet, '
+                f'bm25({self.table}, {self.TITLE_WEIGHT}, 1.0) AS score '
+                f'FROM {self.table} WHERE {self.table} MATCH %s AND rowid BETWEEN COALESCE(('
+                f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s AND rowid BETWEEN %s AND %s '
+                f'ORDER BY rowid DESC LIMIT 1 OFFSET %s), %s) AND %s '
+                f'ORDER BY score LIMIT %s)'
+            )
+            params += [self.snippet_tokens, match, match, low, high, self.rank_window - 1, low, high, limit]
+        sql = ' UNION ALL '.join(parts) + ' ORDER BY score LIMIT %s'
+        params.append(limit)
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        return [
+            {
+                'type': self.types[rowid // self.KEY_SPACE],
+                'id': rowid % self.KEY_SPACE,
+                'title': title,
+                'snippet': snippet,
+                'score': score,
+            }
+            for rowid, title, snippet, score in rows
+        ]
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the process-wide backend configured by SEARCH_BACKEND"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = getattr(settings, 'SEARCH_BACKEND', {})
+                backend_class = import_string(config.get('BACKEND', DEFAULT_BACKEND))
+                _backend = backend_class(**config.get('OPTIONS', {}))
+    return _backend
@@ -0,0 +1,50 @@
+"""
+What the search index holds.
+
+Each searchable model is a document type with a small fixed code, a title
+and a body built from its text fields. Results are ranked with title
+matches counting more than body matches.
+"""
+from collections import namedtuple
+
+from django.apps import apps
+
+DocumentType = namedtuple('DocumentType', ['code', 'model', 'title_fields', 'body_fields'])
+
+# Codes are stored in the index; never renumber them
+DOCUMENT_TYPES = {
+    'post': DocumentType(1, 'community.Post', (), ('content',)),
+    'team': DocumentType(2, 'teams.Team', ('name',), ()),
+    'league': DocumentType(3, 'leagues.League', ('name',), ('season',)),
+    'venue': DocumentType(4, 'games.Venue', ('name',), ('city',)),
+    'event': DocumentType(5, 'community.Event', ('title',), ('description',)),
+}
+
+
+def document_model(doc_type):
+    return apps.get_model(DOCUMENT_TYPES[doc_type].model)
+
+
+def document_fields(doc_type):
+    spec = DOCUMENT_TYPES[doc_type]
+    return spec.title_fields + spec.body_fields
+
+
+def make_document(doc_type, pk, values):
+    """``(doc_type, pk, title, body)`` from the values of document_fields(doc_type), in order"""
+    spec = DOCUMENT_TYPES[doc_type]
+    values = ['' if value is None else str(value) for value in values]
+    title = ' '.join(values[:len(spec.title_fields)])
+    body = ' '.join(values[len(spec.title_fields):])
+    return doc_type, pk, title, body
+
+
+def instance_document(doc_type, instance):
+    return make_document(doc_type, instance.pk, [getattr(instance, field) for field in document_fields(doc_type)])
+
+
+def iter_documents(doc_type, chunk_size=2000):
+    """Every document of a type, read in chunks without loading model instances"""
+    rows = document_model(doc_type).objects.order_by().values_list('pk', *document_fields(doc_type))
+    for pk, *values in rows.iterator(chunk_size=chunk_size):
+        yield make_document(doc_type, pk, values)
@@ -0,0 +1,39 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from search.backends import get_backend
+from search.documents import DOCUMENT_TYPES, iter_documents
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index from the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', action='append', dest='types', choices=sorted(DOCUMENT_TYPES),
+                            help='Only rebuild this document type (repeatable)')
+
+    def handle(self, *args, **options):
+        doc_types = options['types'] or list(DOCUMENT_TYPES)
+        backend = get_backend()
+        
+        # Searches keep seeing the old index until the rebuild commits
+        with transaction.atomic():
+            backend.clear(doc_types)
+            for doc_type in doc_types:
+                documents = iter_documents(doc_type)
+                indexed = 0
+                while True:
+                    batch = list(islice(documents, BATCH_SIZE))
+                    if not batch:
+                        break
+                    backend.index(batch)
+                    indexed += len(batch)
+                self.stdout.write(f"{doc_type}: {indexed} documents indexed.")
+        
+        if hasattr(backend, 'optimize'):
+            backend.optimize()
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
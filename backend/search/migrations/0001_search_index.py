@@ -0,0 +1,57 @@
+from itertools import islice
+
+from django.db import migrations
+
+BATCH_SIZE = 5000
+
+
+def create_index(apps, schema_editor):
+    # The FTS5 table backs search.backends.SQLiteFTSBackend; other
+    # databases use another SEARCH_BACKEND. Prefix indexes keep the
+    # search-as-you-type last term as fast as a whole word.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+        "title, body, tokenize = 'porter unicode61 remove_diacritics 2', prefix = '2 3 4 5 6')"
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS search_index")
+
+
+def index_existing(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from search.backends import SQLiteFTSBackend
+    from search.documents import DOCUMENT_TYPES, make_document
+
+    # Like iter_documents, but on the historical models, and indexed in
+    # batches so memory does not grow with the table
+    backend = SQLiteFTSBackend()
+    for doc_type, spec in DOCUMENT_TYPES.items():
+        model = apps.get_model(spec.model)
+        rows = model.objects.order_by().values_list('pk', *spec.title_fields, *spec.body_fields)
+        documents = (make_document(doc_type, pk, values) for pk, *values in rows.iterator(chunk_size=BATCH_SIZE))
+        while True:
+            batch = list(islice(documents, BATCH_SIZE))
+            if not batch:
+                break
+            backend.index(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0007_post_image_variants'),
+        ('games', '0005_cursor_pagination_indexes'),
+        ('leagues', '0005_league_followers'),
+        ('teams', '0003_team_logo_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+        migrations.RunPython(index_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save
+
+from .backends import get_backend
+from .documents import DOCUMENT_TYPES, document_fields, document_model, instance_document
+
+
+def connect(doc_type):
+    fields = set(document_fields(doc_type))
+
+    def index_document(sender, instance, raw=False, update_fields=None, **kwargs):
+        # Saves that only touch other columns leave the document as it was
+        if raw or (update_fields is not None and not fields.intersection(update_fields)):
+            return
+        get_backend().index([instance_document(doc_type, instance)])
+
+    def remove_document(sender, instance, **kwargs):
+        get_backend().remove([(doc_type, instance.pk)])
+
+    model = document_model(doc_type)
+    post_save.connect(index_document, sender=model, weak=False, dispatch_uid=f'search-index-{doc_type}')
+    post_delete.connect(remove_document, sender=model, weak=False, dispatch_uid=f'search-remove-{doc_type}')
+
+
+for doc_type in DOCUMENT_TYPES:
+    connect(doc_type)
@@ -0,0 +1,103 @@
+from datetime import date, time
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+
+from django.apps import apps as django_apps
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from rest_framework.test import APITestCase
+
+from community.models import Event, Post
+from games.models import Venue
+from leagues.models import League
+from teams.models import Team
+from .backends import SQLiteFTSBackend, get_backend
+
+User = get_user_model()
+
+
+class SearchTests(APITestCase):
+    """Search is ranked, covers every document type and follows model changes"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='fan', email='fan@test.com', password='password')
+        self.team = Team.objects.create(name='Riverside Rovers', sport='Soccer')
+        self.league = League.objects.create(
+            name='Riverside Sunday League', sport='Soccer', season='Spring 2024',
+            start_date=date(2024, 3, 1), end_date=date(2024, 6, 30), organizer=self.user,
+        )
+        self.venue = Venue.objects.create(name='North Park', address='1 Main St', city='Riverside',
+                                          state='ST', zip_code='00000')
+        self.event = Event.objects.create(title='Summer tournament', description='Teams from Riverside welcome',
+                                          date=date(2024, 7, 1), time=time(10, 0), location='Park',
+                                          organizer=self.user)
+        self.post = Post.objects.create(author=self.user, content='What a comeback by the Rovers tonight!')
+        self.client.force_authenticate(self.user)
+
+    def search(self, **params):
+        response = self.client.get('/api/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return [(item['type'], item['id']) for item in response.data['results']]
+
+    def test_ranked_results_across_types(self):
+        results = self.search(q='riverside')
+        # Title matches rank above body matches
+        self.assertEqual(set(results[:2]), {('team', self.team.id), ('league', self.league.id)})
+        self.assertEqual(set(results[2:]), {('venue', self.venue.id), ('event', self.event.id)})
+
+        self.assertEqual(self.search(q='rover'), [('team', self.team.id), ('post', self.post.id)])
+        self.assertEqual(self.search(q='spring 2024'), [('league', self.league.id)])
+        self.assertIn(self.search(q='riverside', type='venue,event', limit=1)[0][0], ('venue', 'event'))
+
+    def test_prefix_and_query_syntax(self):
+        self.assertEqual(self.search(q='comeb'), [('post', self.post.id)])
+        # FTS5 operators in the query are searched as plain words
+        self.assertEqual(self.search(q='rovers OR "NEAR(x'), [])
+        self.assertEqual(self.search(q='summer-tournament'), [('event', self.event.id)])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.team.name = 'Hillside Hawks'
+        self.team.save()
+        self.assertEqual(self.search(q='hawks'), [('team', self.team.id)])
+        self.assertNotIn(('team', self.team.id), self.search(q='riverside'))
+
+        self.post.delete()
+        self.assertEqual(self.search(q='comeback'), [])
+
+    def test_rebuild(self):
+        get_backend().clear()
+        self.assertEqual(self.search(q='riverside'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search(q='riverside')), 4)
+
+    def test_migration_indexes_existing_rows_in_batches(self):
+        migration = import_module('search.migrations.0001_search_index')
+        for i in range(4):
+            Team.objects.create(name=f'Lakeside {i}', sport='Soccer')
+        backend = get_backend()
+        backend.clear()
+
+        batches = []
+        index = SQLiteFTSBackend.index
+
+        def record_batch(self, documents):
+            batches.append(len(documents))
+            index(self, documents)
+
+        with mock.patch.object(migration, 'BATCH_SIZE', 3), \
+                mock.patch.object(SQLiteFTSBackend, 'index', record_batch):
+            # RunPython only reads the editor's connection
+            migration.index_existing(django_apps, connection.schema_editor())
+
+        # Five teams, then one of each other type
+        self.assertEqual(batches, [1, 3, 2, 1, 1, 1])
+        self.assertEqual(len(self.search(q='lakeside')), 4)
+        self.assertIn(('post', self.post.id), self.search(q='comeback'))
+
+    def test_invalid_queries(self):
+        for params in ({}, {'q': '  !! '}, {'q': 'x', 'type': 'player'}, {'q': 'x', 'limit': '0'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/search/', params).status_code, 400)
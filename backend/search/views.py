@@ -0,0 +1,41 @@
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from .backends import get_backend, query_terms
+from .documents import DOCUMENT_TYPES
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def search(request):
+    """
+    Ranked full-text search across posts, teams, leagues, venues and events.
+    
+    ``?q=`` is required. ``?type=post,team`` restricts the document types
+    and ``?limit=`` caps the results (default 20, at most 100).
+    """
+    query = request.query_params.get('q', '')
+    if not query_terms(query):
+        return Response({"detail": "q must contain at least one word."}, status=status.HTTP_400_BAD_REQUEST)
+    
+    doc_types = None
+    if request.query_params.get('type'):
+        doc_types = request.query_params['type'].split(',')
+        unknown = set(doc_types) - set(DOCUMENT_TYPES)
+        if unknown:
+            return Response({"detail": f"Unknown type: {', '.join(sorted(unknown))}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        limit = min(int(request.query_params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        return Response({"detail": "limit must be a positive integer."}, status=status.HTTP_400_BAD_REQUEST)
+    
+    results = get_backend().search(query, doc_types=doc_types, limit=limit)
+    return Response({"query": query, "results": results})
@@ -0,0 +1,206 @@
+"""
+Resized variants of uploaded images.
+
+Post images, team logos and avatars are stored under their content hash
+(``avatars/3f/3fa9...c2.jpg``), so a file uploaded twice is stored once.
+After the upload commits, a background thread builds WebP and JPEG
+variants at a few widths next to the original (``...c2.96w.webp``) and
+records the widths on the row, and serializers offer them as a
+``srcset``. Until then, or if the upload cannot be decoded, clients get the
+original only. Uploads no longer wait for any resizing.
+"""
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, models, transaction
+from django.db.models.signals import post_save
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+VARIANT_FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 80, 'optimize': True, 'progressive': True},
+}
+DEFAULT_WORKERS = 2
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def content_name(content, filename):
+    """``ab/abcdef...{ext}``: the SHA-256 of the file, keeping its extension"""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    ext = os.path.splitext(filename)[1].lower()
+    return f'{digest.hexdigest()[:2]}/{digest.hexdigest()}{ext}'
+
+
+def variant_name(name, width, fmt):
+    return f'{os.path.splitext(name)[0]}.{width}w.{fmt}'
+
+
+class VariantImageField(models.ImageField):
+    """
+    ImageField stored by content hash, with resized variants built in the background.
+
+    ``variants_field`` names a JSONField on the model recording which
+    variants exist, like ``width_field`` records an image's width.
+    """
+
+    def __init__(self, *args, variants=(), variants_field=None, **kwargs):
+        self.variants = tuple(sorted(variants))
+        self.variants_field = variants_field
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['variants'] = self.variants
+        kwargs['variants_field'] = self.variants_field
+        return name, path, args, kwargs
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        if not cls._meta.abstract:
+            post_save.connect(self.schedule_variants, sender=cls, weak=False)
+
+    def pre_save(self, model_instance, add):
+        file = getattr(model_instance, self.attname)
+        if file and not file._committed:
+            name = content_name(file.file, file.name)
+            stored = self.generate_filename(model_instance, name)
+            if file.storage.exists(stored):
+                # Same content uploaded before; reuse the stored file
+                file.name = stored
+                file._committed = True
+            else:
+                file.save(name, file.file, save=False)
+        return file
+
+    def schedule_variants(self, instance, raw=False, **kwargs):
+        file = getattr(instance, self.attname)
+        if raw or not file or not self.variants_field:
+            return
+        if (getattr(instance, self.variants_field) or {}).get('source') == file.name:
+            return
+        job = (instance._meta.label, instance.pk, self.name, file.name)
+        transaction.on_commit(lambda: _submit(*job))
+
+
+def _submit(label, pk, field_name, name):
+    if not getattr(settings, 'IMAGE_VARIANTS_ASYNC', True):
+        build_variants(label, pk, field_name, name)
+        return
+
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = getattr(settings, 'IMAGE_VARIANT_WORKERS', DEFAULT_WORKERS)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-variants')
+    _executor.submit(_run_in_thread, label, pk, field_name, name)
+
+
+def _run_in_thread(*job):
+    try:
+        build_variants(*job)
+    except Exception:
+        logger.exception('Could not build image variants for %s', job)
+    finally:
+        connection.close()
+
+
+def build_variants(label, pk, field_name, name):
+    """
+    Build the missing variants of ``name`` and record them on the row.
+
+    Variants of a file uploaded before already exist and are not rebuilt.
+    The row is only updated if it still holds ``name``.
+    """
+    model = apps.get_model(label)
+    field = model._meta.get_field(field_name)
+    storage = field.storage
+
+    widths = []
+    try:
+        with storage.open(name) as original, Image.open(original) as image:
+            largest = field.variants[-1]
+            # Decode JPEGs at a reduced scale when that is still big enough
+            image.draft('RGB', (largest, largest))
+            image = ImageOps.exif_transpose(image)
+            widths = [width for width in field.variants if width < image.width]
+            if image.width < largest:
+                widths.append(image.width)
+
+            for width in widths:
+                if all(storage.exists(variant_name(name, width, fmt)) for fmt in VARIANT_FORMATS):
+                    continue
+                height = max(1, round(image.height * width / image.width))
+                resized = image.resize((width, height), Image.LANCZOS)
+                for fmt, options in VARIANT_FORMATS.items():
+                    _save_variant(storage, variant_name(name, width, fmt), resized, options)
+    except (OSError, Image.DecompressionBombError):
+        logger.warning('Could not build variants of %s', name, exc_info=True)
+        widths = []
+
+    # An empty list records the failure, so it is not retried on every save
+    model.objects.filter(pk=pk, **{field_name: name}).update(
+        **{field.variants_field: {'source': name, 'widths': widths}}
+    )
+    return widths
+
+
+def _save_variant(storage, name, image, options):
+    if options['format'] == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        converted = image.convert('RGBA')
+        background.paste(converted, mask=converted.getchannel('A'))
+        image = background
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+
+    buffer = BytesIO()
+    image.save(buffer, **options)
+    if not storage.exists(name):
+        storage.save(name, ContentFile(buffer.getvalue()))
+
+
+class SrcsetField(serializers.Field):
+    """
+    Read-only ``{"webp": srcset, "jpeg": srcset}`` of a VariantImageField, or None.
+
+    Use with ``source='*'``, e.g. ``SrcsetField('avatar', source='*')``.
+    """
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        file = getattr(instance, self.image_field)
+        field = instance._meta.get_field(self.image_field)
+        variants = getattr(instance, field.variants_field) or {}
+        if not file or variants.get('source') != file.name or not variants.get('widths'):
+            return None
+
+        request = self.context.get('request')
+        srcset = {}
+        for fmt in VARIANT_FORMATS:
+            candidates = []
+            for width in variants['widths']:
+                url = file.storage.url(variant_name(file.name, width, fmt))
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                candidates.append(f'{url} {width}w')
+            srcset[fmt] = ', '.join(candidates)
+        return srcset
@@ -0,0 +1,188 @@
+"""
+Per-request performance instrumentation.
+
+PerformanceMiddleware times a sample of requests (PERF_SAMPLE_RATE): their
+database queries (count and time), rendering of the response body and
+total time. Sampled responses carry a ``Server-Timing`` header, which
+browser dev tools show next to the request, and the timings are added to
+in-process histograms per route, e.g. ``GameViewSet.update_score``.
+``/api/_metrics`` exports them in the Prometheus text format.
+
+With PERF_SAMPLE_RATE = 0 the middleware removes itself at startup, so it
+costs nothing. Each worker process keeps its own histograms; Prometheus
+adds them up across the processes it scrapes.
+"""
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Seconds
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+# name: (help, buckets), observed for every sampled request
+METRICS = {
+    'http_request_duration_seconds': ('Time to handle a request', DURATION_BUCKETS),
+    'http_request_db_duration_seconds': ('Time spent in database queries', DURATION_BUCKETS),
+    'http_request_db_queries': ('Database queries per request', QUERY_BUCKETS),
+    'http_request_render_duration_seconds': ('Time spent rendering the response body', DURATION_BUCKETS),
+}
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as Prometheus exports them"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last one is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+
+    def samples(self):
+        """``(le, cumulative count)`` pairs, ending with ``+Inf``"""
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+class Registry:
+    """Histograms of every metric in METRICS, per route"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def observe(self, route, values):
+        with self.lock:
+            histograms = self.routes.get(route)
+            if histograms is None:
+                histograms = self.routes[route] = {name: Histogram(buckets) for name, (_, buckets) in METRICS.items()}
+            for name, value in values.items():
+                histograms[name].observe(value)
+
+    def clear(self):
+        with self.lock:
+            self.routes.clear()
+
+    def export(self):
+        """The histograms in the Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            for name, (help_text, _) in METRICS.items():
+                lines.append(f'# HELP {name} {help_text}, per route (sampled requests only)')
+                lines.append(f'# TYPE {name} histogram')
+                for route in sorted(self.routes):
+                    histogram = self.routes[route][name]
+                    label = f'route="{_escape(route)}"'
+                    for bound, count in histogram.samples():
+                        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {count}')
+                    lines.append(f'{name}_sum{{{label}}} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{{label}}} {sum(histogram.counts)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
+
+
+class RequestTimings:
+    """Database execute wrapper accumulating the queries of one request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.render = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+
+def route_name(request):
+    """``ViewSet.action`` (or ``APIView.method``) of the view that handled the request"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return match.view_name or match.func.__name__
+    method = request.method.lower()
+    actions = getattr(match.func, 'actions', None) or {}
+    return f'{view_class.__name__}.{actions.get(method, method)}'
+
+
+class PerformanceMiddleware:
+    """Time a PERF_SAMPLE_RATE fraction of requests (see the module docstring)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PERF_SAMPLE_RATE', 0)
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timings = request._perf_timings = RequestTimings()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timings))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        response['Server-Timing'] = (
+            f'db;dur={timings.db * 1000:.1f};desc="{timings.queries} queries", '
+            f'render;dur={timings.render * 1000:.1f}, total;dur={total * 1000:.1f}'
+        )
+        registry.observe(route_name(request), {
+            'http_request_duration_seconds': total,
+            'http_request_db_duration_seconds': timings.db,
+            'http_request_db_queries': timings.queries,
+            'http_request_render_duration_seconds': timings.render,
+        })
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns, once every
+        # template response middleware has run
+        timings = getattr(request, '_perf_timings', None)
+        if timings is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                timings.render += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def metrics(request):
+    """Per-route request histograms in the Prometheus text format"""
+    return HttpResponse(registry.export(), content_type='text/plain; version=0.0.4; charset=utf-8')
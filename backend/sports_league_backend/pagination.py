@@ -0,0 +1,150 @@
+"""
+Pagination shared by the API.
+
+Lists use page numbers by default. Views that declare a ``cursor_ordering``
+also accept keyset (cursor) pagination, opted into with ``?pagination=cursor``
+or by following a ``cursor`` link. A cursor records the ordering values of
+the row it stops at, and the next page starts with a range condition on
+those columns, so with a matching index every page costs the same however
+deep it is, and there is no COUNT query.
+"""
+import json
+from base64 import b64decode, b64encode
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination on a composite key, e.g. ('-created_at', '-id').
+
+    DRF's CursorPagination positions on the first ordering field plus an
+    offset among equal values; here the cursor holds every ordering value,
+    so the last field must be unique (normally ``id``).
+    """
+
+    def __init__(self, ordering):
+        self.ordering = tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        self.base_url = remove_query_param(request.build_absolute_uri(), 'page')
+        self.model = queryset.model
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor.reverse)
+
+        ordering = self._reversed(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.cursor:
+            queryset = queryset.filter(self._after(ordering, self.cursor.position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self._position(self.page[-1]) if self.page else self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self._position(self.page[0]) if self.page else self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position, reverse = data['p'], bool(data.get('r'))
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError
+            position = [self._to_python(field, value) for field, value in zip(self.ordering, position)]
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=0, reverse=reverse, position=position)
+
+    def encode_cursor(self, cursor):
+        data = {'p': cursor.position}
+        if cursor.reverse:
+            data['r'] = 1
+        encoded = b64encode(json.dumps(data, separators=(',', ':')).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _position(self, instance):
+        return [str(getattr(instance, field.lstrip('-'))) for field in self.ordering]
+
+    def _to_python(self, field, value):
+        """A cursor value as the ordering field's type, so it can't break the query"""
+        if value is None:
+            raise ValueError
+        return self.model._meta.get_field(field.lstrip('-')).to_python(value)
+
+    @staticmethod
+    def _reversed(ordering):
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+    @staticmethod
+    def _after(ordering, position):
+        """
+        Rows strictly after ``position`` in ``ordering``.
+
+        Written as ``a >= x AND (a > x OR (a = x AND ...))`` so the leading
+        column bounds an index range scan.
+        """
+        def lookup(field, strict):
+            name = field.lstrip('-')
+            op = ('lt' if field.startswith('-') else 'gt') + ('' if strict else 'e')
+            return f'{name}__{op}'
+
+        fields = list(zip(ordering, position))
+        last_field, last_value = fields[-1]
+        condition = Q(**{lookup(last_field, True): last_value})
+        for field, value in reversed(fields[:-1]):
+            condition = Q(**{lookup(field, True): value}) | (Q(**{field.lstrip('-'): value}) & condition)
+
+        first_field, first_value = fields[0]
+        return Q(**{lookup(first_field, False): first_value}) & condition
+
+
+class OptionalCursorPagination(PageNumberPagination):
+    """
+    Page-number pagination, switching to keyset pagination on request.
+
+    The view's ``cursor_ordering`` should match the ordering of its queryset
+    and an index, so both modes list rows in the same order.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = getattr(view, 'cursor_ordering', None)
+        use_cursor = 'cursor' in request.query_params or request.query_params.get('pagination') == 'cursor'
+        if ordering and use_cursor:
+            self.cursor_paginator = KeysetPagination(ordering)
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+
+        self.cursor_paginator = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor_paginator:
+            return self.cursor_paginator.to_html()
+        return super().to_html()
@@ -37,9 +37,11 @@ INSTALLED_APPS = [
     'games',
     'analytics',
     'community',
+    'search',
 ]
 
 MIDDLEWARE = [
+    'sports_league_backend.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -158,6 +160,52 @@ SIMPLE_JWT = {
 CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', 'http://localhost:3000').split(',')
 CORS_ALLOW_CREDENTIALS = True
 
+# Live score streams (see games/live.py). Use games.live.RedisBroker with
+# OPTIONS {'url': 'redis://...'} to share broadcasts between worker processes.
+LIVE_SCORES_BROKER = {
+    'BACKEND': 'games.live.InProcessBroker',
+    'OPTIONS': {},
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Buffered counter deltas exist nowhere else until flushed, so this
+    # cache must never evict (with Redis: maxmemory-policy noeviction)
+    'counters': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'counters',
+        'OPTIONS': {'MAX_ENTRIES': 10 ** 9},
+    },
+}
+
+# Buffered engagement counters (see community/counters.py). Use a cache
+# shared by every process (e.g. Redis) so any of them can flush the buffer.
+COUNTER_CACHE = 'counters'
+COUNTER_FLUSH_INTERVAL = 5  # Seconds
+
+# Cached home feed timelines (see community/timelines.py). New posts and
+# follows reach other processes only through a shared cache (e.g. Redis);
+# with a per-process cache they show up there once timelines expire.
+TIMELINE_CACHE = 'default'
+TIMELINE_TIMEOUT = 5 * 60  # Seconds; can be raised with a shared cache
+
+# Resized variants of uploaded images (see sports_league_backend/imaging.py)
+IMAGE_VARIANTS_ASYNC = True  # Build them in a background thread pool
+IMAGE_VARIANT_WORKERS = 2
+
+# Full-text search (see search/backends.py)
+SEARCH_BACKEND = {
+    'BACKEND': 'search.backends.SQLiteFTSBackend',
+    'OPTIONS': {},
+}
+
+# Request timing (see sports_league_backend/middleware.py): the fraction of
+# requests given a Server-Timing header and counted in /api/_metrics.
+# 0 turns the middleware off.
+PERF_SAMPLE_RATE = float(os.getenv('PERF_SAMPLE_RATE', '0'))
+
 # Swagger settings
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
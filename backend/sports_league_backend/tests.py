@@ -0,0 +1,155 @@
+from base64 import b64encode
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from community.models import Post
+from games.models import Game
+from leagues.models import League
+from teams.models import Team
+from .middleware import registry
+
+User = get_user_model()
+
+
+class CursorPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='organizer', email='org@test.com', password='password')
+        league = League.objects.create(
+            name='League', sport='Soccer', season='2024',
+            start_date=date(2024, 1, 1), end_date=date(2024, 12, 31), organizer=self.user,
+        )
+        teams = [Team.objects.create(name=f'Team {i}', sport='Soccer') for i in range(2)]
+        # Five games share each date and time, so pages split runs of equal values
+        for i in range(45):
+            Game.objects.create(league=league, home_team=teams[0], away_team=teams[1],
+                                date=date(2024, 1, 1) + timedelta(days=i // 5), time=time(18, 0))
+
+        for i in range(45):
+            Post.objects.create(author=self.user, content=f'Post {i}')
+        created = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        for i, post in enumerate(Post.objects.order_by('id')):
+            Post.objects.filter(pk=post.pk).update(created_at=created + timedelta(hours=i // 5))
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url):
+        """Ids of every page following ``next``, then of every page back following ``previous``"""
+        forward, pages = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            pages.append([item['id'] for item in response.data['results']])
+            forward += pages[-1]
+            last = response.data
+            url = last['next']
+
+        backward, url = [], last['previous']
+        while url:
+            response = self.client.get(url)
+            backward = [item['id'] for item in response.data['results']] + backward
+            url = response.data['previous']
+        return forward, backward + pages[-1], pages
+
+    def test_games_walk_both_ways(self):
+        expected = list(Game.objects.order_by('date', 'time', 'id').values_list('id', flat=True))
+        forward, backward, pages = self.walk('/api/games/?pagination=cursor')
+        self.assertEqual(forward, expected)
+        self.assertEqual(backward, expected)
+        self.assertEqual([len(page) for page in pages], [20, 20, 5])
+
+    def test_posts_walk_both_ways(self):
+        expected = list(Post.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        forward, backward, _ = self.walk('/api/community/posts/?pagination=cursor')
+        self.assertEqual(forward, expected)
+        self.assertEqual(backward, expected)
+
+    def test_cursor_pages_skip_count(self):
+        def counts(url):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            return [query for query in queries if query['sql'].startswith('SELECT COUNT(*)')]
+
+        first = self.client.get('/api/games/?pagination=cursor')
+        self.assertEqual(counts(first.data['next']), [])
+        self.assertEqual(len(counts('/api/games/?page=2')), 1)
+
+    def test_tampered_cursor(self):
+        wrong_length = b64encode(b'{"p":["2024-01-01"]}').decode('ascii')
+        for cursor in ('not-a-cursor', b64encode(b'[1, 2]').decode('ascii'), wrong_length):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get('/api/games/', {'cursor': cursor}).status_code, 404)
+
+    def test_cursor_with_values_of_the_wrong_type(self):
+        for url, position in (('/api/community/posts/', '["x","y"]'), ('/api/games/', '["2024-13-01","18:00",1]'),
+                              ('/api/games/', '["2024-01-01",{},1]'), ('/api/games/', '["2024-01-01","18:00",null]')):
+            cursor = b64encode(f'{{"p":{position}}}'.encode('ascii')).decode('ascii')
+            with self.subTest(url=url, position=position):
+                self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 404)
+
+    def test_page_numbers_without_cursor(self):
+        response = self.client.get('/api/games/')
+        self.assertEqual(set(response.data), {'count', 'next', 'previous', 'results'})
+        self.assertEqual(response.data['count'], 45)
+        self.assertIsNone(response.data['previous'])
+        self.assertIn('page=2', response.data['next'])
+
+        response = self.client.get('/api/games/', {'page': 3})
+        expected = list(Game.objects.order_by('date', 'time', 'id').values_list('id', flat=True))[40:]
+        self.assertEqual([item['id'] for item in response.data['results']], expected)
+
+
+@override_settings(PERF_SAMPLE_RATE=1)
+class PerformanceMiddlewareTests(APITestCase):
+    def setUp(self):
+        registry.clear()
+        self.addCleanup(registry.clear)
+        self.organizer = User.objects.create_user(username='organizer', email='org@test.com', password='password')
+        league = League.objects.create(
+            name='League', sport='Soccer', season='2024',
+            start_date=date.today(), end_date=date.today() + timedelta(days=90), organizer=self.organizer,
+        )
+        teams = [Team.objects.create(name=f'Team {i}', sport='Soccer') for i in range(2)]
+        league.teams.add(*teams)
+        self.game = Game.objects.create(league=league, home_team=teams[0], away_team=teams[1],
+                                        date=date.today(), time=time(18, 0))
+        self.client.force_authenticate(self.organizer)
+
+    def test_sampled_requests_get_server_timing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f'/api/games/{self.game.id}/update_score/',
+                                        {'home_score': 2, 'away_score': 1}, format='json')
+        self.assertEqual(response.status_code, 200)
+        timing = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+        self.assertEqual(set(timing), {'db', 'render', 'total'})
+        self.assertIn(f'desc="{len(queries)} queries"', timing['db'])
+
+    def test_metrics_are_per_route(self):
+        self.client.post(f'/api/games/{self.game.id}/update_score/', {'home_score': 2, 'away_score': 1}, format='json')
+        self.client.get('/api/games/')
+        self.client.get('/api/games/')
+
+        self.organizer.is_staff = True
+        self.organizer.save()
+        response = self.client.get('/api/_metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_render_duration_seconds_count{route="GameViewSet.list"} 2', body)
+        self.assertIn('http_request_duration_seconds_count{route="GameViewSet.update_score"} 1', body)
+        self.assertIn('http_request_duration_seconds_count{route="GameViewSet.list"} 2', body)
+        self.assertIn('http_request_db_queries_bucket{route="GameViewSet.list",le="+Inf"} 2', body)
+
+    def test_metrics_require_staff(self):
+        self.assertEqual(self.client.get('/api/_metrics').status_code, 403)
+
+    @override_settings(PERF_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_timed(self):
+        response = self.client.get('/api/games/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(registry.routes, {})
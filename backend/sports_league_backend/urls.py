@@ -6,6 +6,8 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from .middleware import metrics
+
 schema_view = get_schema_view(
     openapi.Info(
         title="Sports League API",
@@ -27,6 +29,8 @@ urlpatterns = [
     path('api/games/', include('games.urls')),
     path('api/analytics/', include('analytics.urls')),
     path('api/community/', include('community.urls')),
+    path('api/search/', include('search.urls')),
+    path('api/_metrics', metrics, name='metrics'),
     
     # API documentation
     path('api/docs/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
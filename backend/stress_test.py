@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+"""
+Multi-process stress test for concurrent writes (score reports, likes,
+attendance and shares).
+
+Runs several worker processes against a scratch SQLite database and checks
+that no update was lost once they finish.
+
+Usage:
+    python stress_test.py [--workers 8] [--iterations 50] [--seed 1]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+from collections import defaultdict
+from datetime import date, time, timedelta
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sports_league_backend.settings')
+
+
+def configure(db_path):
+    """Point Django at the scratch database (also used as the worker initializer)"""
+    import django
+    from django.conf import settings
+
+    settings.DATABASES['default']['NAME'] = db_path
+    # Let writers wait for SQLite's lock instead of failing straight away
+    settings.DATABASES['default']['OPTIONS'] = {'timeout': 60}
+    settings.ALLOWED_HOSTS = list(settings.ALLOWED_HOSTS) + ['testserver']
+    django.setup()
+
+
+def create_standings_data(teams_count, rounds, seed):
+    from django.contrib.auth import get_user_model
+    from teams.models import Team
+    from leagues.models import League
+    from games.models import Game
+
+    User = get_user_model()
+    organizer = User.objects.create_user(username='stress', email='stress@test.com', password='password')
+    league = League.objects.create(
+        name='Stress League', sport='Soccer', season='2024',
+        start_date=date.today(), end_date=date.today() + timedelta(days=365),
+        organizer=organizer,
+    )
+    teams = [Team.objects.create(name=f'Team {i}', sport='Soccer') for i in range(teams_count)]
+    league.teams.add(*teams)
+
+    # Every team plays many games, so concurrent results keep hitting the same standings
+    rng = random.Random(seed)
+    games = []
+    for i in range(rounds):
+        home, away = rng.sample(teams, 2)
+        games.append(Game(league=league, home_team=home, away_team=away,
+                          date=date.today() + timedelta(days=i % 300), time=time(18, 0)))
+    Game.objects.bulk_create(games)
+    return organizer.id, [game.id for game in Game.objects.filter(league=league)]
+
+
+def submit_scores(args):
+    """Worker: report scores through the update_score endpoint"""
+    organizer_id, submissions = args
+    from django.contrib.auth import get_user_model
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    client.force_authenticate(get_user_model().objects.get(id=organizer_id))
+
+    failures = 0
+    for game_id, home_score, away_score in submissions:
+        response = client.post(f'/api/games/{game_id}/update_score/',
+                               {'home_score': home_score, 'away_score': away_score}, format='json')
+        if response.status_code != 200:
+            failures += 1
+    return failures
+
+
+def check_standings():
+    """Return the standings that disagree with the completed games"""
+    from leagues.models import Standing
+    from games.models import Game
+
+    expected = defaultdict(lambda: [0, 0, 0, 0, 0])
+    for game in Game.objects.filter(status='completed'):
+        for team_id, scored, allowed in ((game.home_team_id, game.home_score, game.away_score),
+                                         (game.away_team_id, game.away_score, game.home_score)):
+            row = expected[(game.league_id, team_id)]
+            row[0] += scored > allowed
+            row[1] += scored < allowed
+            row[2] += scored == allowed
+            row[3] += scored
+            row[4] += allowed
+
+    mismatches = []
+    for standing in Standing.objects.all():
+        actual = [standing.wins, standing.losses, standing.draws, standing.points_for, standing.points_against]
+        if actual != expected.pop((standing.league_id, standing.team_id), [0, 0, 0, 0, 0]):
+            mismatches.append((standing.team_id, actual))
+    mismatches += [(team_id, None) for (_, team_id), row in expected.items()]
+    return mismatches
+
+
+def run_standings(pool, args):
+    organizer_id, game_ids = create_standings_data(teams_count=6, rounds=args.games, seed=args.seed)
+
+    # Workers overlap on games as well as teams, so re-scores race with each other
+    rng = random.Random(args.seed)
+    batches = [
+        (organizer_id, [(rng.choice(game_ids), rng.randint(0, 5), rng.randint(0, 5))
+                        for _ in range(args.iterations)])
+        for _ in range(args.workers)
+    ]
+    failures = sum(pool.map(submit_scores, batches))
+    mismatches = check_standings()
+
+    print(f"  {args.workers * args.iterations} score reports, {failures} failed requests")
+    for team_id, actual in mismatches:
+        print(f"  ❌ Team {team_id}: standing {actual} does not match its games")
+    return failures == 0 and not mismatches
+
+
+def create_engagement_data(users_count):
+    from django.contrib.auth import get_user_model
+    from community.models import Comment, Event, Post
+
+    User = get_user_model()
+    users = [User.objects.create_user(username=f'fan{i}', email=f'fan{i}@test.com', password='password')
+             for i in range(users_count)]
+    posts = [Post.objects.create(author=users[0], content=f'Post {i}') for i in range(3)]
+    comment = Comment.objects.create(post=posts[0], author=users[0], content='First')
+    event = Event.objects.create(title='Final', description='Cup final', date=date.today(), time=time(18, 0),
+                                 location='Stadium', organizer=users[0])
+    return [user.id for user in users], [post.id for post in posts], comment.id, event.id
+
+
+def engage(args):
+    """Worker: toggle likes and attendance, and share posts, as random users"""
+    user_ids, actions = args
+    from django.contrib.auth import get_user_model
+    from rest_framework.test import APIClient
+
+    users = get_user_model().objects.in_bulk(user_ids)
+    failures = 0
+    shares = defaultdict(int)
+    for user_id, url in actions:
+        client = APIClient()
+        client.force_authenticate(users[user_id])
+        response = client.post(url)
+        if response.status_code != 200:
+            failures += 1
+        elif url.endswith('/share/'):
+            shares[url] += 1
+
+    # Write what this worker's counter buffer still holds
+    from community.counters import counter_buffer
+    counter_buffer.flush()
+    return failures, dict(shares)
+
+
+def check_engagement(share_totals):
+    """Return the counters that disagree with the rows they count"""
+    from community.models import Comment, Post
+
+    mismatches = []
+    for model in (Post, Comment):
+        for obj in model.objects.all():
+            if obj.likes_count != obj.likes.count():
+                mismatches.append(f'{model.__name__} {obj.id}: likes_count {obj.likes_count}, {obj.likes.count()} likes')
+    for post in Post.objects.all():
+        expected = share_totals.get(f'/api/community/posts/{post.id}/share/', 0)
+        if post.shares_count != expected:
+            mismatches.append(f'Post {post.id}: shares_count {post.shares_count}, {expected} shares')
+    return mismatches
+
+
+def run_engagement(pool, args):
+    user_ids, post_ids, comment_id, event_id = create_engagement_data(users_count=4)
+
+    # Few users and objects, so the same toggles race across workers
+    urls = ([f'/api/community/posts/{post_id}/like/' for post_id in post_ids]
+            + [f'/api/community/posts/{post_id}/share/' for post_id in post_ids]
+            + [f'/api/community/comments/{comment_id}/like/', f'/api/community/events/{event_id}/attend/'])
+    rng = random.Random(args.seed)
+    batches = [
+        (user_ids, [(rng.choice(user_ids), rng.choice(urls)) for _ in range(args.iterations)])
+        for _ in range(args.workers)
+    ]
+
+    failures = 0
+    share_totals = defaultdict(int)
+    for worker_failures, shares in pool.map(engage, batches):
+        failures += worker_failures
+        for url, count in shares.items():
+            share_totals[url] += count
+    mismatches = check_engagement(share_totals)
+
+    print(f"  {args.workers * args.iterations} toggles and shares, {failures} failed requests")
+    for mismatch in mismatches:
+        print(f"  ❌ {mismatch}")
+    return failures == 0 and not mismatches
+
+
+SCENARIOS = {
+    'engagement': run_engagement,
+    'standings': run_standings,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), action='append',
+                        help='Scenario to run (default: all)')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=50, help='Requests per worker')
+    parser.add_argument('--games', type=int, default=40, help='Games in the standings scenario')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    passed = True
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'stress.sqlite3')
+        configure(db_path)
+
+        from django.core.management import call_command
+        from django.db import connections
+        call_command('migrate', verbosity=0)
+        # Workers open their own connections, never the parent's
+        connections.close_all()
+
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Pool(args.workers, initializer=configure, initargs=(db_path,)) as pool:
+            for name in args.scenario or sorted(SCENARIOS):
+                print(f"[{name}] {args.workers} workers x {args.iterations} requests")
+                ok = SCENARIOS[name](pool, args)
+                print(f"  {'✅ PASS' if ok else '❌ FAIL'}")
+                passed = passed and ok
+        connections.close_all()
+
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:11
+
+from django.db import migrations, models
+import sports_league_backend.imaging
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teams', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='team',
+            name='logo_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='team',
+            name='logo',
+            field=sports_league_backend.imaging.VariantImageField(blank=True, null=True, upload_to='team_logos/', variants=(48, 96, 192), variants_field='logo_variants'),
+        ),
+    ]
@@ -1,27 +1,51 @@
 from django.db import models
+from django.db.models import Count, Prefetch
 from django.conf import settings
+from sports_league_backend.imaging import VariantImageField
+
+class TeamQuerySet(models.QuerySet):
+    def with_summary(self):
+        """Annotate member counts and prefetch coaches, everything TeamSerializer reads"""
+        coaches = TeamMember.objects.filter(role='coach').select_related('user__profile').order_by('id')
+        return self.annotate(num_members=Count('teammember')).prefetch_related(
+            Prefetch('teammember_set', queryset=coaches, to_attr='coach_memberships')
+        )
+
+def team_prefetch(lookup):
+    """Prefetch a relation to Team for nested TeamSerializers, e.g. team_prefetch('home_team')"""
+    return Prefetch(lookup, queryset=Team.objects.with_summary())
 
 class Team(models.Model):
     """Team model for sports teams"""
     name = models.CharField(max_length=100)
     sport = models.CharField(max_length=50)
-    logo = models.ImageField(upload_to='team_logos/', null=True, blank=True)
+    logo = VariantImageField(upload_to='team_logos/', null=True, blank=True,
+                             variants=(48, 96, 192), variants_field='logo_variants')
+    logo_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     # Team can have multiple members with different roles
     members = models.ManyToManyField(settings.AUTH_USER_MODEL, through='TeamMember')
     
+    objects = TeamQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.name} ({self.sport})"
     
+    # members_count and coach use the with_summary() data when present
     @property
     def members_count(self):
+        if hasattr(self, 'num_members'):
+            return self.num_members
         return self.members.count()
     
     @property
     def coach(self):
-        coach_member = self.teammember_set.filter(role='coach').first()
+        if hasattr(self, 'coach_memberships'):
+            coach_member = self.coach_memberships[0] if self.coach_memberships else None
+        else:
+            coach_member = self.teammember_set.filter(role='coach').first()
         return coach_member.user if coach_member else None
     
     @property
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Team, TeamMember
 from users.serializers import UserSerializer
+from sports_league_backend.imaging import SrcsetField
 
 class TeamMemberSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
@@ -14,10 +15,11 @@ class TeamMemberSerializer(serializers.ModelSerializer):
 class TeamSerializer(serializers.ModelSerializer):
     members_count = serializers.IntegerField(read_only=True)
     coach = UserSerializer(read_only=True)
+    logo_srcset = SrcsetField('logo', source='*')
     
     class Meta:
         model = Team
-        fields = ['id', 'name', 'sport', 'logo', 'created_at', 'updated_at', 'members_count', 'coach']
+        fields = ['id', 'name', 'sport', 'logo', 'logo_srcset', 'created_at', 'updated_at', 'members_count', 'coach']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 class TeamDetailSerializer(TeamSerializer):
@@ -0,0 +1,91 @@
+from datetime import date, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from analytics.models import PlayerStatistic
+from community.models import Event
+from games.models import Game
+from leagues.models import League
+from .models import Team, TeamMember
+
+User = get_user_model()
+
+
+class NestedTeamQueryTests(APITestCase):
+    """Nested TeamSerializers read member counts and coaches from with_summary()"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='organizer', email='org@test.com', password='password')
+        self.league = League.objects.create(
+            name='League', sport='Soccer', season='2024',
+            start_date=date.today(), end_date=date.today() + timedelta(days=90), organizer=self.user,
+        )
+        self.game = None
+        self.add_teams(3)
+        self.client.force_authenticate(self.user)
+
+    def add_teams(self, count):
+        """Teams with a coach and two players each, plus an event and player statistics per team"""
+        for _ in range(count):
+            i = Team.objects.count()
+            team = Team.objects.create(name=f'Team {i}', sport='Soccer')
+            self.league.teams.add(team)
+            for role, n in (('coach', 1), ('player', 2)):
+                for j in range(n):
+                    user = User.objects.create(username=f'{role}{i}-{j}', email=f'{role}{i}-{j}@test.com')
+                    TeamMember.objects.create(team=team, user=user, role=role)
+                    if role == 'player':
+                        if self.game is None:
+                            self.game = Game.objects.create(league=self.league, home_team=team, away_team=team,
+                                                            date=date.today(), time=time(18, 0))
+                        PlayerStatistic.objects.create(user=user, team=team, game=self.game, minutes_played=90)
+            Event.objects.create(title=f'Event {i}', description='Meet the team', date=date.today(),
+                                 time=time(12, 0), location='Stadium', organizer=self.user, team=team)
+
+    def assertConstantQueries(self, url, expected):
+        """``url`` runs ``expected`` queries, however many teams it lists"""
+        counts = []
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(queries))
+            self.add_teams(3)
+        self.assertEqual(counts, [expected, expected])
+        return response
+
+    def test_team_list(self):
+        # Paginator COUNT, teams with member counts, coaches
+        self.assertConstantQueries('/api/teams/', 3)
+        response = self.client.get('/api/teams/')
+        first = response.data['results'][0]
+        self.assertEqual(first['members_count'], 3)
+        self.assertEqual(first['coach']['username'], 'coach0-0')
+
+    def test_league_teams(self):
+        # League with counts, teams with member counts, coaches
+        self.assertConstantQueries(f'/api/leagues/{self.league.id}/teams/', 3)
+
+    def test_events(self):
+        # Paginator COUNT, events, teams with member counts, coaches
+        response = self.assertConstantQueries('/api/community/events/', 4)
+        self.assertEqual(response.data['results'][0]['team']['coach']['username'], 'coach0-0')
+
+        event = Event.objects.get(title='Event 0')
+        event.attendees.add(*User.objects.filter(username__startswith='player0-'))
+        response = self.client.get('/api/community/events/')
+        self.assertEqual([item['attendees_count'] for item in response.data['results']][:2], [2, 0])
+
+    def test_player_statistics(self):
+        # Paginator COUNT, statistics, teams with member counts, coaches
+        response = self.assertConstantQueries('/api/analytics/player-statistics/', 4)
+        self.assertEqual(response.data['results'][0]['team']['members_count'], 3)
+
+    def test_summary_matches_uncached_properties(self):
+        for team in Team.objects.with_summary():
+            plain = Team.objects.get(pk=team.pk)
+            self.assertEqual(team.members_count, plain.members_count)
+            self.assertEqual(team.coach, plain.coach)
@@ -15,6 +15,14 @@ class TeamViewSet(viewsets.ModelViewSet):
             return TeamDetailSerializer
         return TeamSerializer
     
+    def get_queryset(self):
+        queryset = Team.objects.with_summary().order_by('id')
+        
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related('teammember_set__user__profile')
+        
+        return queryset
+    
     def perform_create(self, serializer):
         team = serializer.save()
         # Add creator as team manager
@@ -25,7 +33,7 @@ class TeamViewSet(viewsets.ModelViewSet):
         team = self.get_object()
         
         if request.method == 'GET':
-            players = team.teammember_set.filter(role='player')
+            players = team.teammember_set.filter(role='player').select_related('user__profile')
             serializer = TeamMemberSerializer(players, many=True)
             return Response(serializer.data)
         
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext_lazy as _
+from sports_league_backend.imaging import VariantImageField
 
 class User(AbstractUser):
     """Custom user model with additional fields"""
@@ -16,7 +17,9 @@ class User(AbstractUser):
 class Profile(models.Model):
     """User profile with additional information"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
-    avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
+    avatar = VariantImageField(upload_to='avatars/', null=True, blank=True,
+                               variants=(48, 96, 192), variants_field='avatar_variants')
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
     bio = models.TextField(blank=True)
     phone = models.CharField(max_length=20, blank=True)
     address = models.CharField(max_length=255, blank=True)
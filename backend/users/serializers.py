@@ -2,13 +2,16 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import Profile
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from sports_league_backend.imaging import SrcsetField
 
 User = get_user_model()
 
 class ProfileSerializer(serializers.ModelSerializer):
+    avatar_srcset = SrcsetField('avatar', source='*')
+    
     class Meta:
         model = Profile
-        fields = ['avatar', 'bio', 'phone', 'address', 'date_of_birth', 'roles']
+        fields = ['avatar', 'avatar_srcset', 'bio', 'phone', 'address', 'date_of_birth', 'roles']
 
 class UserSerializer(serializers.ModelSerializer):
     profile = ProfileSerializer(required=False)